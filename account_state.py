@@ -0,0 +1,179 @@
+"""Short-lived cache of account balances and open orders."""
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from fill_tracker import Fill, FillTracker
+from journal import OrderJournal
+from kraken_client import KrakenClient
+from order_prep import PreparedOrder
+
+logger = logging.getLogger(__name__)
+
+
+class AccountState:
+    """
+    Balances and open orders shared between the bot and KrakenClient.
+
+    Reads are served from memory while younger than the freshness window, so
+    repeated reads within one iteration (or from several pairs) cost a single
+    private call. Order placement and cancellation go through this class and
+    invalidate the cache when they succeed, so the next read sees the change.
+    With a journal, every order action is recorded and every fresh OpenOrders
+    snapshot is reconciled against it. With a fill tracker, open orders are the
+    bot's own orders as reported by the tracker (OpenOrders is only read once,
+    to seed it), and fills are recorded as the tracker detects them.
+    """
+
+    def __init__(self, client: KrakenClient, ttl: float = 5.0, journal: Optional[OrderJournal] = None,
+                 tracker: Optional[FillTracker] = None):
+        """
+        Initialize account state.
+
+        Args:
+            client: Kraken client used to fetch and change account state
+            ttl: Seconds a fetched balance/open-orders result stays fresh
+            journal: Optional order journal kept in step with the exchange
+            tracker: Optional fill tracker that replaces the full OpenOrders scan
+        """
+        self.client = client
+        self.ttl = ttl
+        self.journal = journal
+        self.tracker = tracker
+        self.fills: List[Fill] = []  # fills found by the last tracker poll
+        self._lock = threading.Lock()
+        self._balance: Optional[Dict[str, float]] = None
+        self._balance_time = 0.0
+        self._open_orders: Optional[Dict[str, dict]] = None
+        self._open_orders_time = 0.0
+
+    def get_balance(self) -> Dict[str, float]:
+        """
+        Get account balance, fetching it only if the cached copy is stale.
+
+        Returns:
+            Dictionary with asset balances
+        """
+        with self._lock:
+            if self._balance is None or time.monotonic() - self._balance_time > self.ttl:
+                self._balance = self.client.get_balance()
+                self._balance_time = time.monotonic()
+            return self._balance
+
+    def get_open_orders(self) -> Dict[str, dict]:
+        """
+        Get all open orders, fetching them only if the cached copy is stale.
+
+        Returns:
+            Dictionary of open orders with order_id as key, order details as value
+        """
+        with self._lock:
+            if self._open_orders is None or time.monotonic() - self._open_orders_time > self.ttl:
+                if self.tracker is None:
+                    self._open_orders = self.client.get_open_orders() or {}
+                    self._reconcile(self._open_orders)
+                else:
+                    self._open_orders = self._poll_tracker()
+                self._open_orders_time = time.monotonic()
+            return self._open_orders
+
+    def refresh(self):
+        """Fetch balance and open orders now, regardless of their age."""
+        self.invalidate()
+        self.get_open_orders()
+        self.get_balance()
+
+    def invalidate(self):
+        """Drop the cached balance and open orders."""
+        with self._lock:
+            self._balance = None
+            self._open_orders = None
+
+    def _reconcile(self, open_orders: Dict[str, dict]):
+        if self.journal is None:
+            return
+        try:
+            self.journal.reconcile(self.client, open_orders)
+        except Exception as e:
+            logger.warning("Could not reconcile order journal: %s", e)
+
+    def _poll_tracker(self) -> Dict[str, dict]:
+        if not self.tracker.seeded:
+            # Seeding happens once, so a failed read must not seed an empty tracker:
+            # let it fail this iteration and try again on the next
+            open_orders = self.client.fetch_open_orders()
+            # The journal may be shared with bots trading other pairs: only adopt this bot's
+            journal_open = list(self.journal.open_orders(self.tracker.pairs)) if self.journal is not None else []
+            self.tracker.seed(open_orders, journal_open)
+        self.fills = self.tracker.poll()
+        open_orders = self.tracker.open_orders()
+        if self.journal is not None:
+            try:
+                self.journal.apply_order_info(self.tracker.last_closed)
+                # Every order the journal has open on the tracked pairs is tracked, so nothing is left to query
+                self.journal.sync_open_orders(open_orders)
+            except Exception as e:
+                logger.warning("Could not update order journal: %s", e)
+        return open_orders
+
+    def _journal_placed(self, order_id: str, pair: str, side: str, price: float, volume: float):
+        if self.tracker is not None:
+            self.tracker.track(order_id)
+        if self.journal is None:
+            return
+        try:
+            self.journal.record_placed(order_id, self.client.get_pair_info(pair).altname, side, price, volume)
+        except Exception as e:
+            logger.warning("Could not journal order %s: %s", order_id, e)
+
+    def place_limit_buy_order(self, pair: str, volume: float, price: float,
+                              tick_time: Optional[float] = None) -> Optional[str]:
+        """Place a limit buy order via KrakenClient and invalidate the cache on success."""
+        return self.submit_order(self.client.prepare_limit_order(pair, "buy", volume, price), tick_time)
+
+    def place_limit_sell_order(self, pair: str, volume: float, price: float,
+                               tick_time: Optional[float] = None) -> Optional[str]:
+        """Place a limit sell order via KrakenClient and invalidate the cache on success."""
+        return self.submit_order(self.client.prepare_limit_order(pair, "sell", volume, price), tick_time)
+
+    def submit_order(self, order: PreparedOrder, tick_time: Optional[float] = None) -> Optional[str]:
+        """Send a prepared limit order via KrakenClient and invalidate the cache on success."""
+        order_id = self.client.submit_order(order, tick_time)
+        if order_id:
+            self._journal_placed(order_id, order.pair, order.side, float(order.price), float(order.volume))
+            self.invalidate()
+        return order_id
+
+    def place_limit_order_batch(self, pair: str, orders: List[Tuple[str, float, float]],
+                                tick_time: Optional[float] = None) -> List[Optional[str]]:
+        """Place (side, volume, price) limit orders in batches via KrakenClient and invalidate the cache."""
+        order_ids = self.client.place_limit_order_batch(pair, orders, tick_time)
+        for order_id, (side, volume, price) in zip(order_ids, orders):
+            if order_id:
+                self._journal_placed(order_id, pair, side, price, volume)
+        if any(order_ids):
+            self.invalidate()
+        return order_ids
+
+    def cancel_order(self, order_id: str) -> bool:
+        """Cancel an order via KrakenClient and invalidate the cache on success."""
+        cancelled = self.client.cancel_order(order_id)
+        if cancelled:
+            if self.journal is not None:
+                self.journal.record_cancelled(order_id)
+            self.invalidate()
+        return cancelled
+
+    def cancel_orders(self, order_ids: List[str]) -> int:
+        """Cancel several orders in batches via KrakenClient and invalidate the cache."""
+        if not order_ids:
+            return 0
+        cancelled = self.client.cancel_orders(order_ids)
+        if cancelled:
+            # CancelOrderBatch only reports a count; when some orders were missing
+            # (e.g. they filled meanwhile) the next reconcile records their fate
+            if self.journal is not None and cancelled == len(order_ids):
+                for order_id in order_ids:
+                    self.journal.record_cancelled(order_id)
+            self.invalidate()
+        return cancelled
@@ -0,0 +1,201 @@
+"""Kraken asset and trading pair metadata with an on-disk cache."""
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Kraken's altnames that differ from the tickers people know them by
+DISPLAY_NAMES = {
+    'XBT': 'BTC',
+    'XDG': 'DOGE',
+}
+
+
+@dataclass(frozen=True)
+class AssetInfo:
+    """Metadata for one Kraken asset."""
+    key: str  # Balance / REST key, e.g. "XXBT"
+    altname: str  # e.g. "XBT"
+    decimals: int
+    display_name: str  # e.g. "BTC"
+
+
+@dataclass(frozen=True)
+class PairInfo:
+    """Metadata for one Kraken trading pair."""
+    key: str  # REST result key, e.g. "XXBTZUSD"
+    altname: str  # e.g. "XBTUSD"
+    wsname: str  # e.g. "XBT/USD"
+    base: str  # base asset key, e.g. "XXBT"
+    quote: str  # quote asset key, e.g. "ZUSD"
+    ordermin: float
+    costmin: float
+    lot_decimals: int
+    pair_decimals: int
+    tick_size: float
+
+
+class AssetRegistry:
+    """
+    Pair and asset lookup built from Kraken's AssetPairs and Assets endpoints.
+
+    Metadata is fetched once, cached to disk and reused until the cache is older
+    than the TTL, so warm restarts make no metadata calls. Every pair is indexed
+    by REST key, altname and wsname, so lookups are a single dict hit.
+    """
+
+    def __init__(self, market, cache_file: Optional[str] = None, ttl: float = 86400):
+        """
+        Initialize asset registry.
+
+        Args:
+            market: Kraken Market client used to fetch metadata
+            cache_file: Path of the JSON cache (no disk cache if None)
+            ttl: Seconds before the cache is refreshed from Kraken
+        """
+        self.market = market
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.loaded = False
+        self._pairs: Dict[str, PairInfo] = {}
+        self._assets: Dict[str, AssetInfo] = {}
+
+    def load(self, force: bool = False):
+        """
+        Load metadata from the disk cache, or from Kraken if the cache is stale.
+
+        Args:
+            force: Skip the disk cache and refetch from Kraken
+        """
+        data = None if force else self._read_cache()
+        if data is None:
+            data = self._fetch()
+            self._write_cache(data)
+        self._build(data['asset_pairs'], data['assets'])
+        self.loaded = True
+
+    def get_pair(self, name: str) -> Optional[PairInfo]:
+        """
+        Look up a trading pair.
+
+        Args:
+            name: REST key, altname or wsname (e.g. "XXBTZUSD", "XBTUSD", "XBT/USD")
+
+        Returns:
+            PairInfo if the pair exists, None otherwise
+        """
+        if not self.loaded:
+            self.load()
+        return self._pairs.get(name.upper())
+
+    def get_asset(self, name: str) -> Optional[AssetInfo]:
+        """
+        Look up an asset.
+
+        Args:
+            name: Asset key or altname (e.g. "XXBT", "XBT")
+
+        Returns:
+            AssetInfo if the asset exists, None otherwise
+        """
+        if not self.loaded:
+            self.load()
+        return self._assets.get(name.upper())
+
+    def balance_codes(self, asset: str) -> List[str]:
+        """
+        Get the keys an asset may appear under in a Balance response.
+
+        Args:
+            asset: Asset key or altname
+
+        Returns:
+            List of balance keys, most likely first
+        """
+        info = self.get_asset(asset)
+        if info is None:
+            return [asset]
+        codes = [info.key]
+        if info.altname != info.key:
+            codes.append(info.altname)
+        return codes
+
+    def display_name(self, asset: str) -> str:
+        """Get the human-friendly name of an asset (e.g. "BTC" for "XXBT")."""
+        info = self.get_asset(asset)
+        return info.display_name if info is not None else asset
+
+    def _fetch(self) -> dict:
+        logger.info("Fetching asset pair metadata from Kraken")
+        asset_pairs = self.market.get_asset_pairs()
+        assets = self.market.get_assets()
+        return {
+            'fetched_at': time.time(),
+            'asset_pairs': asset_pairs.get("result", asset_pairs),
+            'assets': assets.get("result", assets),
+        }
+
+    def _read_cache(self) -> Optional[dict]:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return None
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+            age = time.time() - data['fetched_at']
+            if age > self.ttl:
+                logger.info("Asset pair cache is %.0f seconds old - refreshing", age)
+                return None
+            logger.debug("Loaded asset pair metadata from %s", self.cache_file)
+            return data
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable asset pair cache %s: %s", self.cache_file, e)
+            return None
+
+    def _write_cache(self, data: dict):
+        if not self.cache_file:
+            return
+        tmp_file = "{}.tmp".format(self.cache_file)
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            logger.warning("Could not write asset pair cache %s: %s", self.cache_file, e)
+
+    def _build(self, asset_pairs: dict, assets: dict):
+        self._assets = {}
+        for key, info in assets.items():
+            altname = info.get('altname', key)
+            asset = AssetInfo(
+                key=key,
+                altname=altname,
+                decimals=int(info.get('decimals', 8)),
+                display_name=DISPLAY_NAMES.get(altname, altname)
+            )
+            self._assets[key.upper()] = asset
+            self._assets.setdefault(altname.upper(), asset)
+
+        self._pairs = {}
+        for key, info in asset_pairs.items():
+            # Skip dark pool pairs (".d" suffix), they share the altname of the real pair
+            if key.endswith('.d'):
+                continue
+            pair = PairInfo(
+                key=key,
+                altname=info.get('altname', key),
+                wsname=info.get('wsname', ''),
+                base=info.get('base', ''),
+                quote=info.get('quote', ''),
+                ordermin=float(info.get('ordermin', 0) or 0),
+                costmin=float(info.get('costmin', 0) or 0),
+                lot_decimals=int(info.get('lot_decimals', 8)),
+                pair_decimals=int(info.get('pair_decimals', 8)),
+                tick_size=float(info.get('tick_size', 0) or 0)
+            )
+            for name in (pair.key, pair.altname, pair.wsname):
+                if name:
+                    self._pairs.setdefault(name.upper(), pair)
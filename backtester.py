@@ -0,0 +1,398 @@
+"""Backtest the buy/sell state machine against historical prices.
+
+The decision logic is the same strategy.step() the live bot runs. Between
+decisions the simulation does not walk the ticks one by one: for a fixed limit
+price, the ticks that would fill it are found once with a vectorized NumPy
+comparison, and each "when does this order fill?" question is then a binary
+search. A run costs O(ticks) array work plus O(fills * log ticks) Python work,
+so millions of ticks replay in well under a second.
+
+Usage:
+    python backtester.py prices.csv --buy-price 0.45 --sell-price 0.60 --usd 1000
+"""
+import argparse
+import csv
+import logging
+import os
+from typing import Dict, List, NamedTuple, Optional
+import numpy as np
+from config import Config
+from price_history import PriceHistory
+import strategy
+
+logger = logging.getLogger(__name__)
+
+# Kraken's base maker fee (limit orders that rest on the book)
+DEFAULT_FEE_RATE = 0.0025
+
+
+class PriceSeries(NamedTuple):
+    """Historical prices as parallel arrays (one element per trade or candle)."""
+    timestamps: np.ndarray
+    lows: np.ndarray  # lowest traded price in the tick (the price for trades)
+    highs: np.ndarray  # highest traded price in the tick (the price for trades)
+    closes: np.ndarray
+
+
+class Fill(NamedTuple):
+    """One simulated order fill."""
+    timestamp: float
+    side: str
+    price: float
+    volume: float
+    fee: float
+    usd_balance: float
+    crypto_balance: float
+
+
+def load_prices(path: str) -> PriceSeries:
+    """
+    Load a historical price file.
+
+    Supported formats (comma separated, optional header row):
+    - Kraken trade history: timestamp,price,volume
+    - Kraken OHLC: time,open,high,low,close[,vwap,volume,count]
+    - NumPy .npy array with the same column layouts
+    - A market_store dataset directory (e.g. market_data/XRPUSD/ohlc_60)
+
+    Args:
+        path: Path to the price file
+
+    Returns:
+        Price series
+    """
+    if os.path.isdir(path):
+        from market_store import open_dataset
+        return open_dataset(path).price_series()
+    if path.endswith('.npy'):
+        data = np.load(path)
+    else:
+        with open(path, 'r') as f:
+            first = f.readline()
+        skiprows = 0 if first.split(',')[0].strip().replace('.', '', 1).isdigit() else 1
+        data = np.loadtxt(path, delimiter=',', skiprows=skiprows, ndmin=2)
+    return series_from_array(data)
+
+
+def series_from_array(data: np.ndarray) -> PriceSeries:
+    """
+    Build a price series from a 2-D array of trades or OHLC candles.
+
+    Args:
+        data: Rows of timestamp,price[,volume] or time,open,high,low,close[,...]
+
+    Returns:
+        Price series
+    """
+    data = np.asarray(data, dtype=np.float64)
+    timestamps = np.ascontiguousarray(data[:, 0])
+    if data.shape[1] >= 5:
+        return PriceSeries(timestamps, np.ascontiguousarray(data[:, 3]),
+                           np.ascontiguousarray(data[:, 2]), np.ascontiguousarray(data[:, 4]))
+    prices = np.ascontiguousarray(data[:, 1])
+    return PriceSeries(timestamps, prices, prices, prices)
+
+
+class SimulatedKrakenClient:
+    """
+    In-memory stand-in for KrakenClient's order and balance calls.
+
+    Holds a virtual balance and open limit orders. Buy orders fill once the
+    market trades below their price, sell orders once it trades above it
+    (or at the price with fill_on_touch), and fills are charged fee_rate.
+    """
+
+    def __init__(self, prices: PriceSeries, pair: str, usd_balance: float, crypto_balance: float = 0.0,
+                 fee_rate: float = DEFAULT_FEE_RATE, fill_on_touch: bool = False,
+                 fill_cache: Optional[dict] = None):
+        """
+        Initialize simulated client.
+
+        Args:
+            prices: Historical price series to fill orders against
+            pair: Trading pair name used in order descriptions
+            usd_balance: Starting USD balance
+            crypto_balance: Starting crypto balance
+            fee_rate: Fee charged on every fill as a fraction of its cost
+            fill_on_touch: Fill when the market trades exactly at the limit price
+                (optimistic; by default the market has to trade through it)
+            fill_cache: Dict to share fill-tick arrays between runs over the same prices
+        """
+        self.prices = prices
+        self.pair = pair
+        self.usd_balance = usd_balance
+        self.crypto_balance = crypto_balance
+        self.fee_rate = fee_rate
+        self.fill_on_touch = fill_on_touch
+
+        self.cursor = 0  # index of the tick the simulation is at
+        self.orders: Dict[str, dict] = {}
+        self.fills: List[Fill] = []
+        self._next_id = 0
+        self._hits: Dict[tuple, np.ndarray] = fill_cache if fill_cache is not None else {}
+
+    # KrakenClient interface
+
+    def get_balance(self) -> Dict[str, float]:
+        """Get the virtual balance."""
+        return {'ZUSD': self.usd_balance, 'CRYPTO': self.crypto_balance}
+
+    def get_open_orders(self) -> Dict[str, dict]:
+        """Get open simulated orders keyed by order ID."""
+        return self.orders
+
+    def get_current_price(self, pair: str) -> float:
+        """Get the close of the tick the simulation is at."""
+        return float(self.prices.closes[self.cursor])
+
+    def place_limit_buy_order(self, pair: str, volume: float, price: float) -> Optional[str]:
+        """Place a simulated limit buy order (rejected like Kraken if USD is short)."""
+        if volume * price * (1 + self.fee_rate) > self.usd_balance + 1e-9:
+            raise Exception("EOrder:Insufficient funds")
+        return self._add_order('buy', volume, price)
+
+    def place_limit_sell_order(self, pair: str, volume: float, price: float) -> Optional[str]:
+        """Place a simulated limit sell order (rejected like Kraken if crypto is short)."""
+        if volume > self.crypto_balance + 1e-12:
+            raise Exception("EOrder:Insufficient funds")
+        return self._add_order('sell', volume, price)
+
+    def cancel_order(self, order_id: str) -> bool:
+        """Cancel a simulated order."""
+        return self.orders.pop(order_id, None) is not None
+
+    # Simulation
+
+    def _add_order(self, side: str, volume: float, price: float) -> str:
+        self._next_id += 1
+        order_id = "SIM-{}".format(self._next_id)
+        self.orders[order_id] = {
+            'descr': {'pair': self.pair, 'type': side, 'price': str(price)},
+            'vol': str(volume),
+            'volume': volume,
+            'price': price,
+            'placed_at': self.cursor,
+        }
+        return order_id
+
+    def _fill_ticks(self, side: str, price: float) -> np.ndarray:
+        """Sorted indices of every tick that would fill a limit order at this price."""
+        key = (side, price, self.fill_on_touch)
+        hits = self._hits.get(key)
+        if hits is None:
+            if side == 'buy':
+                mask = self.prices.lows <= price if self.fill_on_touch else self.prices.lows < price
+            else:
+                mask = self.prices.highs >= price if self.fill_on_touch else self.prices.highs > price
+            hits = np.flatnonzero(mask)
+            self._hits[key] = hits
+        return hits
+
+    def advance(self) -> bool:
+        """
+        Jump to the next tick at which an open order fills and apply the fill.
+
+        Returns:
+            True if an order filled, False if no open order fills before the data ends
+        """
+        next_fill = None
+        for order_id, order in self.orders.items():
+            hits = self._fill_ticks(order['descr']['type'], order['price'])
+            # Orders can only fill on ticks after the one they were placed on
+            i = np.searchsorted(hits, order['placed_at'], side='right')
+            if i < len(hits) and (next_fill is None or hits[i] < next_fill[0]):
+                next_fill = (int(hits[i]), order_id)
+        if next_fill is None:
+            self.cursor = len(self.prices.timestamps) - 1
+            return False
+
+        self.cursor, order_id = next_fill
+        order = self.orders.pop(order_id)
+        side, volume, price = order['descr']['type'], order['volume'], order['price']
+        cost = volume * price
+        fee = cost * self.fee_rate
+        if side == 'buy':
+            self.usd_balance -= cost + fee
+            self.crypto_balance += volume
+        else:
+            self.usd_balance += cost - fee
+            self.crypto_balance -= volume
+        self.fills.append(Fill(float(self.prices.timestamps[self.cursor]), side, price, volume, fee,
+                               self.usd_balance, self.crypto_balance))
+        return True
+
+
+class BacktestResult(NamedTuple):
+    """Outcome of a backtest run."""
+    fills: List[Fill]
+    start_equity: float
+    end_equity: float
+    usd_balance: float
+    crypto_balance: float
+    fees: float
+    round_trips: int
+    realized_pnl: float
+
+    @property
+    def pnl(self) -> float:
+        """Change in account value (USD plus crypto at the last price)."""
+        return self.end_equity - self.start_equity
+
+    def summary(self) -> dict:
+        """Get the headline numbers as a dictionary."""
+        return {
+            'fills': len(self.fills),
+            'round_trips': self.round_trips,
+            'realized_pnl': round(self.realized_pnl, 2),
+            'pnl': round(self.pnl, 2),
+            'fees': round(self.fees, 2),
+            'start_equity': round(self.start_equity, 2),
+            'end_equity': round(self.end_equity, 2),
+            'usd_balance': round(self.usd_balance, 2),
+            'crypto_balance': round(self.crypto_balance, 8),
+        }
+
+
+def _place(client: SimulatedKrakenClient, side: str, volume: float, price: float) -> Optional[str]:
+    """Place an order the way the live bot does: insufficient funds means no order."""
+    try:
+        if side == 'buy':
+            return client.place_limit_buy_order(pair=client.pair, volume=volume, price=price)
+        return client.place_limit_sell_order(pair=client.pair, volume=volume, price=price)
+    except Exception:
+        return None
+
+
+def run_backtest(prices: PriceSeries, params: strategy.StrategyParams, usd_balance: float,
+                 crypto_balance: float = 0.0, fee_rate: float = DEFAULT_FEE_RATE,
+                 fill_on_touch: bool = False, pair: str = "BACKTEST",
+                 fill_cache: Optional[dict] = None, history: Optional[PriceHistory] = None) -> BacktestResult:
+    """
+    Replay a price series through the bot's buy/sell state machine.
+
+    Args:
+        prices: Historical price series
+        params: Trading settings
+        usd_balance: Starting USD balance
+        crypto_balance: Starting crypto balance
+        fee_rate: Fee charged on every fill
+        fill_on_touch: Fill when the market trades exactly at the limit price
+        pair: Pair name for order descriptions
+        fill_cache: Dict to share fill-tick arrays between runs over the same prices
+        history: Price history fed with every tick up to each decision, the way
+            the live bot feeds it, so it holds what a live bot would have seen
+
+    Returns:
+        Backtest result with fills, P&L and round trip count
+    """
+    client = SimulatedKrakenClient(prices, pair, usd_balance, crypto_balance, fee_rate, fill_on_touch, fill_cache)
+    start_equity = usd_balance + crypto_balance * float(prices.closes[0])
+    fed = 0  # ticks already in the history
+
+    while True:
+        if history is not None and client.cursor >= fed:
+            history.extend(prices.timestamps[fed:client.cursor + 1], prices.closes[fed:client.cursor + 1])
+            fed = client.cursor + 1
+        sell_order = buy_order = None
+        for order in client.orders.values():
+            if order['descr']['type'] == 'sell':
+                sell_order = order
+            else:
+                buy_order = order
+        decision = strategy.step(
+            params,
+            sell_order_volume=sell_order['volume'] if sell_order else None,
+            buy_order_volume=buy_order['volume'] if buy_order else None,
+            crypto_amount=client.crypto_balance,
+            usd_balance=client.usd_balance
+        )
+
+        if decision.action in (strategy.WAIT_SELL, strategy.WAIT_BUY):
+            if not client.advance():
+                break
+            continue
+
+        order_id = None
+        if decision.action == strategy.SELL:
+            order_id = _place(client, 'sell', decision.sell_amount, params.sell_price)
+        if decision.action in (strategy.SELL, strategy.SELL_TOO_SMALL) and order_id is None and decision.buy_if_no_sell:
+            order_id = _place(client, 'buy', decision.buy_amount, params.buy_price)
+        elif decision.action == strategy.BUY:
+            order_id = _place(client, 'buy', decision.buy_amount, params.buy_price)
+
+        # Nothing placed: the account can't change any more, like a live bot waiting for funds
+        if order_id is None:
+            break
+
+    if history is not None:
+        history.extend(prices.timestamps[fed:], prices.closes[fed:])
+
+    # Realized P&L at average cost; a round trip is a buy fill followed by a sell fill
+    round_trips = 0
+    realized_pnl = 0.0
+    held = crypto_balance
+    cost_basis = crypto_balance * float(prices.closes[0])
+    fees = 0.0
+    last_side = None
+    for fill in client.fills:
+        fees += fill.fee
+        if fill.side == 'buy':
+            held += fill.volume
+            cost_basis += fill.volume * fill.price + fill.fee
+        else:
+            avg_cost = cost_basis / held if held > 0 else 0.0
+            realized_pnl += fill.volume * fill.price - fill.fee - fill.volume * avg_cost
+            cost_basis -= fill.volume * avg_cost
+            held -= fill.volume
+            if last_side == 'buy':
+                round_trips += 1
+        last_side = fill.side
+
+    end_equity = client.usd_balance + client.crypto_balance * float(prices.closes[-1])
+    return BacktestResult(client.fills, start_equity, end_equity, client.usd_balance, client.crypto_balance,
+                          fees, round_trips, realized_pnl)
+
+
+def write_fills(path: str, fills: List[Fill]):
+    """Write fills to a CSV file."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(Fill._fields)
+        writer.writerows(fills)
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Backtest the buy/sell bot against historical prices")
+    parser.add_argument("prices", help="CSV of timestamp,price[,volume] trades or Kraken OHLC candles (or .npy)")
+    parser.add_argument("--buy-price", type=float, default=Config.BUY_PRICE)
+    parser.add_argument("--sell-price", type=float, default=Config.SELL_PRICE)
+    parser.add_argument("--dollars", type=float, default=Config.DOLLARS_BUY_AMOUNT, help="USD per buy")
+    parser.add_argument("--sell-all", action="store_true", default=Config.SELL_ALL)
+    parser.add_argument("--min-trade-size", type=float, default=Config.MIN_CRYPTO_TRADE_SIZE)
+    parser.add_argument("--usd", type=float, default=1000.0, help="starting USD balance")
+    parser.add_argument("--crypto", type=float, default=0.0, help="starting crypto balance")
+    parser.add_argument("--fee", type=float, default=DEFAULT_FEE_RATE, help="fee rate per fill")
+    parser.add_argument("--fill-on-touch", action="store_true", help="fill when price touches the limit")
+    parser.add_argument("--fills-csv", help="write every fill to this CSV file")
+    parser.add_argument("--history", type=int, default=0,
+                        help="keep a rolling price history of this many ticks and print its indicators")
+    args = parser.parse_args()
+
+    prices = load_prices(args.prices)
+    params = strategy.StrategyParams(args.buy_price, args.sell_price, args.dollars, args.sell_all, args.min_trade_size)
+    history = PriceHistory(capacity=args.history, ema_span=Config.PRICE_HISTORY_EMA_SPAN) if args.history else None
+    result = run_backtest(prices, params, args.usd, args.crypto, args.fee, args.fill_on_touch, history=history)
+
+    print("Ticks: {}".format(len(prices.timestamps)))
+    for key, value in result.summary().items():
+        print("{}: {}".format(key, value))
+    if history is not None:
+        for key, value in history.summary().items():
+            print("history_{}: {}".format(key, value))
+    if args.fills_csv:
+        write_fills(args.fills_csv, result.fills)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Micro-benchmark: per-call REST latency with and without the shared session.
+
+Runs a local HTTP stand-in for the Ticker and Balance endpoints and times the
+same KrakenClient calls three ways:
+
+- new connection per call (what a client without keep-alive pays)
+- python-kraken-sdk defaults (one session per Market/Trade/User client)
+- one shared pooled session from http_session.create_session
+
+The stand-in is plain HTTP on localhost, so the numbers show connection setup
+cost without TLS; against api.kraken.com every avoided connection also saves
+a TLS handshake.
+
+Usage:
+    python benchmarks/bench_http_session.py [--calls 2000]
+"""
+import argparse
+import base64
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_session import create_session  # noqa: E402
+from kraken_client import KrakenClient  # noqa: E402
+
+TICKER = json.dumps({"error": [], "result": {"XXBTZUSD": {"c": ["60000.0", "0.1"]}}}).encode()
+BALANCE = json.dumps({"error": [], "result": {"ZUSD": "1000.0", "XXBT": "0.5"}}).encode()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Minimal keep-alive Kraken stand-in."""
+    protocol_version = "HTTP/1.1"
+    connections = 0
+
+    def setup(self):
+        StandInHandler.connections += 1
+        super().setup()
+        # Headers and body go out in separate writes; without this Nagle's
+        # algorithm plus delayed ACKs add ~40 ms to every keep-alive response
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _reply(self, body):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply(TICKER)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._reply(BALANCE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def run_case(name, client, calls, close_each_call=False):
+    StandInHandler.connections = 0
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        if i % 2:
+            client.user.get_account_balance()
+        else:
+            client.market.get_ticker(pair="XXBTZUSD")
+        latencies.append((time.perf_counter() - start) * 1000)
+        if close_each_call:
+            for sdk_client in (client.market, client.user):
+                sdk_client._KrakenBaseSpotAPI__session.close()
+    print("{:<28} mean {:7.3f} ms  p50 {:7.3f} ms  p99 {:7.3f} ms  connections {}".format(
+        name, statistics.mean(latencies), percentile(latencies, 50), percentile(latencies, 99),
+        StandInHandler.connections))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000, help="calls per case (alternating Ticker/Balance)")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:{}/0".format(server.server_address[1])
+    secret = base64.b64encode(b"benchmark-secret").decode()
+
+    def new_client(session=None):
+        return KrakenClient(api_key="benchmark", api_secret=secret, session=session, api_url=url)
+
+    run_case("new connection per call", new_client(), args.calls, close_each_call=True)
+    run_case("sdk default sessions", new_client(), args.calls)
+    run_case("shared pooled session", new_client(create_session()), args.calls)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""Benchmark: trading loop iteration cost and the client parsing hot paths.
+
+Runs the real CryptoTradingBot / AccountState / KrakenClient code against a
+fake SDK that returns canned Kraken responses instantly, so the numbers are
+pure bot-side CPU time: response parsing, the open-order scan, the strategy
+step and logging (through the same queued log pipeline as a live run, to a
+temporary file, console output off).
+
+Cases cover account size (1, 100 and 10,000 open orders) and the number of
+pairs traded from one account. Each reports per-call latency percentiles,
+throughput and the peak memory allocated per call (tracemalloc, measured in a
+separate pass so tracing overhead does not skew the timings).
+
+Results can be saved as a baseline and later runs compared against it:
+
+    python benchmarks/bench_trading_loop.py --save-baseline
+    python benchmarks/bench_trading_loop.py --compare        # exit 1 on regression
+
+Baselines are machine specific; compare runs made on the same host.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from account_state import AccountState  # noqa: E402
+from kraken_client import KrakenClient  # noqa: E402
+from logging_setup import setup_logging  # noqa: E402
+from trading_bot import CryptoTradingBot  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+ORDER_COUNTS = (1, 100, 10000)
+PAIR_COUNTS = (1, 5, 20)
+FILLER_PAIR = "FILLUSD"  # pair of open orders that no bot trades
+
+
+def pair_metadata(pairs):
+    """AssetPairs/Assets responses for synthetic pairs P0USD, P1USD, ... plus the filler pair."""
+    asset_pairs = {}
+    assets = {"ZUSD": {"altname": "USD", "decimals": 4}}
+    for name in ["P{}".format(i) for i in range(pairs)] + ["FILL"]:
+        asset_pairs["X{}ZUSD".format(name)] = {
+            "altname": "{}USD".format(name), "wsname": "{}/USD".format(name), "base": "X{}".format(name),
+            "quote": "ZUSD", "ordermin": "1", "costmin": "0.5", "lot_decimals": 8, "pair_decimals": 5,
+            "tick_size": "0.00001",
+        }
+        assets["X{}".format(name)] = {"altname": name, "decimals": 8}
+    return asset_pairs, assets
+
+
+def open_orders(count, pairs):
+    """OpenOrders response: one buy order per traded pair, the rest on the filler pair."""
+    orders = {}
+    for i in range(max(count, pairs)):
+        altname = "P{}USD".format(i) if i < pairs else FILLER_PAIR
+        orders["O{:05d}-BENCH-{:06d}".format(i, i)] = {
+            "refid": None, "userref": 0, "status": "open", "opentm": 1700000000.0 + i, "starttm": 0,
+            "expiretm": 0,
+            "descr": {"pair": altname, "type": "buy", "ordertype": "limit", "price": "0.45000",
+                      "price2": "0", "leverage": "none", "order": "buy 222.22222222 {} @ limit 0.45000".format(altname),
+                      "close": ""},
+            "vol": "222.22222222", "vol_exec": "0.00000000", "cost": "0.00000", "fee": "0.00000",
+            "price": "0.00000", "stopprice": "0.00000", "limitprice": "0.00000", "misc": "", "oflags": "fciq",
+        }
+    return orders
+
+
+class FakeSDK:
+    """Canned python-kraken-sdk Market/User/Trade responses (already unwrapped, like the SDK returns them)."""
+
+    def __init__(self, pairs, orders):
+        self.asset_pairs, self.assets = pair_metadata(pairs)
+        self.open = {"open": open_orders(orders, pairs)}
+        self.balance = {"ZUSD": "1000.0000"}
+        self.balance.update({"XP{}".format(i): "0.00000000" for i in range(pairs)})
+        self.ticker = {key: {"a": ["0.50000", "1", "1.000"], "b": ["0.49990", "1", "1.000"],
+                             "c": ["0.49995", "10.00000000"]} for key in self.asset_pairs}
+
+    def get_asset_pairs(self, *args, **kwargs):
+        return self.asset_pairs
+
+    def get_assets(self, *args, **kwargs):
+        return self.assets
+
+    def get_ticker(self, pair=None):
+        return {pair: self.ticker[pair]}
+
+    def get_ohlc(self, pair, interval=1, since=None):
+        return {pair: [[1700000000 + 60 * i, "0.5", "0.5", "0.5", "0.5", "0.5", "10.0", 1] for i in range(720)],
+                "last": 1700043140}
+
+    def get_account_balance(self):
+        return self.balance
+
+    def get_open_orders(self, *args, **kwargs):
+        return self.open
+
+    def create_order(self, *args, **kwargs):
+        return {"descr": {"order": ""}, "txid": ["OBENCH-ADDED-000000"]}
+
+    def cancel_order(self, txid):
+        return {"count": 1}
+
+
+def make_client(pairs, orders):
+    client = KrakenClient(api_key="benchmark", api_secret="benchmark")
+    fake = FakeSDK(pairs, orders)
+    client.market = client.user = client.trade = client.registry.market = fake
+    return client
+
+
+def make_bots(client, pairs, account):
+    return [CryptoTradingBot(client=client, account=account, pair_config={
+        'pair': "P{}USD".format(i), 'buy_price': 0.45, 'sell_price': 0.60,
+        'dollars_buy_amount': 100.0, 'sell_all': True,
+    }) for i in range(pairs)]
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def measure(func, iterations, warmup, alloc_iterations):
+    """Time func() and measure its peak allocation per call."""
+    for _ in range(warmup):
+        func()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - t) * 1000)
+    elapsed = time.perf_counter() - start
+
+    peaks = []
+    tracemalloc.start()
+    for _ in range(alloc_iterations):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        func()
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    return {
+        'iterations': iterations,
+        'mean_ms': round(statistics.mean(latencies), 4),
+        'p50_ms': round(percentile(latencies, 50), 4),
+        'p90_ms': round(percentile(latencies, 90), 4),
+        'p99_ms': round(percentile(latencies, 99), 4),
+        'max_ms': round(max(latencies), 4),
+        'per_sec': round(iterations / elapsed, 1),
+        'peak_alloc_kib': round(statistics.mean(peaks) / 1024, 2),
+    }
+
+
+def build_cases(order_counts, pair_counts):
+    """Yield (name, callable, size) for every benchmark case."""
+    for orders in order_counts:
+        client = make_client(1, orders)
+        account = AccountState(client, ttl=0)
+        bot = make_bots(client, 1, account)[0]
+        # Hot paths on their own
+        yield "client.get_open_orders orders={}".format(orders), client.get_open_orders, orders
+        yield "client.get_balance orders={}".format(orders), client.get_balance, orders
+        yield "client.get_current_price orders={}".format(orders), lambda c=client: c.get_current_price("P0USD"), orders
+        account.refresh()
+        yield "bot.get_open_orders scan orders={}".format(orders), bot.get_open_orders, orders
+        # Whole iteration: fresh account state, then the pair's state machine
+        yield "loop orders={} pairs=1".format(orders), lambda a=account, b=bot: (a.refresh(), b.run_iteration()), orders
+
+    for pairs in pair_counts:
+        if pairs == 1:
+            continue
+        client = make_client(pairs, 100)
+        account = AccountState(client, ttl=0)
+        bots = make_bots(client, pairs, account)
+
+        def tick(account=account, bots=bots):
+            account.refresh()
+            for bot in bots:
+                bot.run_iteration()
+        yield "loop orders=100 pairs={}".format(pairs), tick, 100
+
+
+def compare(results, baseline, threshold):
+    """Print p50 changes against a baseline; return the names of regressed cases."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        change = (result['p50_ms'] - base['p50_ms']) / base['p50_ms'] if base['p50_ms'] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print("{:<44} p50 {:9.4f} ms  baseline {:9.4f} ms  {:+7.1%}{}".format(
+            name, result['p50_ms'], base['p50_ms'], change, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=300, help="timed calls per case (10,000-order cases run a tenth)")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed calls before each case")
+    parser.add_argument("--alloc-iterations", type=int, default=20, help="calls traced for allocation stats")
+    parser.add_argument("--orders", default=",".join(str(n) for n in ORDER_COUNTS), help="open order counts")
+    parser.add_argument("--pairs", default=",".join(str(n) for n in PAIR_COUNTS), help="pair counts")
+    parser.add_argument("--log-level", default="INFO", help="bot log level (messages go to a temporary file)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON path")
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="compare against the baseline, exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=0.25, help="p50 slowdown counted as a regression")
+    args = parser.parse_args()
+
+    # Same log pipeline as a live run, minus the console
+    log_file = tempfile.NamedTemporaryFile(prefix="bench_trading_loop_", suffix=".log", delete=False)
+    listener = setup_logging(level=args.log_level, log_file=log_file.name, max_bytes=0, console=False)
+
+    results = {}
+    order_counts = [int(n) for n in args.orders.split(',') if n]
+    pair_counts = [int(n) for n in args.pairs.split(',') if n]
+    for name, func, size in build_cases(order_counts, pair_counts):
+        iterations = max(10, args.iterations // 10) if size >= 10000 else args.iterations
+        result = measure(func, iterations, args.warmup, args.alloc_iterations)
+        results[name] = result
+        print("{:<44} p50 {:9.4f} ms  p90 {:9.4f} ms  p99 {:9.4f} ms  {:10.1f}/s  peak {:9.2f} KiB".format(
+            name, result['p50_ms'], result['p90_ms'], result['p99_ms'], result['per_sec'], result['peak_alloc_kib']))
+
+    listener.stop()
+    os.unlink(log_file.name)
+
+    exit_code = 0
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print("No baseline at {} - run with --save-baseline first".format(args.baseline))
+            exit_code = 1
+        else:
+            with open(args.baseline) as f:
+                regressions = compare(results, json.load(f), args.threshold)
+            if regressions:
+                print("{} case(s) regressed by more than {:.0%}".format(len(regressions), args.threshold))
+                exit_code = 1
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'machine': platform.platform(),
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+        print("Baseline saved to {}".format(args.baseline))
+
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
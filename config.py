@@ -1,7 +1,7 @@
 """Configuration management for XRP trading bot."""
 import os
 from dotenv import load_dotenv
-from typing import Optional
+from typing import Any, Dict, List
 
 # Load environment variables from .env
 load_dotenv()
@@ -59,23 +59,166 @@ class Config:
     # Backward compatibility
     DOLLARS_BEING_TRADED: float = DOLLARS_BUY_AMOUNT  # Alias for backward compatibility
     
+    # Multi-pair engine (engine.py): comma separated PAIR:BUY_PRICE:SELL_PRICE[:DOLLARS_BUY_AMOUNT[:SELL_ALL]]
+    # e.g. "XBTUSD:88000:91000:100,XRPUSD:0.45:0.60:50:true". Empty means trade TRADING_PAIR only.
+    TRADING_PAIRS: str = os.getenv("TRADING_PAIRS", "")
+    
+    # Grid mode (grid_bot.py): GRID_LEVELS buy levels stepping down from each pair's buy price and as many sell
+    # levels stepping up from its sell price, GRID_SPACING_PCT apart, each trading DOLLARS_BUY_AMOUNT. 0 = off
+    GRID_LEVELS: int = int(os.getenv("GRID_LEVELS", "0"))
+    GRID_SPACING_PCT: float = float(os.getenv("GRID_SPACING_PCT", "1"))
+    
     # Bot Configuration
-    CHECK_INTERVAL: int = int(os.getenv("CHECK_INTERVAL", "60"))  # seconds
+    CHECK_INTERVAL: int = int(os.getenv("CHECK_INTERVAL", "60"))  # seconds (fixed interval when ADAPTIVE_POLLING is off)
+    ADAPTIVE_POLLING: bool = get_bool_env("ADAPTIVE_POLLING", default=True)  # wait less near the order prices, more far from them
+    POLL_MIN_INTERVAL: float = float(os.getenv("POLL_MIN_INTERVAL", "5"))  # seconds
+    POLL_MAX_INTERVAL: float = float(os.getenv("POLL_MAX_INTERVAL", "300"))  # seconds
+    POLL_BUDGET_SHARE: float = float(os.getenv("POLL_BUDGET_SHARE", "0.5"))  # share of the API rate limit the loop may use
+    ACCOUNT_STATE_TTL: float = float(os.getenv("ACCOUNT_STATE_TTL", "5"))  # seconds balances/open orders are reused within an iteration
+    CANCEL_ON_SHUTDOWN: bool = get_bool_env("CANCEL_ON_SHUTDOWN", default=True)  # cancel open orders on Ctrl-C; False leaves them for the next run
+    CANCEL_AFTER_TIMEOUT: int = int(os.getenv("CANCEL_AFTER_TIMEOUT", "120"))  # dead man's switch: Kraken cancels all orders this many seconds after the bot stops refreshing it (0 = off)
+    # The switch is one timer per API key: disarming it on stop also disarms it for every other bot on the key,
+    # so it is left to expire unless this is the key's only bot
+    CANCEL_AFTER_DISARM: bool = get_bool_env("CANCEL_AFTER_DISARM", default=False)  # disarm the switch on a clean stop
+    
+    # Check only the bot's own orders for fills (QueryOrders/ClosedOrders) instead of scanning every open order on the account
+    FILL_TRACKER: bool = get_bool_env("FILL_TRACKER", default=True)
+    
+    # Rolling price history per pair (EMA, rolling mean/std, min/max, VWAP), seeded from 1-minute OHLC; 0 disables it
+    PRICE_HISTORY_SIZE: int = int(os.getenv("PRICE_HISTORY_SIZE", "720"))
+    PRICE_HISTORY_EMA_SPAN: int = int(os.getenv("PRICE_HISTORY_EMA_SPAN", "20"))
+    
+    # Local order/fill journal (SQLite, WAL mode); empty disables it
+    JOURNAL_FILE: str = os.getenv("JOURNAL_FILE", "trading_journal.db")
+    
+    # Executed trades and ledger synced from TradesHistory/Ledgers into SQLite for P&L; empty disables it.
+    # The sync covers the whole account, so enable it in one process per API key (not in every per-pair bot)
+    HISTORY_DB: str = os.getenv("HISTORY_DB", "")  # e.g. trade_history.db
+    HISTORY_SYNC_INTERVAL: float = float(os.getenv("HISTORY_SYNC_INTERVAL", "3600"))  # seconds between syncs
+    HISTORY_SYNC_LEDGER: bool = get_bool_env("HISTORY_SYNC_LEDGER", default=True)
+    
+    # Paper trading: live public prices, fills simulated in memory against a virtual balance (no API keys needed)
+    PAPER_TRADING: bool = get_bool_env("PAPER_TRADING", default=False)
+    PAPER_BALANCES: str = os.getenv("PAPER_BALANCES", "ZUSD:1000")  # starting balances by asset key, e.g. ZUSD:1000,XXRP:50
+    
+    # Kraken private API rate limit (tier: starter, intermediate or pro)
+    KRAKEN_TIER: str = os.getenv("KRAKEN_TIER", "starter")
+    RATE_LIMIT_HEADROOM: float = float(os.getenv("RATE_LIMIT_HEADROOM", "1"))  # counter units left unused as a safety margin
+    
+    # REST connection settings (one shared keep-alive pool for all Kraken calls)
+    KRAKEN_API_URL: str = os.getenv("KRAKEN_API_URL", "")  # e.g. http://127.0.0.1:8080/0 for a local stand-in; empty = api.kraken.com
+    HTTP_CONNECT_TIMEOUT: float = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))  # seconds
+    HTTP_READ_TIMEOUT: float = float(os.getenv("HTTP_READ_TIMEOUT", "15"))  # seconds
+    HTTP_RETRIES: int = int(os.getenv("HTTP_RETRIES", "2"))  # retries for connection errors and idempotent reads
+    HTTP_POOL_SIZE: int = int(os.getenv("HTTP_POOL_SIZE", "10"))  # keep-alive connections per host
+    
+    # Streaming prices from Kraken's public WebSocket (falls back to the REST ticker when unavailable)
+    USE_PRICE_FEED: bool = get_bool_env("USE_PRICE_FEED", default=True)
+    KRAKEN_WS_URL: str = os.getenv("KRAKEN_WS_URL", "wss://ws.kraken.com")
+    MARKET_DATA_HUB: str = os.getenv("MARKET_DATA_HUB", "")  # shared memory price table of a supervisor's hub, read instead of the WebSocket (set by supervisor.py)
+    
+    # Local L2 order books from the WebSocket book channel (spread and queue position at order placement)
+    USE_ORDER_BOOK: bool = get_bool_env("USE_ORDER_BOOK", default=False)
+    ORDER_BOOK_DEPTH: int = int(os.getenv("ORDER_BOOK_DEPTH", "100"))  # levels per side: 10, 25, 100, 500 or 1000
+    ORDER_BOOK_RECORD_FILE: str = os.getenv("ORDER_BOOK_RECORD_FILE", "")  # record raw book messages for replay (empty = off)
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     
+    # Log files (written by a background thread; rotated files are gzipped)
+    LOG_FILE: str = os.getenv("LOG_FILE", "trading_bot.log")
+    LOG_MAX_BYTES: int = int(os.getenv("LOG_MAX_BYTES", "10485760"))  # rotate at this size (0 = never by size)
+    LOG_ROTATE_WHEN: str = os.getenv("LOG_ROTATE_WHEN", "")  # rotate by time instead, e.g. "midnight" or "H"
+    LOG_BACKUP_COUNT: int = int(os.getenv("LOG_BACKUP_COUNT", "5"))  # rotated files kept
+    LOG_COMPRESS: bool = get_bool_env("LOG_COMPRESS", default=True)
+    LOG_JSON_FILE: str = os.getenv("LOG_JSON_FILE", "")  # e.g. trading_bot.jsonl - one JSON event per line (empty = off)
+    LOG_CONSOLE: bool = get_bool_env("LOG_CONSOLE", default=True)
+    
     # Minimum Trade Size (to avoid "volume minimum not met" errors)
-    # Set to 0.00001 BTC by default (adjust based on Kraken requirements)
+    # Floor on top of each pair's Kraken ordermin; 0.00001 by default
     MIN_CRYPTO_TRADE_SIZE: float = float(os.getenv("MIN_CRYPTO_TRADE_SIZE", "0.00001"))
     
+    # Asset pair metadata cache (ordermin, decimals, pair names from Kraken's AssetPairs endpoint)
+    ASSET_CACHE_FILE: str = os.getenv("ASSET_CACHE_FILE", "asset_pairs_cache.json")
+    ASSET_CACHE_TTL: int = int(os.getenv("ASSET_CACHE_TTL", "86400"))  # seconds
+    
+    # Metrics export (latency histograms, call and error counts); disabled unless a port or file is set
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "0"))  # serve Prometheus /metrics on this port (0 = off)
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_FILE: str = os.getenv("METRICS_FILE", "")  # e.g. /var/lib/node_exporter/trading_bot.prom
+    METRICS_FLUSH_INTERVAL: float = float(os.getenv("METRICS_FLUSH_INTERVAL", "15"))  # seconds between metrics file writes
+    
+    # On-demand profiling (SIGUSR1 stack sampling, SIGUSR2 tracemalloc + phase timings); files go to PROFILE_DIR, empty disables it
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "")  # e.g. profiles
+    PROFILE_SECONDS: float = float(os.getenv("PROFILE_SECONDS", "30"))  # default capture length
+    PROFILE_SOCKET: str = os.getenv("PROFILE_SOCKET", "")  # Unix socket for sample/profile/memory/phases commands (empty = signals only)
+    
+    @classmethod
+    def get_pair_configs(cls) -> List[Dict[str, Any]]:
+        """Get the per-pair trading settings.
+        
+        Returns:
+            List of dicts with pair, buy_price, sell_price, dollars_buy_amount and sell_all.
+            Missing DOLLARS_BUY_AMOUNT / SELL_ALL fields fall back to the global settings.
+        """
+        if not cls.TRADING_PAIRS.strip():
+            return [{
+                'pair': cls.TRADING_PAIR,
+                'buy_price': cls.BUY_PRICE,
+                'sell_price': cls.SELL_PRICE,
+                'dollars_buy_amount': cls.DOLLARS_BUY_AMOUNT,
+                'sell_all': cls.SELL_ALL,
+            }]
+        
+        pair_configs = []
+        for entry in cls.TRADING_PAIRS.split(','):
+            entry = entry.strip()
+            if not entry:
+                continue
+            fields = [field.strip() for field in entry.split(':')]
+            if len(fields) < 3 or len(fields) > 5:
+                raise ValueError("Invalid TRADING_PAIRS entry '{}': expected PAIR:BUY_PRICE:SELL_PRICE[:DOLLARS_BUY_AMOUNT[:SELL_ALL]]".format(entry))
+            pair_configs.append({
+                'pair': fields[0].upper(),
+                'buy_price': float(fields[1]),
+                'sell_price': float(fields[2]),
+                'dollars_buy_amount': float(fields[3]) if len(fields) > 3 else cls.DOLLARS_BUY_AMOUNT,
+                'sell_all': fields[4].lower() in ('true', '1', 'yes', 'on') if len(fields) > 4 else cls.SELL_ALL,
+            })
+        return pair_configs
+    
     @classmethod
     def validate(cls) -> bool:
         """Validate that required configuration is present."""
-        if not cls.KRAKEN_API_KEY or not cls.KRAKEN_API_SECRET:
+        if not cls.PAPER_TRADING and (not cls.KRAKEN_API_KEY or not cls.KRAKEN_API_SECRET):
             raise ValueError("KRAKEN_API_KEY and KRAKEN_API_SECRET must be set in ~/.krakenapi or .env file")
         if cls.BUY_PRICE <= 0:
             raise ValueError("BUY_PRICE must be greater than 0")
         if cls.SELL_PRICE <= 0:
             raise ValueError("SELL_PRICE must be greater than 0")
-        if cls.DOLLARS_BEING_TRADED <= 0:
-            raise ValueError("DOLLARS_BEING_TRADED must be greater than 0")
+        if cls.KRAKEN_TIER.lower() not in ('starter', 'intermediate', 'pro'):
+            raise ValueError("KRAKEN_TIER must be one of starter, intermediate, pro")
+        if cls.DOLLARS_BUY_AMOUNT <= 0:
+            raise ValueError("DOLLARS_BUY_AMOUNT must be greater than 0")
+        if cls.ADAPTIVE_POLLING and not 0 < cls.POLL_MIN_INTERVAL <= cls.POLL_MAX_INTERVAL:
+            raise ValueError("POLL_MIN_INTERVAL must be greater than 0 and at most POLL_MAX_INTERVAL")
+        if cls.ADAPTIVE_POLLING and not 0 < cls.POLL_BUDGET_SHARE <= 1:
+            raise ValueError("POLL_BUDGET_SHARE must be between 0 and 1")
+        if cls.CANCEL_AFTER_TIMEOUT < 0 or 0 < cls.CANCEL_AFTER_TIMEOUT < 60:
+            raise ValueError("CANCEL_AFTER_TIMEOUT must be 0 (off) or at least 60 seconds")
+        if cls.USE_ORDER_BOOK and cls.ORDER_BOOK_DEPTH not in (10, 25, 100, 500, 1000):
+            raise ValueError("ORDER_BOOK_DEPTH must be one of 10, 25, 100, 500, 1000")
+        if cls.HISTORY_DB and cls.HISTORY_SYNC_INTERVAL <= 0:
+            raise ValueError("HISTORY_SYNC_INTERVAL must be greater than 0")
+        if cls.GRID_LEVELS < 0:
+            raise ValueError("GRID_LEVELS must be 0 or greater")
+        if cls.GRID_LEVELS and not 0 < cls.GRID_SPACING_PCT * cls.GRID_LEVELS < 100:
+            raise ValueError("GRID_SPACING_PCT must be greater than 0 and GRID_LEVELS * GRID_SPACING_PCT below 100")
+        pairs = set()
+        for pair_config in cls.get_pair_configs():
+            if pair_config['pair'] in pairs:
+                raise ValueError("TRADING_PAIRS lists {} more than once".format(pair_config['pair']))
+            pairs.add(pair_config['pair'])
+            if pair_config['buy_price'] <= 0 or pair_config['sell_price'] <= 0:
+                raise ValueError("Buy and sell prices for {} must be greater than 0".format(pair_config['pair']))
+            if pair_config['dollars_buy_amount'] <= 0:
+                raise ValueError("DOLLARS_BUY_AMOUNT for {} must be greater than 0".format(pair_config['pair']))
         return True
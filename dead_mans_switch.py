@@ -0,0 +1,78 @@
+"""Kraken dead man's switch: open orders are cancelled if the bot stops refreshing it."""
+import logging
+import threading
+from kraken_client import KrakenClient
+
+logger = logging.getLogger(__name__)
+
+
+class DeadMansSwitch:
+    """
+    Keeps Kraken's CancelAllOrdersAfter timer armed from a background thread.
+
+    Every refresh pushes the trigger time timeout seconds into the future. If
+    the process crashes, is killed or loses its connection, the refreshes stop
+    and Kraken cancels all open orders on the account once the timer runs out,
+    so the exposure window is bounded by timeout instead of being unlimited.
+
+    The timer belongs to the API key, not to this process:
+    - When it fires it cancels every open order on the account, including
+      orders placed by hand or by other bots on the same key.
+    - Bots sharing a key share one timer. Disarming it on stop would leave the
+      other bots unprotected until their next refresh, so by default a stopping
+      bot lets the timer lapse instead (the others' refreshes keep it armed;
+      with none left, it fires timeout seconds later). disarm_on_stop=True is
+      only safe when this is the key's only bot.
+    """
+
+    def __init__(self, client: KrakenClient, timeout: int = 120, interval: float = 0, disarm_on_stop: bool = False):
+        """
+        Initialize dead man's switch.
+
+        Args:
+            client: Kraken client the timer is set through
+            timeout: Seconds without a refresh before Kraken cancels the orders
+            interval: Seconds between refreshes (timeout / 4 if 0)
+            disarm_on_stop: Reset the account's timer when stopping (only when no other
+                process uses the same API key)
+        """
+        self.client = client
+        self.timeout = timeout
+        self.interval = interval or timeout / 4
+        self.disarm_on_stop = disarm_on_stop
+        self.trigger_time = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="dead-mans-switch", daemon=True)
+
+    def start(self):
+        """Arm the switch and start refreshing it in the background."""
+        self.refresh()
+        self._thread.start()
+        logger.info("Dead man's switch armed: orders are cancelled %s seconds after the bot stops responding",
+                    self.timeout)
+
+    def stop(self):
+        """Stop refreshing and, with disarm_on_stop, disarm the switch."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        if not self.disarm_on_stop:
+            logger.info("Dead man's switch left to expire in %s seconds unless another bot on this API key refreshes it",
+                        self.timeout)
+            return
+        try:
+            self.client.cancel_all_orders_after(0)
+            logger.info("Dead man's switch disarmed")
+        except Exception as e:
+            logger.warning("Could not disarm dead man's switch: %s", e)
+
+    def refresh(self):
+        """Push the trigger time timeout seconds ahead."""
+        try:
+            self.trigger_time = self.client.cancel_all_orders_after(self.timeout)
+        except Exception as e:
+            logger.warning("Could not refresh dead man's switch (trigger time %s): %s", self.trigger_time, e)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.refresh()
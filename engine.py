@@ -0,0 +1,146 @@
+"""Asyncio engine that trades several pairs from one process."""
+import asyncio
+from functools import partial
+from typing import List, Optional
+from account_state import AccountState
+from config import Config
+from kraken_client import KrakenClient
+from grid_bot import create_bot
+from profiling import Profiler
+from trading_bot import (configure_logging, create_client, create_dead_mans_switch, create_fill_tracker,
+                         create_history_sync, create_journal, create_poll_scheduler, create_profiler, logger)
+
+
+class TradingEngine:
+    """Drive one buy/sell state machine (or grid, with GRID_LEVELS) per pair from a shared account state.
+
+    Each tick makes one open-orders refresh (a QueryOrders call for the bots' own
+    orders with the fill tracker, OpenOrders without) and one Balance call,
+    whatever the number of pairs, and every pair's bot reads from that shared snapshot.
+    """
+
+    def __init__(self, pair_configs: Optional[List[dict]] = None, client: Optional[KrakenClient] = None):
+        """Initialize trading engine.
+
+        Args:
+            pair_configs: Per-pair settings (defaults to Config.get_pair_configs())
+            client: Shared Kraken client (created from Config if not given)
+        """
+        # Validate configuration
+        Config.validate()
+
+        if client is None:
+            client = create_client()
+        self.client = client
+        if pair_configs is None:
+            pair_configs = Config.get_pair_configs()
+        tracker = create_fill_tracker(self.client, [pair_config['pair'] for pair_config in pair_configs])
+        self.account = AccountState(self.client, ttl=Config.ACCOUNT_STATE_TTL, journal=create_journal(),
+                                    tracker=tracker)
+        self.profiler: Optional[Profiler] = None  # set by run() when PROFILE_DIR is configured
+        self.bots = [
+            create_bot(client=self.client, pair_config=pair_config, account=self.account)
+            for pair_config in pair_configs
+        ]
+
+        logger.info("Trading engine initialized with %s pair(s): %s",
+            len(self.bots), ", ".join(bot.pair for bot in self.bots))
+
+    async def _call(self, func, *args):
+        """Run a blocking client call in the default executor (profiled during a cProfile capture)."""
+        loop = asyncio.get_running_loop()
+        if self.profiler is not None:
+            return await loop.run_in_executor(None, partial(self.profiler.call, func, *args))
+        return await loop.run_in_executor(None, partial(func, *args))
+
+    async def tick(self):
+        """Run one iteration of every pair's state machine."""
+        with self.client.metrics.timer('engine_tick_seconds'):
+            await self._call(self.account.refresh)
+            await asyncio.gather(*(self._call(bot.run_iteration) for bot in self.bots))
+
+    async def shutdown(self):
+        """Cancel every pair's open orders in one batch and log the final balances."""
+        if Config.CANCEL_ON_SHUTDOWN:
+            try:
+                await self._call(self.account.invalidate)
+                order_ids = [order_id for bot in self.bots for order_id in bot.pair_order_ids()]
+                if order_ids:
+                    logger.info("Cancelling %s open order(s) across %s pair(s)", len(order_ids), len(self.bots))
+                    await self._call(self.account.cancel_orders, order_ids)
+            except Exception as e:
+                logger.error("Error cancelling open orders: %s", e)
+        for bot in self.bots:
+            try:
+                await self._call(bot.shutdown, False)
+            except Exception as e:
+                logger.error("Error shutting down %s: %s", bot.pair, e)
+
+    async def run(self):
+        """Main engine loop."""
+        logger.info("=" * 60)
+        logger.info("Starting Crypto Trading Engine (LIMIT ORDERS, %s pairs)", len(self.bots))
+        logger.info("=" * 60)
+
+        iteration = 0
+        switch = await self._call(create_dead_mans_switch, self.client)
+        scheduler = create_poll_scheduler(self.client)
+        history = create_history_sync(self.client)
+        profiler = self.profiler = create_profiler(self.client)
+
+        try:
+            while True:
+                iteration += 1
+                logger.info("=" * 60)
+                logger.info("--- Iteration %s ---", iteration)
+                logger.info("=" * 60)
+
+                if profiler is not None:
+                    profiler.checkpoint()
+
+                try:
+                    await self.tick()
+                except Exception as e:
+                    logger.error("Error in trading iteration: %s", e)
+                    logger.info("Continuing to next iteration...")
+
+                if scheduler is not None:
+                    for bot in self.bots:
+                        scheduler.observe(bot.pair, bot.last_price)
+                    interval = scheduler.next_interval((bot.pair, bot.last_price, bot.levels) for bot in self.bots)
+                else:
+                    interval = Config.CHECK_INTERVAL
+                logger.info("Waiting %s seconds...", round(interval, 1))
+                await asyncio.sleep(interval)
+
+        except asyncio.CancelledError:
+            logger.info("\n" + "=" * 60)
+            logger.info("Engine stopped by user")
+            logger.info("=" * 60)
+
+            await self.shutdown()
+            if switch is not None:
+                await self._call(switch.stop)
+            if history is not None:
+                await self._call(history.stop)
+            if profiler is not None:
+                profiler.stop()
+
+
+def main():
+    """Main entry point."""
+    configure_logging()
+    try:
+        engine = TradingEngine()
+    except Exception as e:
+        logger.error("Failed to start engine: %s", e)
+        return
+
+    try:
+        asyncio.run(engine.run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
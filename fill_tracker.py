@@ -0,0 +1,170 @@
+"""Tracks the bot's own orders and detects their fills without scanning the whole account."""
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from journal import CLOSED_STATUSES
+from kraken_client import QUERY_ORDERS_BATCH, KrakenClient
+
+logger = logging.getLogger(__name__)
+
+# Seconds the ClosedOrders cursor is held back to allow for clock skew with Kraken
+CURSOR_MARGIN = 60
+
+
+class Fill(NamedTuple):
+    """Volume of a tracked order executed since the previous poll."""
+    txid: str
+    pair: str  # pair altname
+    side: str
+    volume: float  # newly executed volume
+    vol_exec: float  # total executed volume of the order
+    price: float  # average execution price of the order so far
+    status: str  # order status after the fill
+
+
+class FillTracker:
+    """
+    Remembers the txids of the bot's orders and checks only those for fills.
+
+    The bot's open orders are seeded once from OpenOrders (and the journal) and
+    from then on every order it places is added as it is placed. Each poll asks
+    Kraken about those orders alone:
+
+    - up to QUERY_ORDERS_BATCH tracked orders: one QueryOrders call covering all
+      of them, partial fills included;
+    - more than that: one ClosedOrders call with a start cursor reports which
+      tracked orders finished since the last poll, plus one rotating QueryOrders
+      batch that keeps the partial fills of the remaining orders current.
+
+    Detection cost therefore scales with the bot's own orders rather than with
+    every open order on the account, and fills are reported explicitly instead
+    of being inferred from an order disappearing.
+    """
+
+    def __init__(self, client: KrakenClient, pairs: Optional[Iterable[str]] = None):
+        """
+        Initialize fill tracker.
+
+        Args:
+            client: Kraken client used for QueryOrders/ClosedOrders
+            pairs: Pairs whose open orders are adopted when seeding (all pairs if None)
+        """
+        self.client = client
+        self.pairs = {client.get_pair_info(pair).altname for pair in pairs} if pairs else None
+        self.seeded = False
+        self.cursor = 0.0  # ClosedOrders start; 0 until the first full query
+        self.last_closed: Dict[str, dict] = {}  # orders that finished in the last poll
+        self._orders: Dict[str, Optional[dict]] = {}  # tracked txid -> last known details
+        self._rotation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def track(self, txid: str, order: Optional[dict] = None):
+        """Start tracking an order (details are fetched on the next poll if not given)."""
+        with self._lock:
+            self._orders.setdefault(txid, order)
+
+    def forget(self, txid: str):
+        """Stop tracking an order."""
+        with self._lock:
+            self._orders.pop(txid, None)
+
+    def seed(self, open_orders: Dict[str, dict], txids: Iterable[str] = ()):
+        """
+        Adopt the open orders on the tracked pairs, plus known txids (e.g. the journal's open orders).
+
+        Args:
+            open_orders: OpenOrders result, order_id -> order details
+            txids: Further order IDs to track
+        """
+        with self._lock:
+            for txid, order in open_orders.items():
+                if self.pairs is None or order.get('descr', {}).get('pair', '') in self.pairs:
+                    self._orders[txid] = order
+            for txid in txids:
+                self._orders.setdefault(txid, None)
+            self.seeded = True
+        logger.info("Fill tracker following %s order(s)", len(self._orders))
+
+    def open_orders(self) -> Dict[str, dict]:
+        """Tracked orders that are still open, in OpenOrders format."""
+        with self._lock:
+            return {txid: order for txid, order in self._orders.items() if order is not None}
+
+    def poll(self) -> List[Fill]:
+        """
+        Check the tracked orders for fills.
+
+        Finished orders are dropped from tracking and left in last_closed.
+
+        Returns:
+            Fills since the previous poll
+        """
+        with self._lock:
+            txids = list(self._orders)
+        if not txids:
+            self.last_closed = {}
+            return []
+
+        poll_start = time.time()
+        if len(txids) <= QUERY_ORDERS_BATCH or not self.cursor:
+            info = self._query(txids)
+        else:
+            tracked = set(txids)
+            info = {txid: order for txid, order in self.client.get_closed_orders(start=self.cursor).items()
+                    if txid in tracked}
+            rest = [txid for txid in txids if txid not in info]
+            if rest:
+                start = self._rotation % len(rest)
+                batch = (rest[start:] + rest[:start])[:QUERY_ORDERS_BATCH]
+                self._rotation = start + len(batch)
+                info.update(self._query(batch))
+        self.cursor = poll_start - CURSOR_MARGIN
+        return self._apply(info)
+
+    def _query(self, txids: List[str]) -> Dict[str, dict]:
+        try:
+            return self.client.query_orders(txids)
+        except Exception as e:
+            if "Invalid order" not in str(e):
+                raise
+        # One unknown txid fails the whole call: query one by one and stop tracking the unknown ones
+        info = {}
+        for txid in txids:
+            try:
+                info.update(self.client.query_orders([txid]))
+            except Exception as e:
+                if "Invalid order" not in str(e):
+                    raise
+                logger.warning("Kraken does not know order %s - no longer tracking it", txid)
+                self.forget(txid)
+        return info
+
+    def _apply(self, info: Dict[str, dict]) -> List[Fill]:
+        fills = []
+        closed = {}
+        with self._lock:
+            for txid, order in info.items():
+                if txid not in self._orders:
+                    continue
+                previous = self._orders[txid]
+                before = float(previous.get('vol_exec', 0) or 0) if previous else 0.0
+                vol_exec = float(order.get('vol_exec', 0) or 0)
+                status = order.get('status', '')
+                if vol_exec > before:
+                    descr = order.get('descr', {})
+                    fills.append(Fill(txid, descr.get('pair', ''), descr.get('type', ''), vol_exec - before,
+                                      vol_exec, float(order.get('price', 0) or 0), status))
+                if status in CLOSED_STATUSES:
+                    del self._orders[txid]
+                    closed[txid] = order
+                else:
+                    self._orders[txid] = order
+        for fill in fills:
+            logger.info("Fill: %s %s %.8f %s at avg $%s (%s)", fill.txid, fill.side, fill.volume, fill.pair,
+                        fill.price, fill.status)
+        self.last_closed = closed
+        return fills
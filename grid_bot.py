@@ -0,0 +1,217 @@
+"""Grid (ladder) trading mode: many buy/sell levels per pair, placed in batches."""
+import math
+import time
+from typing import Dict, List, Optional
+from account_state import AccountState
+from config import Config
+from kraken_client import KrakenClient
+from trading_bot import CryptoTradingBot
+import strategy
+
+# Share of an order's cost kept aside for Kraken's fee when budgeting buy levels
+FEE_ALLOWANCE = 0.0026
+
+
+class GridBot(CryptoTradingBot):
+    """
+    Keep GRID_LEVELS buy orders below BUY_PRICE and GRID_LEVELS sell orders above SELL_PRICE.
+
+    Each level holds at most one order. When a level's buy fills, it is re-armed
+    with a sell of the bought volume at the level's sell price; when its sell
+    fills, it is re-armed with a buy at the level's buy price. Orders are only
+    queried when they leave OpenOrders, and every order an iteration needs is
+    sent through AddOrderBatch, so a 30-level grid is placed in two calls.
+    """
+
+    def __init__(self, client: Optional[KrakenClient] = None, pair_config: Optional[dict] = None,
+                 account: Optional[AccountState] = None, levels: Optional[int] = None,
+                 spacing_pct: Optional[float] = None):
+        """Initialize grid bot.
+
+        Args:
+            client: Shared Kraken client (created from Config if not given)
+            pair_config: Per-pair settings from Config.get_pair_configs()
+            account: Shared account state (created for this bot if not given)
+            levels: Levels on each side of the grid (defaults to GRID_LEVELS)
+            spacing_pct: Distance between levels in percent (defaults to GRID_SPACING_PCT)
+        """
+        super().__init__(client=client, pair_config=pair_config, account=account)
+        self.grid_levels = Config.GRID_LEVELS if levels is None else levels
+        self.spacing_pct = Config.GRID_SPACING_PCT if spacing_pct is None else spacing_pct
+        self.grid = strategy.grid_levels(self.params, self.grid_levels, self.spacing_pct / 100,
+                                         self.pair_info.pair_decimals)
+        # Per level: side of its next/current order, order volume, working order id
+        self.slots: List[dict] = [{'level': level, 'side': level.side, 'volume': None, 'order_id': None}
+                                  for level in self.grid]
+        self._adopted = False
+        # Until orders are working, the poll scheduler watches every level of the grid
+        self.levels = [self._slot_price(slot) for slot in self.slots]
+
+        self.logger.info("Grid mode: %s levels per side, %s%% apart", self.grid_levels, self.spacing_pct)
+        self.logger.info("Buy ladder: %s", ", ".join("${}".format(level.buy_price)
+                                                     for level in self.grid[:self.grid_levels]))
+        self.logger.info("Sell ladder: %s", ", ".join("${}".format(level.sell_price)
+                                                      for level in self.grid[self.grid_levels:]))
+
+    def _slot_price(self, slot: dict) -> float:
+        return slot['level'].buy_price if slot['side'] == "buy" else slot['level'].sell_price
+
+    def _pair_orders(self, orders: Dict[str, dict]) -> Dict[str, dict]:
+        return {order_id: order for order_id, order in orders.items()
+                if order.get('descr', {}).get('pair', '') == self.pair_info.altname}
+
+    def _adopt(self, pair_orders: Dict[str, dict]):
+        """Attach open orders left by an earlier run to the levels they sit on."""
+        tick = 10 ** -self.pair_info.pair_decimals
+        for order_id, order in pair_orders.items():
+            descr = order.get('descr', {})
+            side = descr.get('type', '')
+            price = float(descr.get('price', 0) or 0)
+            for slot in self.slots:
+                if slot['order_id'] is not None:
+                    continue
+                level_price = slot['level'].buy_price if side == "buy" else slot['level'].sell_price
+                if abs(level_price - price) < tick / 2:
+                    slot.update(side=side, volume=float(order.get('vol', 0)), order_id=order_id)
+                    self.logger.info("Adopted open %s order %s at $%s", side, order_id, price)
+                    break
+        self._adopted = True
+
+    def _check_fills(self, pair_orders: Dict[str, dict]) -> int:
+        """Re-arm levels whose order left OpenOrders. Returns the number of filled levels."""
+        gone = [slot for slot in self.slots if slot['order_id'] and slot['order_id'] not in pair_orders]
+        if not gone:
+            return 0
+        # The fill tracker already fetched the orders that closed in its last poll
+        known = self.account.tracker.last_closed if self.account.tracker is not None else {}
+        info = {slot['order_id']: known[slot['order_id']] for slot in gone if slot['order_id'] in known}
+        missing = [slot['order_id'] for slot in gone if slot['order_id'] not in info]
+        if missing:
+            info.update(self.client.query_orders(missing))
+        filled = 0
+        for slot in gone:
+            order_id = slot['order_id']
+            order = info.get(order_id)
+            if order is None:
+                # Unknown to Kraken - place the level again
+                slot['order_id'] = None
+                continue
+            status = order.get('status', '')
+            vol_exec = float(order.get('vol_exec', 0) or 0)
+            if status == "closed" or (status in ("canceled", "expired") and vol_exec > 0):
+                filled += 1
+                level = slot['level']
+                if slot['side'] == "buy":
+                    self.logger.info("✓ Buy level $%s filled (%.8f %s) - re-arming as sell at $%s",
+                                     level.buy_price, vol_exec, self.base_asset, level.sell_price)
+                    slot.update(side="sell", volume=vol_exec, order_id=None)
+                else:
+                    self.logger.info("✓ Sell level $%s filled (%.8f %s) - re-arming as buy at $%s",
+                                     level.sell_price, vol_exec, self.base_asset, level.buy_price)
+                    slot.update(side="buy", volume=None, order_id=None)
+                if self.account.journal is not None:
+                    self.account.journal.record_event("grid_fill", self.pair_info.altname, order_id,
+                                                      "{} level {}/{}".format(status, level.buy_price, level.sell_price))
+            elif status in ("canceled", "expired"):
+                self.logger.warning("Grid order %s was %s - placing it again", order_id, status)
+                slot['order_id'] = None
+        return filled
+
+    def _plan_orders(self, orders: Dict[str, dict], balance: dict) -> List[dict]:
+        """Pick the idle levels that can be armed with the free balance."""
+        # Funds already committed to open orders are not free
+        free_usd = balance['usd_balance']
+        free_crypto = balance['crypto_amount']
+        for order in orders.values():
+            descr = order.get('descr', {})
+            remaining = float(order.get('vol', 0) or 0) - float(order.get('vol_exec', 0) or 0)
+            if descr.get('type') == "buy":
+                free_usd -= remaining * float(descr.get('price', 0) or 0) * (1 + FEE_ALLOWANCE)
+            elif descr.get('pair', '') == self.pair_info.altname:
+                free_crypto -= remaining
+
+        lot = self.pair_info.lot_decimals
+        planned = []
+        for slot in self.slots:
+            if slot['order_id'] is not None:
+                continue
+            price = self._slot_price(slot)
+            if slot['side'] == "buy":
+                volume = round(self.dollars_being_traded / price, lot)
+                cost = volume * price * (1 + FEE_ALLOWANCE)
+                if cost > free_usd:
+                    continue
+                free_usd -= cost
+            else:
+                wanted = round(slot['volume'] or self.dollars_being_traded / slot['level'].buy_price, lot)
+                # Round down so the order never asks for more than is free
+                volume = min(wanted, math.floor(free_crypto * 10 ** lot) / 10 ** lot)
+                if volume <= 0:
+                    continue
+                free_crypto -= volume
+            if volume < self.min_trade_size:
+                continue
+            slot['volume'] = volume
+            planned.append(slot)
+        return planned
+
+    def run_iteration(self):
+        """Re-arm filled levels and place every idle level the balance allows, in batches."""
+        metrics = self.client.metrics
+        start = time.perf_counter()
+        self.tick_time = time.time()
+        try:
+            orders = self.account.get_open_orders()
+            balance = self.get_balance()
+            pair_orders = self._pair_orders(orders)
+            fetched = time.perf_counter()
+            metrics.observe('bot_phase_seconds', fetched - start, pair=self.pair, phase='account')
+
+            if not self._adopted:
+                self._adopt(pair_orders)
+            filled = self._check_fills(pair_orders)
+            planned = self._plan_orders(orders, balance)
+            decided = time.perf_counter()
+            metrics.observe('bot_phase_seconds', decided - fetched, pair=self.pair, phase='decide')
+
+            placed = 0
+            if planned:
+                order_ids = self.account.place_limit_order_batch(
+                    self.pair, [(slot['side'], slot['volume'], self._slot_price(slot)) for slot in planned],
+                    tick_time=self.tick_time)
+                for slot, order_id in zip(planned, order_ids):
+                    if order_id:
+                        slot['order_id'] = order_id
+                        placed += 1
+            acted = time.perf_counter()
+            metrics.observe('bot_phase_seconds', acted - decided, pair=self.pair, phase='act')
+
+            self.levels = ([self._slot_price(slot) for slot in self.slots if slot['order_id']]
+                           or [self._slot_price(slot) for slot in self.slots])
+            working_buys = sum(1 for slot in self.slots if slot['order_id'] and slot['side'] == "buy")
+            working_sells = sum(1 for slot in self.slots if slot['order_id'] and slot['side'] == "sell")
+            self.logger.info("Grid: %s buy / %s sell orders working, %s level(s) idle; %s filled, %s placed",
+                             working_buys, working_sells, len(self.slots) - working_buys - working_sells,
+                             filled, placed)
+
+            current_price = self.get_current_price()
+            if current_price:
+                self.logger.info("Current %s Price: $%.4f. $%.2f USD currently in account",
+                                 self.base_asset, current_price, balance['usd_balance'])
+            metrics.observe('bot_phase_seconds', time.perf_counter() - acted, pair=self.pair, phase='price')
+
+        except Exception as e:
+            metrics.inc('bot_iteration_errors_total', pair=self.pair)
+            self.logger.error("Error in grid iteration: %s", e)
+            self.logger.info("Continuing to next iteration...")
+
+        metrics.inc('bot_iterations_total', pair=self.pair)
+        metrics.observe('bot_iteration_seconds', time.perf_counter() - start, pair=self.pair)
+
+
+def create_bot(client: Optional[KrakenClient] = None, pair_config: Optional[dict] = None,
+               account: Optional[AccountState] = None) -> CryptoTradingBot:
+    """Create a GridBot when GRID_LEVELS is set, otherwise the single buy/sell CryptoTradingBot."""
+    if Config.GRID_LEVELS > 0:
+        return GridBot(client=client, pair_config=pair_config, account=account)
+    return CryptoTradingBot(client=client, pair_config=pair_config, account=account)
@@ -0,0 +1,76 @@
+"""Shared keep-alive HTTP session for all Kraken REST traffic."""
+import logging
+from typing import Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTP adapter that enforces a (connect, read) timeout on every request."""
+
+    def __init__(self, timeout: Tuple[float, float], *args, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        # The SDK always passes its own flat 10 second timeout; ours wins
+        kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def create_session(connect_timeout: float = 5.0, read_timeout: float = 15.0,
+                   retries: int = 2, pool_size: int = 10) -> requests.Session:
+    """
+    Create a pooled session with explicit timeouts and bounded retries.
+
+    Connection failures are retried for any request (nothing reached Kraken),
+    while read errors and 5xx responses are only retried for idempotent GETs,
+    so an order is never submitted twice.
+
+    Args:
+        connect_timeout: Seconds to wait for a TCP/TLS connection
+        read_timeout: Seconds to wait for response data
+        retries: Maximum retries per request
+        pool_size: Keep-alive connections kept per host
+
+    Returns:
+        Configured requests session
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=0.3,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        raise_on_status=False,
+    )
+    adapter = TimeoutHTTPAdapter(
+        timeout=(connect_timeout, read_timeout),
+        max_retries=retry,
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+    )
+    session = requests.Session()
+    session.headers.update({"User-Agent": "python-kraken-sdk"})
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def share_session(session: requests.Session, *clients):
+    """
+    Make python-kraken-sdk REST clients send their requests through one session.
+
+    Args:
+        session: Session to share
+        clients: SDK clients (Market, Trade, User, ...)
+    """
+    for client in clients:
+        # The SDK keeps its session in a name-mangled private attribute and
+        # offers no way to pass one in
+        client._KrakenBaseSpotAPI__session = session
@@ -0,0 +1,227 @@
+"""Local SQLite journal of the bot's orders, fills and state transitions."""
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    txid TEXT PRIMARY KEY,
+    pair TEXT NOT NULL,
+    side TEXT NOT NULL,
+    price REAL NOT NULL,
+    volume REAL NOT NULL,
+    vol_exec REAL NOT NULL DEFAULT 0,
+    cost REAL NOT NULL DEFAULT 0,
+    fee REAL NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    source TEXT NOT NULL,
+    opened_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    closed_at REAL
+);
+CREATE INDEX IF NOT EXISTS orders_status ON orders (status);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    pair TEXT,
+    txid TEXT,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS events_txid ON events (txid);
+"""
+
+# Kraken order statuses that are final
+CLOSED_STATUSES = ("closed", "canceled", "expired")
+
+
+class OrderJournal:
+    """
+    Crash-safe record of every order the bot places, cancels or sees fill.
+
+    Backed by SQLite in WAL mode, so each order action is one small durable
+    append and readers never block the writer. reconcile() compares the orders
+    the journal believes are open with Kraken's OpenOrders and only queries the
+    ones that disappeared, so a restart picks up where the last run stopped
+    instead of rebuilding history from TradesHistory.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize order journal.
+
+        Args:
+            path: SQLite database file (created if missing)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+        open_count = self._db.execute("SELECT COUNT(*) FROM orders WHERE status = 'open'").fetchone()[0]
+        last = self._db.execute("SELECT MAX(ts) FROM events").fetchone()[0]
+        if last is not None:
+            logger.info("Order journal %s: %s open order(s), last activity %s", path, open_count,
+                        time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last)))
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+    def _event(self, kind: str, pair: Optional[str] = None, txid: Optional[str] = None, detail: str = "",
+               ts: Optional[float] = None):
+        self._db.execute("INSERT INTO events (ts, kind, pair, txid, detail) VALUES (?, ?, ?, ?, ?)",
+                         (ts or time.time(), kind, pair, txid, detail))
+
+    def record_event(self, kind: str, pair: Optional[str] = None, txid: Optional[str] = None, detail: str = ""):
+        """Record a state transition or other notable event."""
+        with self._lock, self._db:
+            self._event(kind, pair, txid, detail)
+
+    def record_placed(self, txid: str, pair: str, side: str, price: float, volume: float):
+        """Record an order the bot just placed."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO orders (txid, pair, side, price, volume, status, source, opened_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, 'open', 'bot', ?, ?)",
+                (txid, pair, side, price, volume, now, now))
+            self._event("placed", pair, txid, "{} {} @ {}".format(side, volume, price), now)
+
+    def record_cancelled(self, txid: str):
+        """Record that the bot cancelled an order."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("UPDATE orders SET status = 'canceled', updated_at = ?, closed_at = ? WHERE txid = ?",
+                             (now, now, txid))
+            self._event("cancelled", self._pair_of(txid), txid, "", now)
+
+    def _pair_of(self, txid: str) -> Optional[str]:
+        row = self._db.execute("SELECT pair FROM orders WHERE txid = ?", (txid,)).fetchone()
+        return row['pair'] if row else None
+
+    def open_orders(self, pairs: Optional[Iterable[str]] = None) -> Dict[str, sqlite3.Row]:
+        """
+        Orders the journal believes are still open, by txid.
+
+        Args:
+            pairs: Only orders for these pair altnames (all if None)
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM orders WHERE status = 'open'").fetchall()
+        if pairs is not None:
+            pairs = set(pairs)
+            rows = [row for row in rows if row['pair'] in pairs]
+        return {row['txid']: row for row in rows}
+
+    def sync_open_orders(self, open_orders: Dict[str, dict]) -> List[str]:
+        """
+        Apply a fresh OpenOrders snapshot.
+
+        Records partial fills of known orders and imports open orders the
+        journal has never seen (placed by hand or by an earlier version).
+
+        Args:
+            open_orders: OpenOrders result, order_id -> order details
+
+        Returns:
+            Txids the journal has as open that Kraken no longer lists
+        """
+        now = time.time()
+        with self._lock, self._db:
+            known = {row['txid']: row for row in
+                     self._db.execute("SELECT txid, pair, vol_exec FROM orders WHERE status = 'open'")}
+            for txid, order in open_orders.items():
+                descr = order.get('descr', {})
+                vol_exec = float(order.get('vol_exec', 0) or 0)
+                row = known.pop(txid, None)
+                if row is None:
+                    exists = self._db.execute("SELECT 1 FROM orders WHERE txid = ?", (txid,)).fetchone()
+                    if exists:
+                        continue
+                    self._db.execute(
+                        "INSERT INTO orders (txid, pair, side, price, volume, vol_exec, cost, fee, status, source, "
+                        "opened_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'open', 'exchange', ?, ?)",
+                        (txid, descr.get('pair', ''), descr.get('type', ''), float(descr.get('price', 0) or 0),
+                         float(order.get('vol', 0) or 0), vol_exec, float(order.get('cost', 0) or 0),
+                         float(order.get('fee', 0) or 0), float(order.get('opentm', now) or now), now))
+                    self._event("imported", descr.get('pair'), txid, descr.get('order', ''), now)
+                elif vol_exec > row['vol_exec']:
+                    self._db.execute(
+                        "UPDATE orders SET vol_exec = ?, cost = ?, fee = ?, updated_at = ? WHERE txid = ?",
+                        (vol_exec, float(order.get('cost', 0) or 0), float(order.get('fee', 0) or 0), now, txid))
+                    self._event("partial_fill", row['pair'], txid, "vol_exec {}".format(vol_exec), now)
+        return list(known)
+
+    def apply_order_info(self, orders: Dict[str, dict]):
+        """
+        Record the final state of orders from a QueryOrders result.
+
+        Args:
+            orders: QueryOrders result, txid -> order details
+        """
+        now = time.time()
+        with self._lock, self._db:
+            for txid, order in orders.items():
+                status = order.get('status', '')
+                if status not in CLOSED_STATUSES:
+                    continue
+                vol_exec = float(order.get('vol_exec', 0) or 0)
+                closed_at = float(order.get('closetm', now) or now)
+                self._db.execute(
+                    "UPDATE orders SET status = ?, vol_exec = ?, cost = ?, fee = ?, updated_at = ?, closed_at = ? "
+                    "WHERE txid = ?",
+                    (status, vol_exec, float(order.get('cost', 0) or 0), float(order.get('fee', 0) or 0), now,
+                     closed_at, txid))
+                kind = "filled" if status == "closed" else status
+                detail = "vol_exec {} avg price {}".format(vol_exec, order.get('price', '0'))
+                self._event(kind, self._pair_of(txid), txid, detail, closed_at)
+
+    def reconcile(self, client, open_orders: Dict[str, dict]) -> List[str]:
+        """
+        Bring the journal up to date with the exchange.
+
+        Only orders that left the OpenOrders list since the last sync are
+        queried (QueryOrders, batched), so a restart or a routine refresh
+        costs no extra calls unless something actually filled or was cancelled.
+
+        Args:
+            client: KrakenClient used to query finished orders
+            open_orders: Fresh OpenOrders result
+
+        Returns:
+            Txids whose final state was recorded
+        """
+        gone = self.sync_open_orders(open_orders)
+        if not gone:
+            return []
+        orders = client.query_orders(gone)
+        self.apply_order_info(orders)
+        for txid, order in orders.items():
+            logger.info("Journal: order %s %s (%s)", txid, order.get('status'), order.get('descr', {}).get('order', ''))
+        return [txid for txid in gone if txid in orders]
+
+    def history(self, pair: Optional[str] = None, limit: int = 100) -> List[sqlite3.Row]:
+        """
+        Most recent orders, newest first.
+
+        Args:
+            pair: Only orders for this pair altname (all if None)
+            limit: Maximum rows
+
+        Returns:
+            Order rows
+        """
+        with self._lock:
+            if pair:
+                return self._db.execute("SELECT * FROM orders WHERE pair = ? ORDER BY opened_at DESC LIMIT ?",
+                                        (pair, limit)).fetchall()
+            return self._db.execute("SELECT * FROM orders ORDER BY opened_at DESC LIMIT ?", (limit,)).fetchall()
@@ -1,30 +1,111 @@
 """Kraken API client for trading operations."""
 import logging
-from typing import Dict, Optional
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+import requests
 from kraken.spot import Market, Trade, User
+from asset_registry import AssetRegistry, PairInfo
+from http_session import share_session
+from market_data import PriceFeed
+from metrics import NULL_METRICS, Metrics
+from order_book import OrderBook, OrderBookFeed
+from order_prep import PreparedOrder, prepare_limit_order
+from rate_limiter import PRIORITY_ACCOUNT, PRIORITY_INFO, PRIORITY_TRADE, RateLimitGovernor
 
 logger = logging.getLogger(__name__)
 
+# Most txids Kraken accepts in one QueryOrders call
+QUERY_ORDERS_BATCH = 50
+# Most orders Kraken accepts in one AddOrderBatch call
+ADD_ORDER_BATCH = 15
+# Most txids Kraken accepts in one CancelOrderBatch call
+CANCEL_ORDER_BATCH = 50
+
 
 class KrakenClient:
     """Wrapper for Kraken API operations."""
     
-    def __init__(self, api_key: str, api_secret: str):
-        """Initialize Kraken client with credentials."""
+    def __init__(self, api_key: str, api_secret: str, price_feed: Optional[PriceFeed] = None,
+                 asset_cache_file: Optional[str] = None, asset_cache_ttl: float = 86400,
+                 governor: Optional[RateLimitGovernor] = None, session: Optional[requests.Session] = None,
+                 api_url: str = "", metrics: Optional[Metrics] = None,
+                 order_book: Optional[OrderBookFeed] = None):
+        """Initialize Kraken client with credentials.
+        
+        Args:
+            api_key: Kraken API key
+            api_secret: Kraken API secret
+            price_feed: Optional streaming price source used by get_current_price
+                before falling back to the REST ticker
+            asset_cache_file: Path of the on-disk asset pair metadata cache
+            asset_cache_ttl: Seconds before the asset pair cache is refreshed
+            governor: Optional rate limit governor that private calls queue on
+            session: Optional HTTP session shared by the Market, Trade and User clients
+                (see http_session.create_session)
+            api_url: Kraken REST base URL including the version path (SDK default if empty)
+            metrics: Optional metrics registry that records call counts, latency and errors
+            order_book: Optional streaming L2 order books consulted when placing orders
+        """
         self.api_key = api_key
         self.api_secret = api_secret
+        self.price_feed = price_feed
+        self.order_book = order_book
         
         # Initialize Kraken clients
-        self.market = Market()
-        self.trade = Trade(key=api_key, secret=api_secret)
-        self.user = User(key=api_key, secret=api_secret)
+        self.market = Market(url=api_url)
+        self.trade = Trade(key=api_key, secret=api_secret, url=api_url)
+        self.user = User(key=api_key, secret=api_secret, url=api_url)
+        
+        # One keep-alive connection pool for all REST traffic
+        if session is not None:
+            share_session(session, self.market, self.trade, self.user)
+        
+        # Pair/asset metadata, loaded on first lookup
+        self.registry = AssetRegistry(self.market, cache_file=asset_cache_file, ttl=asset_cache_ttl)
+        
+        # Kraken rejects private calls whose nonce is not increasing, so calls made
+        # from several threads (e.g. the multi-pair engine) are sent one at a time
+        self._private_lock = threading.Lock()
+        self.governor = governor
+        self.metrics = metrics if metrics is not None else NULL_METRICS
         
         logger.info("Kraken client initialized successfully")
     
+    @contextmanager
+    def _private_call(self, endpoint: str, priority: int):
+        """Queue a private call on the rate limit governor, then send it under the nonce lock."""
+        if self.governor is None:
+            with self._private_lock, self.metrics.track_call(endpoint):
+                yield
+            return
+        with self.governor.limit(endpoint, priority):
+            with self._private_lock, self.metrics.track_call(endpoint):
+                yield
+    
+    def get_pair_info(self, pair: str) -> PairInfo:
+        """
+        Get metadata for a trading pair.
+        
+        Args:
+            pair: Trading pair as REST key, altname or wsname (e.g., "XRPUSD")
+            
+        Returns:
+            Pair metadata
+        """
+        info = self.registry.get_pair(pair)
+        if info is None:
+            raise ValueError("Unknown trading pair: {}".format(pair))
+        return info
+    
     def get_current_price(self, pair: str) -> float:
         """
         Get current price for trading pair.
         
+        Reads the streaming price feed when it has a live price for the pair,
+        otherwise subscribes the pair to the feed and falls back to the REST ticker.
+        
         Args:
             pair: Trading pair (e.g., "XRPUSD")
             
@@ -32,45 +113,91 @@ class KrakenClient:
             Current price as float
         """
         try:
-            ticker = self.market.get_ticker(pair=pair)
-            logger.debug("Ticker response: {}".format(ticker))
+            info = self.get_pair_info(pair)
             
-            # Try different pair formats
-            price = None
-            pair_upper = pair.upper()
+            if self.price_feed is not None:
+                price = self.price_feed.get_price(info.wsname or info.altname)
+                if price is not None:
+                    return price
+                self.price_feed.subscribe(info.wsname or info.altname)
+            
+            with self.metrics.track_call("Ticker"):
+                ticker = self.market.get_ticker(pair=info.key)
+            logger.debug("Ticker response: %s", ticker)
             
             # Ticker API response structure varies - handle both with and without "result" wrapper
             result = ticker.get("result", ticker)
-            
-            # Special case for XBTUSD -> XXBTZUSD
-            if pair_upper == "XBTUSD" and "XXBTZUSD" in result:
-                price = float(result["XXBTZUSD"]["c"][0])
-            # Try exact match first
-            elif pair_upper in result:
-                price = float(result[pair_upper]["c"][0])
-            # Try with X prefix
-            elif "X{}".format(pair_upper) in result:
-                price = float(result["X{}".format(pair_upper)]["c"][0])
-            # Try with ZUSD for USD pairs
-            elif pair_upper.replace("USD", "ZUSD") in result:
-                price = float(result[pair_upper.replace("USD", "ZUSD")]["c"][0])
-            # Try X prefix with ZUSD
-            elif "X{}".format(pair_upper.replace("USD", "ZUSD")) in result:
-                price = float(result["X{}".format(pair_upper.replace("USD", "ZUSD"))]["c"][0])
-            # Fallback: use first available pair
-            else:
-                first_key = list(result.keys())[0]
-                price = float(result[first_key]["c"][0])
-                    
-            if price:
-                logger.debug("Current price for {}: ${}".format(pair, price))
-                return price
-            else:
+            if info.key not in result:
                 raise ValueError("Invalid response from ticker for {}".format(pair))
+            
+            price = float(result[info.key]["c"][0])
+            logger.debug("Current price for %s: $%s", pair, price)
+            return price
         except Exception as e:
-            logger.error("Error fetching current price: {}".format(e))
+            logger.error("Error fetching current price: %s", e)
             raise
     
+    def get_order_book(self, pair: str) -> Optional[OrderBook]:
+        """
+        Get the live L2 order book for a trading pair.
+        
+        Subscribes the pair to the order book feed if it has no valid book yet.
+        
+        Args:
+            pair: Trading pair (e.g., "XRPUSD")
+            
+        Returns:
+            The pair's order book, or None without a feed or while the book is not in sync
+        """
+        if self.order_book is None:
+            return None
+        info = self.get_pair_info(pair)
+        book = self.order_book.get_book(info.wsname or info.altname)
+        if book is None:
+            self.order_book.subscribe(info.wsname or info.altname)
+        return book
+    
+    def _check_book(self, pair: str, side: str, price: float):
+        """Log the spread and queue position a limit order is about to join."""
+        try:
+            book = self.get_order_book(pair)
+        except Exception as e:
+            logger.debug("Order book unavailable for %s: %s", pair, e)
+            return
+        if book is None:
+            return
+        best_bid, best_ask = book.best_bid(), book.best_ask()
+        crosses = (best_ask is not None and price >= best_ask) if side == "buy" else \
+            (best_bid is not None and price <= best_bid)
+        if crosses:
+            logger.warning("Limit %s at $%s on %s crosses the spread (bid $%s / ask $%s) and will fill as taker",
+                           side, price, pair, best_bid, best_ask)
+        else:
+            logger.info("Order book %s: bid $%s / ask $%s, %s queued ahead of a %s at $%s, imbalance %s",
+                        pair, best_bid, best_ask, book.volume_ahead(side, price), side, price, book.imbalance())
+    
+    def get_ohlc(self, pair: str, interval: int = 1, since: Optional[int] = None) -> List[list]:
+        """
+        Get OHLC candles for a trading pair (Kraken returns at most the last 720).
+        
+        Args:
+            pair: Trading pair (e.g., "XRPUSD")
+            interval: Candle length in minutes (1, 5, 15, 30, 60, 240, 1440, 10080, 21600)
+            since: Only candles after this Unix timestamp
+            
+        Returns:
+            Rows of [time, open, high, low, close, vwap, volume, count] as floats, oldest first
+        """
+        info = self.get_pair_info(pair)
+        with self.metrics.track_call("OHLC"):
+            response = self.market.get_ohlc(pair=info.key, interval=interval, since=since)
+        result = response.get("result", response)
+        rows = result.get(info.key)
+        if rows is None:
+            # Some pairs are keyed by altname
+            rows = next((value for key, value in result.items() if key != "last"), [])
+        return [[float(value) for value in row] for row in rows]
+    
     def get_balance(self) -> Dict[str, float]:
         """
         Get account balance.
@@ -79,8 +206,9 @@ class KrakenClient:
             Dictionary with asset balances
         """
         try:
-            response = self.user.get_account_balance()
-            logger.debug("Full API response: {}".format(response))
+            with self._private_call("Balance", PRIORITY_ACCOUNT):
+                response = self.user.get_account_balance()
+            logger.debug("Full API response: %s", response)
             
             # Handle both response formats: with or without "result" wrapper
             balance_data = response if "result" not in response else response["result"]
@@ -88,52 +216,101 @@ class KrakenClient:
             balance = {}
             for asset, amount in balance_data.items():
                 balance[asset] = float(amount)
-            logger.debug("Current balance: {}".format(balance))
+            logger.debug("Current balance: %s", balance)
             return balance
         except Exception as e:
-            logger.error("Error fetching balance: {}".format(e))
-            logger.error("Exception type: {}".format(type(e)))
+            logger.error("Error fetching balance: %s", e)
+            logger.error("Exception type: %s", type(e))
             raise
     
-    def place_limit_buy_order(self, pair: str, volume: float, price: float) -> Optional[str]:
+    def prepare_limit_order(self, pair: str, side: str, volume: float, price: float) -> PreparedOrder:
         """
-        Place a limit buy order.
+        Quantize a limit order to the pair's precision and check it against the pair's minimums.
         
         Args:
             pair: Trading pair (e.g., "XRPUSD")
-            volume: Amount to buy in base currency (crypto)
+            side: "buy" or "sell"
+            volume: Amount in base currency (crypto)
             price: Limit price in USD
             
+        Returns:
+            Order ready for submit_order
+            
+        Raises:
+            ValueError: If Kraken would reject the order
+        """
+        return prepare_limit_order(self.get_pair_info(pair), side, volume, price)
+    
+    def submit_order(self, order: PreparedOrder, tick_time: Optional[float] = None) -> Optional[str]:
+        """
+        Send a prepared limit order.
+        
+        Args:
+            order: Order from prepare_limit_order
+            tick_time: time.time() of the market observation that triggered the
+                order; the time from it to Kraken's acknowledgement is recorded
+                as order_tick_to_ack_seconds
+            
         Returns:
             Order transaction ID if successful, None otherwise
         """
         try:
-            logger.info("Placing limit buy order: {} {} at ${}".format(volume, pair, price))
-            response = self.trade.create_order(
-                pair=pair,
-                side="buy",
-                ordertype="limit",
-                volume=str(volume),
-                price=str(price)
-            )
+            logger.info("Placing limit %s order: %s %s at $%s", order.side, order.volume, order.pair, order.price)
+            self._check_book(order.pair, order.side, float(order.price))
+            with self._private_call("AddOrder", PRIORITY_TRADE):
+                response = self.trade.create_order(
+                    pair=order.pair,
+                    side=order.side,
+                    ordertype="limit",
+                    volume=order.volume,
+                    price=order.price
+                )
+            self._record_ack(order.pair, [order.side], tick_time)
             
             # Handle both response structures
             if "txid" in response:
                 order_id = response["txid"][0] if isinstance(response["txid"], list) else response["txid"]
-                logger.info("Limit buy order placed successfully. Order ID: {}".format(order_id))
+                logger.info("Limit %s order placed successfully. Order ID: %s", order.side, order_id)
                 return order_id
             elif "result" in response and "txid" in response["result"]:
                 order_id = response["result"]["txid"][0] if isinstance(response["result"]["txid"], list) else response["result"]["txid"]
-                logger.info("Limit buy order placed successfully. Order ID: {}".format(order_id))
+                logger.info("Limit %s order placed successfully. Order ID: %s", order.side, order_id)
                 return order_id
             else:
-                logger.error("Failed to place limit buy order: {}".format(response))
+                logger.error("Failed to place limit %s order: %s", order.side, response)
                 return None
         except Exception as e:
-            logger.error("Error placing limit buy order: {}".format(e))
+            logger.error("Error placing limit %s order: %s", order.side, e)
             raise
     
-    def place_limit_sell_order(self, pair: str, volume: float, price: float) -> Optional[str]:
+    def _record_ack(self, pair: str, sides: List[str], tick_time: Optional[float]):
+        """Record the tick-to-ack latency of orders Kraken just acknowledged."""
+        if tick_time is None:
+            return
+        latency = time.time() - tick_time
+        pair = self.get_pair_info(pair).altname
+        for side in sides:
+            self.metrics.observe('order_tick_to_ack_seconds', latency, pair=pair, side=side)
+        logger.info("%s order(s) on %s acknowledged %.1f ms after the tick", len(sides), pair, latency * 1000)
+    
+    def place_limit_buy_order(self, pair: str, volume: float, price: float,
+                              tick_time: Optional[float] = None) -> Optional[str]:
+        """
+        Place a limit buy order.
+        
+        Args:
+            pair: Trading pair (e.g., "XRPUSD")
+            volume: Amount to buy in base currency (crypto)
+            price: Limit price in USD
+            tick_time: time.time() of the market observation that triggered the order
+            
+        Returns:
+            Order transaction ID if successful, None otherwise
+        """
+        return self.submit_order(self.prepare_limit_order(pair, "buy", volume, price), tick_time)
+    
+    def place_limit_sell_order(self, pair: str, volume: float, price: float,
+                               tick_time: Optional[float] = None) -> Optional[str]:
         """
         Place a limit sell order.
         
@@ -141,35 +318,80 @@ class KrakenClient:
             pair: Trading pair (e.g., "XRPUSD")
             volume: Amount to sell in base currency (crypto)
             price: Limit price in USD
+            tick_time: time.time() of the market observation that triggered the order
             
         Returns:
             Order transaction ID if successful, None otherwise
         """
-        try:
-            logger.info("Placing limit sell order: {} {} at ${}".format(volume, pair, price))
-            response = self.trade.create_order(
-                pair=pair,
-                side="sell",
-                ordertype="limit",
-                volume=str(volume),
-                price=str(price)
-            )
+        return self.submit_order(self.prepare_limit_order(pair, "sell", volume, price), tick_time)
+    
+    def place_limit_order_batch(self, pair: str, orders: List[Tuple[str, float, float]],
+                                tick_time: Optional[float] = None) -> List[Optional[str]]:
+        """
+        Place several limit orders on one pair with AddOrderBatch.
+        
+        Every order is quantized and checked first; orders Kraken would reject
+        are left out of the request. The rest are sent in chunks of
+        ADD_ORDER_BATCH, so placing a 30-level grid costs two calls instead of
+        thirty. A chunk of one goes through AddOrder, which Kraken requires for
+        single orders.
+        
+        Args:
+            pair: Trading pair (e.g., "XRPUSD")
+            orders: (side, volume, price) for each order
+            tick_time: time.time() of the market observation that triggered the orders
             
-            # Handle both response structures
-            if "txid" in response:
-                order_id = response["txid"][0] if isinstance(response["txid"], list) else response["txid"]
-                logger.info("Limit sell order placed successfully. Order ID: {}".format(order_id))
-                return order_id
-            elif "result" in response and "txid" in response["result"]:
-                order_id = response["result"]["txid"][0] if isinstance(response["result"]["txid"], list) else response["result"]["txid"]
-                logger.info("Limit sell order placed successfully. Order ID: {}".format(order_id))
-                return order_id
-            else:
-                logger.error("Failed to place limit sell order: {}".format(response))
-                return None
-        except Exception as e:
-            logger.error("Error placing limit sell order: {}".format(e))
-            raise
+        Returns:
+            Order transaction ID for each order, in order (None where it was invalid or Kraken rejected it)
+        """
+        order_ids: List[Optional[str]] = [None] * len(orders)
+        prepared: List[Tuple[int, PreparedOrder]] = []
+        for index, (side, volume, price) in enumerate(orders):
+            try:
+                prepared.append((index, self.prepare_limit_order(pair, side, volume, price)))
+            except ValueError as e:
+                logger.error("Not placing %s order %s %s at $%s: %s", side, volume, pair, price, e)
+        
+        for i in range(0, len(prepared), ADD_ORDER_BATCH):
+            chunk = prepared[i:i + ADD_ORDER_BATCH]
+            if len(chunk) == 1:
+                index, order = chunk[0]
+                try:
+                    order_ids[index] = self.submit_order(order, tick_time)
+                except Exception:
+                    pass
+                continue
+            
+            logger.info("Placing %s limit orders on %s in one batch", len(chunk), pair)
+            for _, order in chunk:
+                self._check_book(pair, order.side, float(order.price))
+            try:
+                with self._private_call("AddOrderBatch", PRIORITY_TRADE):
+                    response = self.trade.create_order_batch(
+                        orders=[{"ordertype": "limit", "type": order.side, "volume": order.volume, "price": order.price}
+                                for _, order in chunk],
+                        pair=chunk[0][1].pair
+                    )
+            except Exception as e:
+                logger.error("Error placing order batch on %s: %s", pair, e)
+                continue
+            
+            # Handle both response formats; one result per order, in request order
+            results = response.get("result", response).get("orders", [])
+            for j, (index, order) in enumerate(chunk):
+                result = results[j] if j < len(results) else {}
+                txid = result.get("txid")
+                if isinstance(txid, list):
+                    txid = txid[0] if txid else None
+                if txid:
+                    logger.info("Limit %s order placed: %s %s at $%s. Order ID: %s", order.side, order.volume, pair,
+                                order.price, txid)
+                else:
+                    logger.error("Batch %s order %s %s at $%s rejected: %s", order.side, order.volume, pair,
+                                 order.price, result.get("error", result))
+                order_ids[index] = txid or None
+            self._record_ack(chunk[0][1].pair, [order.side for _, order in chunk], tick_time)
+        return order_ids
     
     def get_order_status(self, order_id: str) -> Optional[dict]:
         """
@@ -182,36 +404,141 @@ class KrakenClient:
             Order details if found, None otherwise
         """
         try:
-            response = self.user.get_orders_info(txid=order_id)
-            if "result" in response:
-                orders = response["result"].get("orders", {})
-                if order_id in orders:
-                    return orders[order_id]
-            return None
+            return self.query_orders([order_id]).get(order_id)
         except Exception as e:
-            logger.error("Error fetching order status: {}".format(e))
+            logger.error("Error fetching order status: %s", e)
             return None
     
+    def query_orders(self, order_ids: List[str]) -> Dict[str, dict]:
+        """
+        Get the details of several orders, open or closed.
+        
+        Args:
+            order_ids: Order transaction IDs (sent in batches of QUERY_ORDERS_BATCH)
+            
+        Returns:
+            Dictionary of order details with order_id as key
+        """
+        orders = {}
+        for i in range(0, len(order_ids), QUERY_ORDERS_BATCH):
+            batch = order_ids[i:i + QUERY_ORDERS_BATCH]
+            with self._private_call("QueryOrders", PRIORITY_ACCOUNT):
+                response = self.user.get_orders_info(txid=",".join(batch))
+            
+            # Handle both response formats
+            orders.update(response.get("result", response))
+        return orders
+    
+    def get_closed_orders(self, start: float = 0) -> Dict[str, dict]:
+        """
+        Get the orders closed (filled, cancelled or expired) after a point in time.
+        
+        Follows ClosedOrders' 50-order pages until every order is fetched.
+        
+        Args:
+            start: Only orders closed after this Unix timestamp (0 = all)
+            
+        Returns:
+            Dictionary of order details with order_id as key
+        """
+        orders = {}
+        while True:
+            with self._private_call("ClosedOrders", PRIORITY_ACCOUNT):
+                response = self.user.get_closed_orders(start=int(start) or None, ofs=len(orders) or None)
+            
+            # Handle both response formats
+            result = response.get("result", response)
+            page = result.get("closed", {})
+            orders.update(page)
+            if not page or len(orders) >= int(result.get("count", 0)):
+                return orders
+    
+    def get_trades_history(self, start: Optional[float] = None, end: Optional[float] = None,
+                           ofs: int = 0) -> Tuple[Dict[str, dict], int]:
+        """
+        Get one page (up to 50 trades, newest first) of the account's executed trades.
+        
+        TradesHistory costs 2 on the rate limit counter and is queued behind
+        trading and account calls.
+        
+        Args:
+            start: Only trades after this Unix timestamp (all if None)
+            end: Only trades up to this Unix timestamp (up to now if None)
+            ofs: Offset into the result set
+            
+        Returns:
+            (trade details with trade txid as key, total number of trades in the range)
+        """
+        with self._private_call("TradesHistory", PRIORITY_INFO):
+            response = self.user.get_trades_history(
+                start=int(start) if start is not None else None,
+                end=int(end) if end is not None else None,
+                ofs=ofs or None
+            )
+        
+        # Handle both response formats
+        result = response.get("result", response)
+        return result.get("trades", {}), int(result.get("count", 0))
+    
+    def get_ledgers(self, start: Optional[float] = None, end: Optional[float] = None,
+                    ofs: int = 0) -> Tuple[Dict[str, dict], int]:
+        """
+        Get one page (up to 50 entries, newest first) of the account's ledger.
+        
+        Ledgers costs 2 on the rate limit counter and is queued behind trading
+        and account calls.
+        
+        Args:
+            start: Only entries after this Unix timestamp (all if None)
+            end: Only entries up to this Unix timestamp (up to now if None)
+            ofs: Offset into the result set
+            
+        Returns:
+            (ledger entries with ledger id as key, total number of entries in the range)
+        """
+        with self._private_call("Ledgers", PRIORITY_INFO):
+            response = self.user.get_ledgers_info(
+                start=int(start) if start is not None else None,
+                end=int(end) if end is not None else None,
+                ofs=ofs or None
+            )
+        
+        # Handle both response formats
+        result = response.get("result", response)
+        return result.get("ledger", {}), int(result.get("count", 0))
+    
+    def fetch_open_orders(self) -> Dict[str, dict]:
+        """
+        Get all open orders, raising if they cannot be read.
+        
+        Returns:
+            Dictionary of open orders with order_id as key, order details as value
+            
+        Raises:
+            Exception: If the OpenOrders call fails
+        """
+        with self._private_call("OpenOrders", PRIORITY_ACCOUNT):
+            response = self.user.get_open_orders()
+        
+        # Handle both response formats
+        if "result" in response:
+            return response["result"].get("open", {})
+        if "open" in response:
+            return response["open"]
+        return {}
+    
     def get_open_orders(self) -> Optional[Dict[str, dict]]:
         """
         Get all open orders.
         
         Returns:
             Dictionary of open orders with order_id as key, order details as value
+            ({} if they could not be read)
         """
         try:
-            response = self.user.get_open_orders()
-            
-            # Handle both response formats
-            if "result" in response:
-                orders = response["result"].get("open", {})
-            elif "open" in response:
-                orders = response["open"]
-            else:
-                orders = {}
-            return orders
+            return self.fetch_open_orders()
         except Exception as e:
-            logger.error("Error fetching open orders: {}".format(e))
+            logger.error("Error fetching open orders: %s", e)
             return {}
     
     def cancel_order(self, order_id: str) -> bool:
@@ -225,11 +552,72 @@ class KrakenClient:
             True if successful, False otherwise
         """
         try:
-            response = self.trade.cancel_order(txid=order_id)
-            if "result" in response:
-                logger.info("Order {} cancelled successfully".format(order_id))
+            with self._private_call("CancelOrder", PRIORITY_TRADE):
+                response = self.trade.cancel_order(txid=order_id)
+            # Handle both response formats ({"count": 1} once the SDK unwraps "result")
+            if "result" in response or "count" in response:
+                logger.info("Order %s cancelled successfully", order_id)
                 return True
             return False
         except Exception as e:
-            logger.error("Error cancelling order {}: {}".format(order_id, e))
+            logger.error("Error cancelling order %s: %s", order_id, e)
             raise
+    
+    def cancel_orders(self, order_ids: List[str]) -> int:
+        """
+        Cancel several orders with CancelOrderBatch.
+        
+        Args:
+            order_ids: Order transaction IDs (sent in batches of CANCEL_ORDER_BATCH)
+            
+        Returns:
+            Number of orders Kraken cancelled
+        """
+        cancelled = 0
+        for i in range(0, len(order_ids), CANCEL_ORDER_BATCH):
+            batch = order_ids[i:i + CANCEL_ORDER_BATCH]
+            if len(batch) == 1:
+                cancelled += int(self.cancel_order(batch[0]))
+                continue
+            try:
+                with self._private_call("CancelOrderBatch", PRIORITY_TRADE):
+                    response = self.trade.cancel_order_batch(orders=batch)
+                count = int(response.get("result", response).get("count", 0))
+                logger.info("Cancelled %s of %s orders in one batch", count, len(batch))
+                cancelled += count
+            except Exception as e:
+                logger.error("Error cancelling %s orders: %s", len(batch), e)
+                raise
+        return cancelled
+    
+    def cancel_all_orders(self) -> int:
+        """
+        Cancel every open order on the account (CancelAll), including ones the bot did not place.
+        
+        Returns:
+            Number of orders Kraken cancelled
+        """
+        with self._private_call("CancelAll", PRIORITY_TRADE):
+            response = self.trade.cancel_all_orders()
+        count = int(response.get("result", response).get("count", 0))
+        logger.info("Cancelled all %s open orders", count)
+        return count
+    
+    def cancel_all_orders_after(self, timeout: int) -> Optional[str]:
+        """
+        Arm, refresh or disarm Kraken's dead man's switch (CancelAllOrdersAfter).
+        
+        Unless called again within timeout seconds, Kraken cancels every open
+        order on the account.
+        
+        Args:
+            timeout: Seconds until the orders are cancelled (0 disarms the switch)
+            
+        Returns:
+            Trigger time reported by Kraken (None when disarmed)
+        """
+        with self._private_call("CancelAllOrdersAfter", PRIORITY_TRADE):
+            response = self.trade.cancel_all_orders_after_x(timeout=timeout)
+        trigger = response.get("result", response).get("triggerTime")
+        logger.debug("CancelAllOrdersAfter(%s): trigger time %s", timeout, trigger)
+        return trigger if timeout else None
@@ -0,0 +1,149 @@
+"""Non-blocking log pipeline: queue handler in the trading loop, writer thread for the files."""
+import atexit
+import copy
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+from typing import List, Optional
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Renders tracebacks before records are queued
+_EXC_FORMATTER = logging.Formatter()
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves message formatting to the writer thread.
+
+    The stock QueueHandler formats every record before enqueueing it, which
+    keeps the formatting cost on the caller's thread. Here only the traceback
+    (which cannot outlive the frame) is rendered up front; the message and its
+    arguments are formatted by the listener, so log arguments must not be
+    mutated after the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record = copy.copy(record)
+            record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One compact JSON object per record: ts, level, logger, msg, plus pair and exc when present."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = {
+            'ts': round(record.created, 6),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        pair = getattr(record, 'pair', None)
+        if pair:
+            event['pair'] = pair
+        if record.exc_text:
+            event['exc'] = record.exc_text
+        return json.dumps(event, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def _gzip_namer(name: str) -> str:
+    return name + ".gz"
+
+
+def _gzip_rotator(source: str, dest: str):
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def _stop_listener(listener: logging.handlers.QueueListener):
+    # QueueListener.stop() fails if the listener was already stopped
+    if listener._thread is not None:
+        listener.stop()
+
+
+def rotating_handler(path: str, max_bytes: int = 0, rotate_when: str = "", backup_count: int = 5,
+                     compress: bool = True) -> logging.Handler:
+    """
+    Create a file handler that rotates by time (rotate_when) or size (max_bytes).
+
+    Args:
+        path: Log file path
+        max_bytes: Rotate when the file would exceed this size (0 = never by size)
+        rotate_when: TimedRotatingFileHandler interval, e.g. "midnight" or "H" (takes precedence over max_bytes)
+        backup_count: Rotated files to keep
+        compress: Gzip rotated files
+
+    Returns:
+        File handler
+    """
+    if rotate_when:
+        handler = logging.handlers.TimedRotatingFileHandler(path, when=rotate_when, backupCount=backup_count,
+                                                            encoding='utf-8')
+    else:
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                       encoding='utf-8')
+    if compress:
+        handler.namer = _gzip_namer
+        handler.rotator = _gzip_rotator
+    return handler
+
+
+def setup_logging(level: str = "INFO", log_file: Optional[str] = "trading_bot.log", max_bytes: int = 10485760,
+                  rotate_when: str = "", backup_count: int = 5, compress: bool = True, json_file: str = "",
+                  console: bool = True) -> logging.handlers.QueueListener:
+    """
+    Route all logging through a queue drained by a background writer thread.
+
+    Callers only enqueue records; formatting, file writes, rotation and
+    compression all happen on the listener thread. The listener is stopped
+    (and the queue flushed) at interpreter exit.
+
+    Args:
+        level: Root log level
+        log_file: Text log path (None or "" for no text file)
+        max_bytes: Size at which the text and JSON logs rotate (0 = never by size)
+        rotate_when: Rotate by time instead, e.g. "midnight"
+        backup_count: Rotated files kept per log
+        compress: Gzip rotated files
+        json_file: Path of a JSON-lines event log ("" = off)
+        console: Also write INFO and above to stderr
+
+    Returns:
+        Running queue listener
+    """
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers: List[logging.Handler] = []
+    if log_file:
+        handler = rotating_handler(log_file, max_bytes, rotate_when, backup_count, compress)
+        handler.setFormatter(formatter)
+        handlers.append(handler)
+    if json_file:
+        handler = rotating_handler(json_file, max_bytes, rotate_when, backup_count, compress)
+        handler.setFormatter(JsonLinesFormatter())
+        handlers.append(handler)
+    if console:
+        handler = logging.StreamHandler()
+        handler.setLevel(logging.INFO)
+        handler.setFormatter(formatter)
+        handlers.append(handler)
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(_stop_listener, listener)
+
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+        old.close()
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(level)
+    return listener
@@ -0,0 +1,254 @@
+"""Streaming market data from Kraken's public WebSocket API."""
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set
+import websockets
+
+logger = logging.getLogger(__name__)
+
+# Quote currencies recognised when turning a REST pair name ("XBTUSD") into a
+# WebSocket pair name ("XBT/USD"). Longest first so "USDT" wins over "USD".
+QUOTE_CURRENCIES = ("USDT", "USDC", "ZUSD", "ZEUR", "ZGBP", "ZCAD", "ZJPY", "USD", "EUR", "GBP", "CAD", "JPY", "XBT", "ETH")
+
+
+def to_ws_pair(pair: str) -> str:
+    """
+    Convert a REST pair name to Kraken's WebSocket pair name.
+
+    Args:
+        pair: Trading pair (e.g., "XBTUSD" or "XBT/USD")
+
+    Returns:
+        WebSocket pair name (e.g., "XBT/USD")
+    """
+    pair = pair.upper()
+    if "/" in pair:
+        return pair
+    for quote in QUOTE_CURRENCIES:
+        if pair.endswith(quote) and len(pair) > len(quote):
+            base = pair[:-len(quote)]
+            # REST keys such as XXBTZUSD carry X/Z prefixes the WebSocket names drop
+            if len(base) == 4 and base[0] == "X":
+                base = base[1:]
+            if len(quote) == 4 and quote[0] == "Z":
+                quote = quote[1:]
+            return "{}/{}".format(base, quote)
+    return pair
+
+
+class PriceFeed:
+    """
+    Last-price cache fed by Kraken's public ticker/trade WebSocket channels.
+
+    The feed runs its own asyncio loop in a daemon thread, reconnects with
+    exponential backoff and resubscribes every pair after a reconnect. Reads
+    through get_price() never block and return None whenever the price cannot
+    be trusted (not subscribed yet, or the connection dropped), so callers can
+    fall back to the REST ticker.
+    """
+
+    DEFAULT_URL = "wss://ws.kraken.com"
+
+    def __init__(self, url: str = DEFAULT_URL, channels: Iterable[str] = ("ticker",),
+                 idle_timeout: float = 15.0, reconnect_delay: float = 1.0, max_reconnect_delay: float = 60.0,
+                 record_file: Optional[str] = None):
+        """
+        Initialize price feed.
+
+        Args:
+            url: WebSocket endpoint (a local ws:// stand-in can be used for testing)
+            channels: Public channels to subscribe to ("ticker" and/or "trade")
+            idle_timeout: Seconds without any message (Kraken sends heartbeats
+                every second) before the connection is considered dead
+            reconnect_delay: Seconds before the first reconnect attempt (doubled on each failure)
+            max_reconnect_delay: Upper bound for the reconnect backoff in seconds
+            record_file: Append every raw message to this file, one per line, for
+                replaying with ws_replay.py (None = off)
+        """
+        self.url = url
+        self.channels = tuple(channels)
+        self.idle_timeout = idle_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._record = open(record_file, "a") if record_file else None
+
+        self._lock = threading.Lock()
+        self._pairs: Set[str] = set()
+        self._live: Set[str] = set()  # WebSocket pair names with a price from the current connection
+        self._prices: Dict[str, float] = {}
+        self._updated: Dict[str, float] = {}
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._socket = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.reconnects = 0
+
+    def start(self):
+        """Start streaming in a background thread."""
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="price-feed", daemon=True)
+        self._thread.start()
+        logger.info("Price feed started (%s)", self.url)
+
+    def stop(self, timeout: float = 5.0):
+        """Stop streaming and wait for the background thread to exit."""
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._loop.call_soon_threadsafe(self._cancel_tasks)
+        self._thread.join(timeout)
+        self._thread = None
+        if self._record is not None:
+            self._record.close()
+            self._record = None
+        logger.info("Price feed stopped")
+
+    def subscribe(self, pair: str):
+        """
+        Start streaming prices for a pair (no-op if already subscribed).
+
+        Args:
+            pair: Trading pair (e.g., "XBTUSD" or "XBT/USD")
+        """
+        ws_pair = to_ws_pair(pair)
+        with self._lock:
+            if ws_pair in self._pairs:
+                return
+            self._pairs.add(ws_pair)
+        loop = self._loop
+        if loop is not None and self._socket is not None:
+            asyncio.run_coroutine_threadsafe(self._send_subscribe([ws_pair]), loop)
+
+    def get_price(self, pair: str) -> Optional[float]:
+        """
+        Get the last streamed price for a pair without blocking.
+
+        Args:
+            pair: Trading pair (e.g., "XBTUSD" or "XBT/USD")
+
+        Returns:
+            Last price, or None if no live price is available
+        """
+        ws_pair = to_ws_pair(pair)
+        if ws_pair not in self._live:
+            return None
+        return self._prices.get(ws_pair)
+
+    def get_age(self, pair: str) -> Optional[float]:
+        """Seconds since the pair's price was last updated, None if never."""
+        updated = self._updated.get(to_ws_pair(pair))
+        return None if updated is None else time.time() - updated
+
+    @property
+    def connected(self) -> bool:
+        """True while a WebSocket connection is open."""
+        return self._socket is not None
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._run_forever())
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+            self._loop = None
+
+    def _cancel_tasks(self):
+        for task in asyncio.all_tasks(self._loop):
+            task.cancel()
+
+    async def _run_forever(self):
+        """Connect, stream and reconnect with exponential backoff until stopped."""
+        delay = self.reconnect_delay
+        while not self._stopping:
+            try:
+                await self._stream()
+                delay = self.reconnect_delay
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Price feed connection error: %s", e)
+            finally:
+                self._socket = None
+                with self._lock:
+                    self._live.clear()
+            if self._stopping:
+                break
+            self.reconnects += 1
+            logger.info("Price feed reconnecting in %.1f seconds...", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _stream(self):
+        """Run one connection until it closes or goes idle."""
+        async with websockets.connect(self.url, ping_interval=None, close_timeout=1) as socket:
+            self._socket = socket
+            logger.info("Price feed connected")
+            with self._lock:
+                pairs = sorted(self._pairs)
+            if pairs:
+                await self._send_subscribe(pairs)
+            while True:
+                try:
+                    raw = await asyncio.wait_for(socket.recv(), timeout=self.idle_timeout)
+                except asyncio.TimeoutError:
+                    logger.warning("Price feed idle for %s seconds", self.idle_timeout)
+                    return
+                self._handle_message(raw)
+
+    async def _send_subscribe(self, ws_pairs):
+        socket = self._socket
+        if socket is None:
+            return
+        for channel in self.channels:
+            await socket.send(json.dumps({
+                "event": "subscribe",
+                "pair": list(ws_pairs),
+                "subscription": {"name": channel}
+            }))
+
+    def _record_message(self, raw):
+        if self._record is not None:
+            self._record.write(raw if isinstance(raw, str) else raw.decode())
+            self._record.write("\n")
+
+    def _handle_message(self, raw):
+        self._record_message(raw)
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            logger.debug("Ignoring non-JSON price feed message: %s", raw)
+            return
+
+        if isinstance(message, dict):
+            if message.get("event") == "subscriptionStatus" and message.get("status") == "error":
+                logger.error("Price feed subscription error for %s: %s",
+                             message.get("pair"), message.get("errorMessage"))
+            return
+
+        # Channel messages: [channelID, payload, channelName, pair]
+        if not isinstance(message, list) or len(message) < 4:
+            return
+        payload, channel, ws_pair = message[1], message[-2], message[-1]
+        try:
+            if channel == "ticker":
+                price = float(payload["c"][0])
+            elif channel == "trade":
+                price = float(payload[-1][0])
+            else:
+                return
+        except (KeyError, IndexError, TypeError, ValueError):
+            logger.debug("Ignoring malformed %s message: %s", channel, message)
+            return
+
+        self._prices[ws_pair] = price
+        self._updated[ws_pair] = time.time()
+        self._live.add(ws_pair)
@@ -0,0 +1,256 @@
+"""Shared-memory price table fed by one market data hub and read by many bot processes."""
+import logging
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from asset_registry import AssetRegistry
+from market_data import PriceFeed, to_ws_pair
+
+logger = logging.getLogger(__name__)
+
+SLOT_DTYPE = np.dtype([
+    ('pair', 'S16'),  # WebSocket pair name, e.g. b"XBT/USD"
+    ('seq', '<u8'),  # odd while the slot is being written
+    ('price', '<f8'),
+    ('updated', '<f8'),  # Unix time of the price (0 = never)
+])
+HEADER_DTYPE = np.dtype([('slots', '<u8')])
+
+# Attempts to read a slot consistently before giving up on it
+READ_RETRIES = 1000
+
+
+class SharedPriceTable:
+    """
+    Fixed table of last prices in a named shared memory block.
+
+    One writer (the hub) publishes, any number of processes read. Each slot
+    carries a sequence number that is odd while the slot is being written, so
+    a reader that sees it change (or odd) simply reads the slot again instead
+    of taking a lock.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool = False):
+        self.shm = shm
+        self.owner = owner
+        slots = int(np.ndarray((1,), dtype=HEADER_DTYPE, buffer=shm.buf)[0]['slots'])
+        self.slots = np.ndarray((slots,), dtype=SLOT_DTYPE, buffer=shm.buf, offset=HEADER_DTYPE.itemsize)
+        self.index: Dict[str, int] = {pair.decode(): i for i, pair in enumerate(self.slots['pair'].tolist())}
+
+    @classmethod
+    def create(cls, pairs: Iterable[str]) -> "SharedPriceTable":
+        """
+        Allocate a table with one slot per pair.
+
+        Args:
+            pairs: Trading pairs in any naming (stored as WebSocket names)
+
+        Returns:
+            The owning table (unlinked by close())
+        """
+        names = list(dict.fromkeys(to_ws_pair(pair) for pair in pairs))
+        shm = shared_memory.SharedMemory(create=True, size=HEADER_DTYPE.itemsize + max(len(names), 1) * SLOT_DTYPE.itemsize)
+        np.ndarray((1,), dtype=HEADER_DTYPE, buffer=shm.buf)[0] = (len(names),)
+        slots = np.ndarray((len(names),), dtype=SLOT_DTYPE, buffer=shm.buf, offset=HEADER_DTYPE.itemsize)
+        slots[:] = 0
+        slots['pair'] = [name.encode() for name in names]
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedPriceTable":
+        """Open an existing table by its shared memory name, read-only by convention."""
+        # Workers share the supervisor's resource tracker, so attaching registers
+        # nothing new and the block is unlinked once, by its creator
+        return cls(shared_memory.SharedMemory(name=name))
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def pairs(self) -> List[str]:
+        return list(self.index)
+
+    def publish(self, slot: int, price: float, updated: float):
+        """Write one slot's price (single writer only)."""
+        entry = self.slots[slot:slot + 1]
+        seq = int(entry['seq'][0])
+        entry['seq'] = seq + 1
+        entry['price'] = price
+        entry['updated'] = updated
+        entry['seq'] = seq + 2
+
+    def read(self, pair: str) -> Optional[tuple]:
+        """
+        Read a pair's last price.
+
+        Args:
+            pair: Trading pair in any naming
+
+        Returns:
+            (price, updated), or None if the pair is not in the table or has no price yet
+        """
+        slot = self.index.get(to_ws_pair(pair))
+        if slot is None:
+            return None
+        slots = self.slots
+        for _ in range(READ_RETRIES):
+            seq = slots[slot]['seq']
+            if seq % 2:
+                continue
+            price = float(slots[slot]['price'])
+            updated = float(slots[slot]['updated'])
+            if slots[slot]['seq'] == seq:
+                return (price, updated) if updated else None
+        # The writer died mid-update; treat the price as missing
+        return None
+
+    def close(self):
+        """Detach (and remove the block if this process created it)."""
+        self.slots = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedPriceFeed:
+    """
+    PriceFeed stand-in that reads prices a MarketDataHub publishes in shared memory.
+
+    Lookups are a dict hit and two memory reads, with no socket or thread in
+    the reading process. Prices older than max_age read as missing, so the
+    client falls back to the REST ticker if the hub stalls.
+    """
+
+    def __init__(self, name: str, max_age: float = 15.0):
+        """
+        Initialize shared price feed.
+
+        Args:
+            name: Shared memory name of the hub's price table
+            max_age: Seconds after which a published price is no longer used
+        """
+        self.table = SharedPriceTable.attach(name)
+        self.max_age = max_age
+        self._unknown = set()
+
+    def start(self):
+        """Nothing to start: the hub streams prices."""
+
+    def stop(self, timeout: float = 5.0):
+        """Detach from the price table."""
+        self.table.close()
+
+    def subscribe(self, pair: str):
+        """Check that the hub publishes a pair (pairs are fixed when the hub starts)."""
+        ws_pair = to_ws_pair(pair)
+        if ws_pair not in self.table.index and ws_pair not in self._unknown:
+            self._unknown.add(ws_pair)
+            logger.warning("Market data hub does not publish %s; using the REST ticker for it", ws_pair)
+
+    def get_price(self, pair: str) -> Optional[float]:
+        """Last published price, None if missing or older than max_age."""
+        entry = self.table.read(pair)
+        if entry is None or time.time() - entry[1] > self.max_age:
+            return None
+        return entry[0]
+
+    def get_age(self, pair: str) -> Optional[float]:
+        """Seconds since the pair's price was last published, None if never."""
+        entry = self.table.read(pair)
+        return None if entry is None else time.time() - entry[1]
+
+    @property
+    def connected(self) -> bool:
+        return True
+
+
+class MarketDataHub:
+    """
+    Fetch the prices of every pair in a SharedPriceTable once, for all readers.
+
+    Each refresh takes the WebSocket feed's live prices and fetches whatever is
+    missing with a single public Ticker call, so public API load depends on the
+    number of pairs, not on the number of processes reading them.
+    """
+
+    def __init__(self, table: SharedPriceTable, market, price_feed: Optional[PriceFeed] = None,
+                 registry: Optional[AssetRegistry] = None, interval: float = 1.0):
+        """
+        Initialize market data hub.
+
+        Args:
+            table: Price table to publish to (created by this process)
+            market: Kraken Market client for the REST ticker
+            price_feed: Optional streaming price feed, read before the REST ticker
+            registry: Pair metadata used to match Ticker results to slots
+            interval: Seconds between refreshes
+        """
+        self.table = table
+        self.market = market
+        self.price_feed = price_feed
+        self.registry = registry or AssetRegistry(market)
+        self.interval = interval
+        self.rest_calls = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if price_feed is not None:
+            for pair in table.pairs:
+                price_feed.subscribe(pair)
+
+    def refresh(self) -> int:
+        """
+        Publish a fresh price for every pair.
+
+        Returns:
+            Number of prices published
+        """
+        now = time.time()
+        published = 0
+        missing = {}
+        for pair, slot in self.table.index.items():
+            price = self.price_feed.get_price(pair) if self.price_feed is not None else None
+            if price is not None:
+                self.table.publish(slot, price, now)
+                published += 1
+                continue
+            info = self.registry.get_pair(pair)
+            if info is not None:
+                missing[info.key] = (info.altname, slot)
+        if missing:
+            self.rest_calls += 1
+            ticker = self.market.get_ticker(pair=[altname for altname, _ in missing.values()])
+            now = time.time()
+            for key, data in ticker.items():
+                if key in missing:
+                    self.table.publish(missing[key][1], float(data['c'][0]), now)
+                    published += 1
+        return published
+
+    def start(self):
+        """Refresh in a background thread every interval."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="market-hub", daemon=True)
+        self._thread.start()
+        logger.info("Market data hub publishing %s pair(s) every %ss: %s",
+                    len(self.table.index), self.interval, ", ".join(self.table.pairs))
+
+    def stop(self, timeout: float = 5.0):
+        """Stop refreshing."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning("Market data hub refresh failed: %s", e)
+            self._stop.wait(self.interval)
@@ -0,0 +1,549 @@
+"""Local columnar store of Kraken public trades and OHLC candles, memory-mapped and chunked by UTC day.
+
+Layout (one directory per pair and dataset):
+
+    market_data/XRPUSD/trades/2024-03-01.v3.price.npy   one file per column per day
+    market_data/XRPUSD/trades/meta.json                 rows and file version per day, covered time ranges
+    market_data/XRPUSD/ohlc_60/...
+
+Every column file is a plain fixed-width .npy array that is opened with
+mmap_mode="r", so a multi-year series is a list of day views that costs no
+RAM until it is read. A day is rewritten as a new file version and becomes
+visible when meta.json is atomically replaced, so an interrupted download
+never leaves a half-written day behind.
+
+The downloader resumes each dataset where its covered range ends, fills
+holes between covered ranges, and rebuilds OHLC candles older than the 720
+the OHLC endpoint returns from stored trades.
+
+Usage:
+    python3 market_store.py XRPUSD --since 2024-01-01 --ohlc 1,60
+    python3 backtester.py market_data/XRPUSD/trades --buy-price 0.45 --sell-price 0.60
+"""
+import argparse
+import calendar
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+
+# (column, dtype); the first column is the timestamp every dataset is ordered by
+TRADE_COLUMNS = (
+    ('time', '<f8'),
+    ('price', '<f8'),
+    ('volume', '<f8'),
+    ('side', 'i1'),  # 1 buy, -1 sell (taker side)
+    ('market', 'i1'),  # 1 market order, 0 limit order
+    ('trade_id', '<i8'),
+)
+OHLC_COLUMNS = (
+    ('time', '<f8'),  # candle start
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('vwap', '<f8'),
+    ('volume', '<f8'),
+    ('count', '<i8'),
+)
+
+# Public endpoints allow about one call per second
+REQUEST_PAUSE = 1.0
+
+# Trades kept in memory before they are written out
+FLUSH_ROWS = 200000
+
+
+def day_of(timestamp: float) -> str:
+    """UTC day ("YYYY-MM-DD") a timestamp falls in."""
+    return time.strftime("%Y-%m-%d", time.gmtime(timestamp))
+
+
+def parse_day(value: str) -> float:
+    """Unix time of the start of a "YYYY-MM-DD" UTC day."""
+    return float(calendar.timegm(time.strptime(value, "%Y-%m-%d")))
+
+
+class Dataset:
+    """
+    One pair's trades, or its candles of one interval, stored as per-day column files.
+
+    Rows are unique by key column (trade ID, or candle start) and ordered by time.
+    Covered ranges record which [start, end) spans have been fully downloaded,
+    which is what resuming and gap filling work from.
+    """
+
+    def __init__(self, path: str, columns: Tuple[Tuple[str, str], ...], key: str):
+        """
+        Initialize dataset.
+
+        Args:
+            path: Directory of the dataset (created on first write)
+            columns: (name, dtype) of every column, time first
+            key: Column whose value identifies a row
+        """
+        self.path = path
+        self.columns = columns
+        self.key = key
+        self.meta = {'days': {}, 'covered': [], 'cursor': None}
+        meta_file = os.path.join(path, "meta.json")
+        if os.path.exists(meta_file):
+            with open(meta_file, 'r') as f:
+                self.meta = json.load(f)
+        self._maps: Dict[Tuple[str, int], Dict[str, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return sum(entry['rows'] for entry in self.meta['days'].values())
+
+    @property
+    def days(self) -> List[str]:
+        return sorted(self.meta['days'])
+
+    @property
+    def covered(self) -> List[List[float]]:
+        """Fully downloaded [start, end) ranges, sorted and non-overlapping."""
+        return self.meta['covered']
+
+    def chunk(self, day: str) -> Dict[str, np.ndarray]:
+        """
+        Memory-map one day's columns (read-only, nothing is read until indexed).
+
+        Args:
+            day: "YYYY-MM-DD"
+
+        Returns:
+            Column arrays by name
+        """
+        version = self.meta['days'][day]['version']
+        arrays = self._maps.get((day, version))
+        if arrays is None:
+            arrays = {name: np.load(self._file(day, version, name), mmap_mode='r') for name, _ in self.columns}
+            self._maps[(day, version)] = arrays
+        return arrays
+
+    def chunks(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Day views holding rows with start <= time < end, oldest first.
+
+        The first and last days are sliced to the range; slices of a
+        memory map are still views, so nothing is copied.
+        """
+        first = day_of(start) if start is not None else None
+        last = day_of(end) if end is not None else None
+        for day in self.days:
+            if (first is not None and day < first) or (last is not None and day > last):
+                continue
+            arrays = self.chunk(day)
+            times = arrays['time']
+            lo = int(np.searchsorted(times, start, 'left')) if start is not None and day == first else 0
+            hi = int(np.searchsorted(times, end, 'left')) if end is not None and day == last else len(times)
+            if hi > lo:
+                yield {name: array[lo:hi] for name, array in arrays.items()}
+
+    def column(self, name: str, start: Optional[float] = None, end: Optional[float] = None) -> np.ndarray:
+        """
+        One column over a time range as a single array.
+
+        A range within one day is returned as a memory-mapped view; longer
+        ranges are concatenated into a new array of just that range.
+        """
+        parts = [chunk[name] for chunk in self.chunks(start, end)]
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return np.empty(0, dtype=dict(self.columns)[name])
+        return np.concatenate(parts)
+
+    def first_time(self) -> Optional[float]:
+        days = self.days
+        return float(self.chunk(days[0])['time'][0]) if days else None
+
+    def last_time(self) -> Optional[float]:
+        days = self.days
+        return float(self.chunk(days[-1])['time'][-1]) if days else None
+
+    def gaps(self, start: float, end: float) -> List[Tuple[float, float]]:
+        """
+        Parts of [start, end) not covered yet.
+
+        Returns:
+            (start, end) ranges, oldest first
+        """
+        gaps = []
+        position = start
+        for covered_start, covered_end in self.covered:
+            if covered_end <= position:
+                continue
+            if covered_start >= end:
+                break
+            if covered_start > position:
+                gaps.append((position, float(covered_start)))
+            position = max(position, covered_end)
+        if position < end:
+            gaps.append((float(position), float(end)))
+        return gaps
+
+    def write(self, rows: Dict[str, np.ndarray], covered: Optional[Tuple[float, float]] = None,
+              cursor: Optional[str] = None) -> int:
+        """
+        Merge rows into their days and commit them with the covered range they complete.
+
+        Rows already stored (same key) are replaced by the new ones. Each
+        touched day is written as a new file version; meta.json is replaced
+        last, so readers and crashes only ever see whole days.
+
+        Args:
+            rows: Column arrays of equal length (any order)
+            covered: [start, end) range now fully stored
+            cursor: Resume token for downloading on from the end of covered
+
+        Returns:
+            Number of rows added (replaced rows are not counted)
+        """
+        before = len(self)
+        if rows and len(rows['time']):
+            os.makedirs(self.path, exist_ok=True)
+            rows = {name: np.asarray(rows[name], dtype=dtype) for name, dtype in self.columns}
+            days = np.floor(rows['time'] / DAY).astype(np.int64)
+            for day_number in np.unique(days):
+                mask = days == day_number
+                self._write_day(day_of(day_number * DAY), {name: array[mask] for name, array in rows.items()})
+        if covered is not None:
+            self._add_covered(*covered)
+            if cursor is not None:
+                self.meta['cursor'] = [covered[1], cursor]
+        self._save_meta()
+        self._remove_stale_files()
+        return len(self) - before
+
+    def _write_day(self, day: str, rows: Dict[str, np.ndarray]):
+        entry = self.meta['days'].get(day)
+        if entry is not None:
+            existing = self.chunk(day)
+            # New rows first, so np.unique keeps them over the stored duplicates
+            rows = {name: np.concatenate((rows[name], existing[name])) for name, _ in self.columns}
+        _, unique = np.unique(rows[self.key], return_index=True)
+        order = unique[np.lexsort((rows[self.key][unique], rows['time'][unique]))]
+        version = entry['version'] + 1 if entry is not None else 1
+        for name, _ in self.columns:
+            np.save(self._file(day, version, name), np.ascontiguousarray(rows[name][order]))
+        self.meta['days'][day] = {'rows': int(len(order)), 'version': version}
+
+    def _add_covered(self, start: float, end: float):
+        if end <= start:
+            return
+        merged = []
+        for covered_start, covered_end in sorted(self.covered + [[start, end]]):
+            if merged and covered_start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], covered_end)
+            else:
+                merged.append([covered_start, covered_end])
+        self.meta['covered'] = merged
+
+    def _save_meta(self):
+        os.makedirs(self.path, exist_ok=True)
+        meta_file = os.path.join(self.path, "meta.json")
+        tmp_file = "{}.tmp".format(meta_file)
+        with open(tmp_file, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_file, meta_file)
+
+    def _remove_stale_files(self):
+        # Older versions of rewritten days, and files of a write that never reached meta.json
+        current = {"{}.v{}".format(day, entry['version']) for day, entry in self.meta['days'].items()}
+        for name in os.listdir(self.path):
+            if name.endswith(".npy") and name.rsplit('.', 2)[0] not in current:
+                os.remove(os.path.join(self.path, name))
+        self._maps = {key: arrays for key, arrays in self._maps.items()
+                      if "{}.v{}".format(*key) in current}
+
+    def _file(self, day: str, version: int, column: str) -> str:
+        return os.path.join(self.path, "{}.v{}.{}.npy".format(day, version, column))
+
+    def price_series(self, start: Optional[float] = None, end: Optional[float] = None):
+        """The stored rows as a backtester PriceSeries (lows/highs from candles, the price for trades)."""
+        from backtester import PriceSeries
+        timestamps = self.column('time', start, end)
+        if 'close' in dict(self.columns):
+            return PriceSeries(timestamps, self.column('low', start, end), self.column('high', start, end),
+                               self.column('close', start, end))
+        prices = self.column('price', start, end)
+        return PriceSeries(timestamps, prices, prices, prices)
+
+
+class MarketStore:
+    """Datasets of every pair under one root directory."""
+
+    def __init__(self, root: str = "market_data"):
+        self.root = root
+
+    def trades(self, pair: str) -> Dataset:
+        """Public trades of a pair (by altname, e.g. "XRPUSD")."""
+        return Dataset(os.path.join(self.root, pair.upper(), "trades"), TRADE_COLUMNS, 'trade_id')
+
+    def ohlc(self, pair: str, interval: int) -> Dataset:
+        """OHLC candles of a pair, interval in minutes."""
+        return Dataset(os.path.join(self.root, pair.upper(), "ohlc_{}".format(interval)), OHLC_COLUMNS, 'time')
+
+
+def open_dataset(path: str) -> Dataset:
+    """Open a dataset directory (".../PAIR/trades" or ".../PAIR/ohlc_N") directly."""
+    if os.path.basename(os.path.normpath(path)).startswith("ohlc_"):
+        return Dataset(path, OHLC_COLUMNS, 'time')
+    return Dataset(path, TRADE_COLUMNS, 'trade_id')
+
+
+def candles_from_trades(trades: Dict[str, np.ndarray], interval: int) -> Dict[str, np.ndarray]:
+    """
+    Build OHLC candles from time-ordered trades, one per interval that had trades.
+
+    Args:
+        trades: Trade columns
+        interval: Candle length in minutes
+
+    Returns:
+        Candle columns
+    """
+    times = trades['time']
+    if not len(times):
+        return {name: np.empty(0, dtype=dtype) for name, dtype in OHLC_COLUMNS}
+    prices = np.asarray(trades['price'])
+    volumes = np.asarray(trades['volume'])
+    buckets = np.floor(np.asarray(times) / (interval * 60)).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(times)]
+    volume = np.add.reduceat(volumes, starts)
+    turnover = np.add.reduceat(prices * volumes, starts)
+    close = prices[ends - 1]
+    return {
+        'time': (buckets[starts] * interval * 60).astype(np.float64),
+        'open': prices[starts],
+        'high': np.maximum.reduceat(prices, starts),
+        'low': np.minimum.reduceat(prices, starts),
+        'close': close,
+        'vwap': np.divide(turnover, volume, out=close.copy(), where=volume > 0),
+        'volume': volume,
+        'count': ends - starts,
+    }
+
+
+class MarketDownloader:
+    """
+    Fill a MarketStore from Kraken's public Trades and OHLC endpoints.
+
+    Downloads only what is missing: each call fetches the gaps between the
+    requested start and now, so an interrupted or periodic run picks up where
+    the stored data ends.
+    """
+
+    def __init__(self, store: MarketStore, market, registry, pause: float = REQUEST_PAUSE):
+        """
+        Initialize downloader.
+
+        Args:
+            store: Store to fill
+            market: Kraken Market client (public endpoints only)
+            registry: AssetRegistry for pair names and keys
+            pause: Seconds between API calls
+        """
+        self.store = store
+        self.market = market
+        self.registry = registry
+        self.pause = pause
+        self.calls = 0
+        self._last_call = 0.0
+
+    def _call(self, method, **params) -> dict:
+        for attempt in range(5):
+            wait = self._last_call + self.pause - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_call = time.monotonic()
+            self.calls += 1
+            try:
+                return method(**params)
+            except Exception as e:
+                if "Too many requests" not in str(e) or attempt == 4:
+                    raise
+                logger.warning("Public API rate limit hit; backing off %ss", 5 * (attempt + 1))
+                time.sleep(5 * (attempt + 1))
+
+    def pair_info(self, pair: str):
+        """Pair metadata for any pair name, raising ValueError for unknown pairs."""
+        info = self.registry.get_pair(pair)
+        if info is None:
+            raise ValueError("Unknown trading pair: {}".format(pair))
+        return info
+
+    def download_trades(self, pair: str, start: float, end: Optional[float] = None) -> int:
+        """
+        Download every public trade in [start, end) that is not stored yet.
+
+        Args:
+            pair: Trading pair
+            start: Unix time to download from
+            end: Unix time to stop at (now if None)
+
+        Returns:
+            Number of trades added
+        """
+        info = self.pair_info(pair)
+        dataset = self.store.trades(info.altname)
+        end = time.time() if end is None else end
+        added = 0
+        for gap_start, gap_end in dataset.gaps(start, end):
+            added += self._download_trade_gap(info, dataset, gap_start, gap_end)
+        logger.info("%s trades: %s added, %s stored in %s day(s)", info.altname, added, len(dataset),
+                    len(dataset.days))
+        return added
+
+    def _download_trade_gap(self, info, dataset: Dataset, start: float, end: float) -> int:
+        # Continue from the exact cursor when resuming right where the last download stopped
+        cursor = dataset.meta.get('cursor')
+        # Otherwise ask from a second early: "since" is exclusive, and trades before start are skipped below
+        since = cursor[1] if cursor and cursor[0] == start else str(int((start - 1) * 1e9))
+        pending: List[list] = []
+        pending_start = start
+        added = 0
+        done = False
+        while True:
+            result = self._call(self.market.get_recent_trades, pair=info.key, since=since)
+            rows = next((value for key, value in result.items() if key != "last"), [])
+            last = str(result.get("last", since))
+            if not rows:
+                break
+            for row in rows:
+                trade_time = float(row[2])
+                if trade_time >= end:
+                    done = True
+                    break
+                if trade_time >= start:
+                    pending.append(row)
+            if done or last == since:
+                break
+            since = last
+            if len(pending) >= FLUSH_ROWS:
+                # Everything up to the newest stored trade is complete, except
+                # trades sharing its timestamp that the next page may still hold
+                covered_to = float(pending[-1][2])
+                added += dataset.write(_trade_columns(pending), covered=(pending_start, covered_to), cursor=last)
+                pending_start = covered_to
+                pending = []
+            if len(rows) < 1000 and float(rows[-1][2]) >= time.time() - 60:
+                break  # caught up with the present
+        covered_to = end if done else (float(pending[-1][2]) if pending else pending_start)
+        added += dataset.write(_trade_columns(pending), covered=(pending_start, covered_to), cursor=since)
+        return added
+
+    def download_ohlc(self, pair: str, interval: int, start: Optional[float] = None) -> int:
+        """
+        Download the candles the OHLC endpoint has (its last 720) and fill older gaps from stored trades.
+
+        Args:
+            pair: Trading pair
+            interval: Candle length in minutes
+            start: Unix time the series should start from (None: whatever the endpoint returns)
+
+        Returns:
+            Number of candles added
+        """
+        info = self.pair_info(pair)
+        dataset = self.store.ohlc(info.altname, interval)
+        step = interval * 60
+        since = dataset.covered[-1][1] - step if dataset.covered else None
+        result = self._call(self.market.get_ohlc, pair=info.key, interval=interval, since=since)
+        rows = next((value for key, value in result.items() if key != "last"), [])
+        last = float(result.get("last", 0))
+        # The newest candle is still forming; keep only closed ones
+        rows = [row for row in rows if float(row[0]) < last]
+        added = 0
+        if rows:
+            candles = _ohlc_columns(rows)
+            added += dataset.write(candles, covered=(candles['time'][0], candles['time'][-1] + step))
+        if start is not None and dataset.covered:
+            start = start // step * step
+            for gap_start, gap_end in dataset.gaps(start, dataset.covered[-1][1]):
+                added += self._fill_ohlc_gap(info, dataset, interval, gap_start, gap_end)
+        logger.info("%s %s-minute candles: %s added, %s stored", info.altname, interval, added, len(dataset))
+        return added
+
+    def _fill_ohlc_gap(self, info, dataset: Dataset, interval: int, start: float, end: float) -> int:
+        # Older than the endpoint's 720 candles: rebuild them from trades
+        logger.info("Building %s %s-minute candles for %s to %s from trades", info.altname, interval,
+                    day_of(start), day_of(end))
+        self.download_trades(info.altname, start, end)
+        trades = self.store.trades(info.altname)
+        # Aggregate a day (or one long candle) of trades at a time, aligned so
+        # no candle is split between two batches
+        step = interval * 60
+        window = -(-DAY // step) * step
+        added = 0
+        position = start
+        while position < end:
+            batch_end = min(position // window * window + window, end)
+            batch = {name: trades.column(name, position, batch_end) for name in ('time', 'price', 'volume')}
+            added += dataset.write(candles_from_trades(batch, interval))
+            position = batch_end
+        dataset.write({}, covered=(start, end))
+        return added
+
+
+def _trade_columns(rows: List[list]) -> Dict[str, np.ndarray]:
+    if not rows:
+        return {}
+    return {
+        'time': np.array([float(row[2]) for row in rows]),
+        'price': np.array([float(row[0]) for row in rows]),
+        'volume': np.array([float(row[1]) for row in rows]),
+        'side': np.array([1 if row[3] == "b" else -1 for row in rows], dtype=np.int8),
+        'market': np.array([1 if row[4] == "m" else 0 for row in rows], dtype=np.int8),
+        'trade_id': np.array([int(row[6]) for row in rows], dtype=np.int64),
+    }
+
+
+def _ohlc_columns(rows: List[list]) -> Dict[str, np.ndarray]:
+    data = np.array([[float(value) for value in row[:8]] for row in rows])
+    return {name: data[:, i].astype(dtype) for i, (name, dtype) in enumerate(OHLC_COLUMNS)}
+
+
+def main():
+    """Download (or update) pairs' trades and candles into the local store."""
+    from kraken.spot import Market
+    from asset_registry import AssetRegistry
+    from config import Config
+    parser = argparse.ArgumentParser(description="Download Kraken public trades and OHLC candles into a local store")
+    parser.add_argument("pairs", nargs="+", help="trading pairs, e.g. XRPUSD XBTUSD")
+    parser.add_argument("--root", default="market_data", help="store directory")
+    parser.add_argument("--since", help="download trades from this UTC day (YYYY-MM-DD); default: resume")
+    parser.add_argument("--ohlc", default="", help="comma separated candle intervals in minutes, e.g. 1,60")
+    parser.add_argument("--no-trades", action="store_true", help="only update candles")
+    parser.add_argument("--pause", type=float, default=REQUEST_PAUSE, help="seconds between API calls")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    market = Market(url=Config.KRAKEN_API_URL)
+    downloader = MarketDownloader(MarketStore(args.root), market,
+                                  AssetRegistry(market, cache_file=Config.ASSET_CACHE_FILE, ttl=Config.ASSET_CACHE_TTL),
+                                  pause=args.pause)
+    since = parse_day(args.since) if args.since else None
+    for pair in args.pairs:
+        if not args.no_trades:
+            dataset = downloader.store.trades(downloader.pair_info(pair).altname)
+            start = since
+            if start is None:
+                # Resume after the stored data, or start with the last day
+                start = dataset.covered[0][0] if dataset.covered else time.time() - DAY
+            downloader.download_trades(pair, start)
+        for interval in filter(None, (part.strip() for part in args.ohlc.split(','))):
+            downloader.download_ohlc(pair, int(interval), start=since)
+    print("{} API calls".format(downloader.calls))
+
+
+if __name__ == "__main__":
+    main()
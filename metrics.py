@@ -0,0 +1,402 @@
+"""In-process counters and latency histograms with Prometheus text export."""
+import bisect
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds (+Inf is implicit)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'kraken_api_requests_total': "Kraken REST calls by endpoint",
+    'kraken_api_errors_total': "Failed Kraken REST calls by endpoint and Kraken error code",
+    'kraken_api_latency_seconds': "Kraken REST call latency by endpoint",
+    'bot_iterations_total': "Trading loop iterations by pair",
+    'bot_iteration_errors_total': "Trading loop iterations that raised, by pair",
+    'bot_iteration_seconds': "Trading loop iteration duration by pair",
+    'bot_phase_seconds': "Trading loop phase duration by pair and phase",
+    'engine_tick_seconds': "Multi-pair engine tick duration",
+    'order_tick_to_ack_seconds': "Seconds from the market observation that triggered an order to Kraken acknowledging it",
+    'rate_limit_counter': "Modelled Kraken private API rate counter",
+    'rate_limit_max_counter': "Rate counter ceiling the governor paces against",
+    'rate_limit_queue_depth': "Private calls waiting on the rate limit governor",
+    'rate_limit_waited_calls_total': "Private calls the governor delayed",
+    'rate_limit_wait_seconds_total': "Total seconds private calls waited on the governor",
+    'rate_limit_errors_total': "Rate limit errors reported by Kraken",
+}
+
+# Kraken error strings look like "EOrder:Insufficient funds" or "EAPI:Rate limit exceeded"
+KRAKEN_ERROR_CODE = re.compile(r"E[A-Z][A-Za-z]*:[A-Za-z][A-Za-z _-]*[A-Za-z]")
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def error_code(error: Exception) -> str:
+    """Get the Kraken error code of an exception (its class name if it carries none)."""
+    match = KRAKEN_ERROR_CODE.search(str(error))
+    return match.group(0) if match else type(error).__name__
+
+
+class _Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * (buckets + 1)
+        self.total = 0.0
+        self.count = 0
+
+
+class _Timer:
+    """Context manager that observes its own duration into a histogram."""
+
+    __slots__ = ('metrics', 'name', 'labels', 'start')
+
+    def __init__(self, metrics: 'Metrics', name: str, labels: dict):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class _CallTracker:
+    """Context manager that counts a Kraken call, its latency and its error code."""
+
+    __slots__ = ('metrics', 'endpoint', 'start')
+
+    def __init__(self, metrics: 'Metrics', endpoint: str):
+        self.metrics = metrics
+        self.endpoint = endpoint
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        self.metrics.inc('kraken_api_requests_total', endpoint=self.endpoint)
+        self.metrics.observe('kraken_api_latency_seconds', elapsed, endpoint=self.endpoint)
+        if exc is not None:
+            self.metrics.inc('kraken_api_errors_total', endpoint=self.endpoint, code=error_code(exc))
+        return False
+
+
+class _NullContext:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+class Metrics:
+    """
+    Thread-safe counters, gauges and fixed-bucket histograms.
+
+    When disabled every method returns immediately (timers are a shared no-op
+    context manager), so instrumented code pays only a method call.
+    """
+
+    def __init__(self, enabled: bool = True, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        """
+        Initialize metrics registry.
+
+        Args:
+            enabled: Record metrics (False makes every call a no-op)
+            buckets: Histogram bucket upper bounds in seconds
+        """
+        self.enabled = enabled
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, dict, float]]]] = []
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Add to a counter."""
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record one histogram observation (seconds)."""
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(len(self.buckets))
+            histogram.counts[index] += 1
+            histogram.total += value
+            histogram.count += 1
+
+    def timer(self, name: str, **labels):
+        """Context manager that records the duration of its block into a histogram."""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return _Timer(self, name, labels)
+
+    def track_call(self, endpoint: str):
+        """Context manager around one Kraken REST call: count, latency and error code."""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return _CallTracker(self, endpoint)
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, dict, float]]]):
+        """
+        Register a callback that reports values at export time.
+
+        Values are exported as gauges, except names ending in _total, which are
+        cumulative and exported as counters.
+
+        Args:
+            collector: Function returning (name, labels, value) tuples
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            Metrics text
+        """
+        lines = []
+        with self._lock:
+            for name in sorted(self._counters):
+                self._header(lines, name, "counter")
+                for key, value in sorted(self._counters[name].items()):
+                    lines.append("{}{} {}".format(name, _labels(key), _number(value)))
+            for name in sorted(self._histograms):
+                self._header(lines, name, "histogram")
+                for key, histogram in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(self.buckets + (float('inf'),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float('inf') else repr(bound)
+                        lines.append("{}_bucket{} {}".format(name, _labels(key + (('le', le),)), cumulative))
+                    lines.append("{}_sum{} {}".format(name, _labels(key), repr(histogram.total)))
+                    lines.append("{}_count{} {}".format(name, _labels(key), histogram.count))
+
+        gauges: Dict[str, List[Tuple[LabelKey, float]]] = {}
+        for collector in self._collectors:
+            try:
+                for name, labels, value in collector():
+                    gauges.setdefault(name, []).append((tuple(sorted(labels.items())), value))
+            except Exception as e:
+                logger.warning("Metrics collector failed: %s", e)
+        for name in sorted(gauges):
+            self._header(lines, name, "counter" if name.endswith("_total") else "gauge")
+            for key, value in gauges[name]:
+                lines.append("{}{} {}".format(name, _labels(key), _number(value)))
+        return "\n".join(lines) + "\n"
+
+    def histogram_summary(self, quantiles: Iterable[float] = (0.5, 0.95, 0.99)) -> List[Tuple[str, dict, int, float, list]]:
+        """
+        Summarize every histogram series.
+
+        Quantiles are bucket upper bounds (the first bound holding that share
+        of the observations), so they over-estimate by at most one bucket.
+
+        Args:
+            quantiles: Quantiles to estimate, between 0 and 1
+
+        Returns:
+            (name, labels, count, total seconds, quantile estimates) tuples
+        """
+        rows = []
+        bounds = self.buckets + (float('inf'),)
+        with self._lock:
+            for name in sorted(self._histograms):
+                for key, histogram in sorted(self._histograms[name].items()):
+                    estimates = []
+                    for q in quantiles:
+                        cumulative = 0
+                        for bound, count in zip(bounds, histogram.counts):
+                            cumulative += count
+                            if cumulative >= q * histogram.count:
+                                break
+                        estimates.append(bound)
+                    rows.append((name, dict(key), histogram.count, histogram.total, estimates))
+        return rows
+
+    @staticmethod
+    def _header(lines: list, name: str, kind: str):
+        if name in HELP:
+            lines.append("# HELP {} {}".format(name, HELP[name]))
+        lines.append("# TYPE {} {}".format(name, kind))
+
+
+# Shared disabled registry for components created without one
+NULL_METRICS = Metrics(enabled=False)
+
+
+def _labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                          for k, v in key) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def governor_collector(governor) -> Callable[[], List[Tuple[str, dict, float]]]:
+    """Gauges for a RateLimitGovernor's counter and queue depth, counters for its waiting and errors."""
+    def collect():
+        stats = governor.stats()
+        labels = {'tier': stats['tier']}
+        return [
+            ('rate_limit_counter', labels, stats['counter']),
+            ('rate_limit_max_counter', labels, stats['max_counter']),
+            ('rate_limit_queue_depth', labels, stats['queue_depth']),
+            ('rate_limit_waited_calls_total', labels, stats['waited_calls']),
+            ('rate_limit_wait_seconds_total', labels, stats['total_wait']),
+            ('rate_limit_errors_total', labels, stats['rate_limit_errors']),
+        ]
+    return collect
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer:
+    """Serves /metrics for Prometheus scraping on a background thread."""
+
+    def __init__(self, metrics: Metrics, host: str = "127.0.0.1", port: int = 9108):
+        """
+        Initialize metrics server.
+
+        Args:
+            metrics: Registry to export
+            host: Interface to listen on
+            port: Port to listen on
+        """
+        self._server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self._server.daemon_threads = True
+        self._server.metrics = metrics
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+
+    def start(self):
+        """Start serving."""
+        self._thread.start()
+        host, port = self._server.server_address[:2]
+        logger.info("Serving metrics on http://%s:%s/metrics", host, port)
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class MetricsFileWriter:
+    """Periodically writes the metrics text to a file (e.g. for node_exporter's textfile collector)."""
+
+    def __init__(self, metrics: Metrics, path: str, interval: float = 15.0):
+        """
+        Initialize metrics file writer.
+
+        Args:
+            metrics: Registry to export
+            path: File to (atomically) rewrite
+            interval: Seconds between writes
+        """
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+
+    def start(self):
+        """Start writing in the background."""
+        self._thread.start()
+        logger.info("Writing metrics to %s every %s seconds", self.path, self.interval)
+
+    def stop(self):
+        """Write one last time and stop."""
+        self._stop.set()
+        self._thread.join()
+
+    def flush(self):
+        """Write the metrics file now."""
+        tmp_path = "{}.tmp".format(self.path)
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(self.metrics.render())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Could not write metrics file %s: %s", self.path, e)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+        self.flush()
+
+
+def start_exporters(metrics: Metrics, port: int = 0, host: str = "127.0.0.1", path: str = "",
+                    interval: float = 15.0) -> list:
+    """
+    Start the configured metrics exporters.
+
+    Args:
+        metrics: Registry to export
+        port: Port for the /metrics endpoint (0 = no endpoint)
+        host: Interface for the /metrics endpoint
+        path: Metrics file path ("" = no file)
+        interval: Seconds between metrics file writes
+
+    Returns:
+        Started exporters (each has stop())
+    """
+    exporters = []
+    if port:
+        exporters.append(MetricsServer(metrics, host, port))
+    if path:
+        exporters.append(MetricsFileWriter(metrics, path, interval))
+    for exporter in exporters:
+        exporter.start()
+    return exporters
@@ -0,0 +1,959 @@
+"""In-process stand-in for the Kraken REST API with a price-time priority matching engine.
+
+MockExchange implements the endpoints the bot uses (AssetPairs, Assets, Ticker,
+OHLC, Trades, Balance, OpenOrders, QueryOrders, AddOrder, CancelOrder) against
+simulated accounts and order books. It can be used two ways:
+
+- in-process: connect_client() swaps a KrakenClient's SDK clients for mocks
+  that call the exchange directly, so there is no network or serialization
+- over HTTP: MockKrakenServer serves the same endpoints on localhost, so an
+  unmodified bot can be pointed at it with KRAKEN_API_URL
+
+Prices follow a scriptable path per pair. Every step of the path is a trade
+print on the market: resting buy orders priced above it (and sell orders priced
+below it) fill at their limit price, best price first and oldest first within
+a price. Orders from different accounts also match each other. Latency and
+errors can be injected per endpoint.
+
+Usage:
+    python mock_exchange.py --port 8080 --pair XRPUSD --path 0.50,0.45,0.62 --step 5
+"""
+import argparse
+import bisect
+import heapq
+import itertools
+import json
+import logging
+import random
+import socket
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlparse
+from kraken.base_api import KrakenErrorHandler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FEE_RATE = 0.0025
+
+# AssetPairs / Assets metadata served by default (same shape as Kraken's responses)
+DEFAULT_ASSET_PAIRS = {
+    "XXRPZUSD": {"altname": "XRPUSD", "wsname": "XRP/USD", "base": "XXRP", "quote": "ZUSD", "ordermin": "10",
+                 "costmin": "0.5", "lot_decimals": 8, "pair_decimals": 5, "tick_size": "0.00001"},
+    "XXBTZUSD": {"altname": "XBTUSD", "wsname": "XBT/USD", "base": "XXBT", "quote": "ZUSD", "ordermin": "0.0001",
+                 "costmin": "0.5", "lot_decimals": 8, "pair_decimals": 1, "tick_size": "0.1"},
+    "XETHZUSD": {"altname": "ETHUSD", "wsname": "ETH/USD", "base": "XETH", "quote": "ZUSD", "ordermin": "0.002",
+                 "costmin": "0.5", "lot_decimals": 8, "pair_decimals": 2, "tick_size": "0.01"},
+    "XLTCZUSD": {"altname": "LTCUSD", "wsname": "LTC/USD", "base": "XLTC", "quote": "ZUSD", "ordermin": "0.05",
+                 "costmin": "0.5", "lot_decimals": 8, "pair_decimals": 2, "tick_size": "0.01"},
+}
+DEFAULT_ASSETS = {
+    "ZUSD": {"altname": "USD", "decimals": 4},
+    "XXRP": {"altname": "XRP", "decimals": 8},
+    "XXBT": {"altname": "XBT", "decimals": 10},
+    "XETH": {"altname": "ETH", "decimals": 10},
+    "XLTC": {"altname": "LTC", "decimals": 10},
+}
+DEFAULT_PRICES = {"XXRPZUSD": 0.5, "XXBTZUSD": 60000.0, "XETHZUSD": 3000.0, "XLTCZUSD": 80.0}
+
+PUBLIC_ENDPOINTS = ("AssetPairs", "Assets", "Ticker", "OHLC", "Trades")
+
+# Trades returned per public Trades page (Kraken's default)
+TRADES_PAGE = 1000
+
+# Trade prints kept per pair for OHLC candles and public Trades
+MAX_PRINTS = 10000
+
+
+class MockError(Exception):
+    """Kraken error string returned in the response's error list."""
+
+
+class MockOrder:
+    """One order on the mock exchange."""
+
+    __slots__ = ('txid', 'account', 'pair', 'side', 'ordertype', 'price', 'volume', 'vol_exec', 'cost', 'fee',
+                 'status', 'opentm', 'closetm', 'seq', 'hold')
+
+    def __init__(self, txid: str, account: str, pair: str, side: str, ordertype: str, price: float,
+                 volume: float, seq: int):
+        self.txid = txid
+        self.account = account
+        self.pair = pair
+        self.side = side
+        self.ordertype = ordertype
+        self.price = price
+        self.volume = volume
+        self.vol_exec = 0.0
+        self.cost = 0.0
+        self.fee = 0.0
+        self.status = "open"
+        self.opentm = time.time()
+        self.closetm = 0.0
+        self.seq = seq
+        self.hold = 0.0  # funds still reserved for the unfilled part
+
+    @property
+    def remaining(self) -> float:
+        return self.volume - self.vol_exec
+
+    def to_dict(self, altname: str) -> dict:
+        """Order in Kraken's OpenOrders / QueryOrders format."""
+        order = {
+            "refid": None,
+            "userref": 0,
+            "status": self.status,
+            "opentm": self.opentm,
+            "starttm": 0,
+            "expiretm": 0,
+            "descr": {
+                "pair": altname,
+                "type": self.side,
+                "ordertype": self.ordertype,
+                "price": "{}".format(self.price if self.ordertype == "limit" else 0),
+                "price2": "0",
+                "leverage": "none",
+                "order": "{} {} {} @ {} {}".format(self.side, self.volume, altname, self.ordertype, self.price),
+                "close": "",
+            },
+            "vol": "{:.8f}".format(self.volume),
+            "vol_exec": "{:.8f}".format(self.vol_exec),
+            "cost": "{:.8f}".format(self.cost),
+            "fee": "{:.8f}".format(self.fee),
+            "price": "{:.8f}".format(self.cost / self.vol_exec if self.vol_exec else 0),
+            "stopprice": "0.00000000",
+            "limitprice": "0.00000000",
+            "misc": "",
+            "oflags": "fciq",
+        }
+        if self.closetm:
+            order["closetm"] = self.closetm
+        return order
+
+
+class OrderBook:
+    """Price-time priority limit order book for one pair."""
+
+    def __init__(self):
+        # Heaps of (price key, sequence, order); cancelled and filled orders are
+        # dropped lazily when they reach the top
+        self._bids = []
+        self._asks = []
+
+    def _top(self, side: str) -> Optional[MockOrder]:
+        heap = self._bids if side == "buy" else self._asks
+        while heap and heap[0][2].status != "open":
+            heapq.heappop(heap)
+        return heap[0][2] if heap else None
+
+    def best_bid(self) -> Optional[float]:
+        order = self._top("buy")
+        return order.price if order else None
+
+    def best_ask(self) -> Optional[float]:
+        order = self._top("sell")
+        return order.price if order else None
+
+    def rest(self, order: MockOrder):
+        """Add an order to the book."""
+        if order.side == "buy":
+            heapq.heappush(self._bids, (-order.price, order.seq, order))
+        else:
+            heapq.heappush(self._asks, (order.price, order.seq, order))
+
+    def match(self, order: MockOrder, limit: Optional[float]) -> List[tuple]:
+        """
+        Match an incoming order against the opposite side of the book.
+
+        Args:
+            order: Incoming order
+            limit: Worst price the order accepts (None for a market order)
+
+        Returns:
+            List of (resting order, volume, price) fills, best price first
+        """
+        contra = "sell" if order.side == "buy" else "buy"
+        fills = []
+        remaining = order.remaining
+        while remaining > 1e-12:
+            resting = self._top(contra)
+            if resting is None:
+                break
+            if limit is not None and (resting.price > limit if order.side == "buy" else resting.price < limit):
+                break
+            volume = min(remaining, resting.remaining)
+            fills.append((resting, volume, resting.price))
+            remaining -= volume
+            if resting.remaining - volume <= 1e-12:
+                # Pop it now so the next iteration sees the next resting order
+                heapq.heappop(self._asks if contra == "sell" else self._bids)
+        return fills
+
+    def trade_through(self, price: float, volume: Optional[float] = None) -> List[tuple]:
+        """
+        Fill resting orders against a market trade print.
+
+        Buy orders priced above the print and sell orders priced below it fill
+        at their limit price, in price-time order, until the print's volume is used.
+
+        Args:
+            price: Trade price
+            volume: Volume traded at that price (None for unlimited)
+
+        Returns:
+            List of (resting order, volume, price) fills
+        """
+        fills = []
+        for side in ("buy", "sell"):
+            heap = self._bids if side == "buy" else self._asks
+            available = volume
+            popped = []
+            while True:
+                resting = self._top(side)
+                if resting is None or (resting.price <= price if side == "buy" else resting.price >= price):
+                    break
+                fill = resting.remaining if available is None else min(available, resting.remaining)
+                if fill <= 1e-12:
+                    break
+                fills.append((resting, fill, resting.price))
+                if available is not None:
+                    available -= fill
+                entry = heapq.heappop(heap)
+                if resting.remaining - fill > 1e-12:
+                    popped.append(entry)
+            for entry in popped:
+                heapq.heappush(heap, entry)
+        return fills
+
+
+class MockExchange:
+    """
+    Simulated Kraken exchange: accounts, order books, a price path and fault injection.
+
+    All state changes happen under one lock, so the exchange can be shared by
+    several bots, threads and the HTTP server at once.
+    """
+
+    def __init__(self, balances: Optional[Dict[str, float]] = None, prices: Optional[Dict[str, float]] = None,
+                 asset_pairs: Optional[dict] = None, assets: Optional[dict] = None,
+                 fee_rate: float = DEFAULT_FEE_RATE, latency: Union[float, Callable[[str], float]] = 0.0,
+                 error_rate: float = 0.0, error: str = "EService:Unavailable", auto_advance: bool = False,
+                 seed: int = 0):
+        """
+        Initialize mock exchange.
+
+        Args:
+            balances: Starting balances by asset key for accounts not set up with add_account()
+            prices: Starting last-trade price by pair (any pair name)
+            asset_pairs: AssetPairs metadata (DEFAULT_ASSET_PAIRS if None)
+            assets: Assets metadata (DEFAULT_ASSETS if None)
+            fee_rate: Fee charged on every fill, in quote currency
+            latency: Seconds added to every request, or a function of the endpoint name
+            error_rate: Probability that a request fails with `error`
+            error: Kraken error returned for random failures
+            auto_advance: Step every pair's price path on each Ticker request
+            seed: Random seed for error injection and order IDs
+        """
+        self.asset_pairs = dict(asset_pairs or DEFAULT_ASSET_PAIRS)
+        self.assets = dict(assets or DEFAULT_ASSETS)
+        self.fee_rate = fee_rate
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error = error
+        self.auto_advance = auto_advance
+        self.default_balances = dict(balances or {"ZUSD": 1000.0})
+
+        self._lock = threading.RLock()
+        self._random = random.Random(seed)
+        self._seq = itertools.count(1)
+        self._pair_names = {}
+        for key, info in self.asset_pairs.items():
+            for name in (key, info.get('altname'), info.get('wsname')):
+                if name:
+                    self._pair_names[name.upper()] = key
+                    self._pair_names[name.replace('/', '').upper()] = key
+
+        self.books: Dict[str, OrderBook] = {key: OrderBook() for key in self.asset_pairs}
+        self.last_prices: Dict[str, float] = {}
+        for pair, price in dict(DEFAULT_PRICES, **(prices or {})).items():
+            key = self._pair_names.get(pair.upper())
+            if key is not None:
+                self.last_prices[key] = float(price)
+        self._paths: Dict[str, Iterable] = {}
+        self.prints: Dict[str, deque] = {key: deque(maxlen=MAX_PRINTS) for key in self.asset_pairs}
+
+        self.balances: Dict[str, Dict[str, float]] = {}
+        self.held: Dict[str, Dict[str, float]] = {}
+        self.orders: Dict[str, MockOrder] = {}
+        self._scripted_errors: Dict[str, List[str]] = {}
+        self.cancel_after: Dict[str, float] = {}  # api_key -> CancelAllOrdersAfter trigger (epoch seconds)
+        self.trades: Dict[str, List[tuple]] = {}  # api_key -> (trade id, TradesHistory entry), oldest first
+        self.ledgers: Dict[str, List[tuple]] = {}  # api_key -> (ledger id, Ledgers entry), oldest first
+
+        self.requests = 0
+        self.request_counts: Dict[str, int] = {}
+
+    # --- setup -------------------------------------------------------------
+
+    def add_account(self, api_key: str, balances: Dict[str, float]):
+        """Create (or reset) an account with the given balances by asset key."""
+        with self._lock:
+            self.balances[api_key] = {asset: float(amount) for asset, amount in balances.items()}
+            self.held[api_key] = {}
+
+    def set_price_path(self, pair: str, prices: Iterable[Union[float, tuple]]):
+        """
+        Script a pair's future trade prints.
+
+        Args:
+            pair: Trading pair (any name)
+            prices: Prices, or (price, volume) tuples, consumed one per advance()
+        """
+        with self._lock:
+            self._paths[self.pair_key(pair)] = iter(prices)
+
+    def load_prints(self, pair: str, prints: Iterable[tuple]):
+        """
+        Replace a pair's trade prints with canned history (served by OHLC and Trades, not filled against).
+
+        Args:
+            pair: Trading pair (any name)
+            prints: (timestamp, price, volume) tuples, oldest first
+        """
+        with self._lock:
+            key = self.pair_key(pair)
+            self.prints[key] = deque((float(ts), float(price), float(volume)) for ts, price, volume in prints)
+            if self.prints[key]:
+                self.last_prices[key] = self.prints[key][-1][1]
+
+    def inject_error(self, endpoint: str, error: str, count: int = 1):
+        """Make the next `count` requests to an endpoint fail with a Kraken error string."""
+        with self._lock:
+            self._scripted_errors.setdefault(endpoint, []).extend([error] * count)
+
+    def pair_key(self, pair: str) -> str:
+        key = self._pair_names.get(str(pair).upper())
+        if key is None:
+            raise MockError("EQuery:Unknown asset pair")
+        return key
+
+    # --- market ------------------------------------------------------------
+
+    def advance(self, pair: Optional[str] = None) -> bool:
+        """
+        Step price paths by one print and fill the orders it trades through.
+
+        Args:
+            pair: Pair to step (all pairs with a path if None)
+
+        Returns:
+            True if any path produced a new print
+        """
+        with self._lock:
+            keys = [self.pair_key(pair)] if pair else list(self._paths)
+            moved = False
+            for key in keys:
+                step = next(self._paths.get(key, iter(())), None)
+                if step is None:
+                    continue
+                price, volume = step if isinstance(step, tuple) else (step, None)
+                self.trade(key, price, volume)
+                moved = True
+            return moved
+
+    def trade(self, pair: str, price: float, volume: Optional[float] = None):
+        """Print a market trade at a price, filling resting orders it trades through."""
+        with self._lock:
+            key = self.pair_key(pair)
+            self.last_prices[key] = float(price)
+            self.prints[key].append((time.time(), float(price), float(volume or 0.0)))
+            for order, fill, fill_price in self.books[key].trade_through(float(price), volume):
+                self._execute(order, fill, fill_price)
+
+    # --- accounts ----------------------------------------------------------
+
+    def _account(self, api_key: str) -> Dict[str, float]:
+        if api_key not in self.balances:
+            self.add_account(api_key, self.default_balances)
+        return self.balances[api_key]
+
+    def _available(self, api_key: str, asset: str) -> float:
+        return self._account(api_key).get(asset, 0.0) - self.held[api_key].get(asset, 0.0)
+
+    def _execute(self, order: MockOrder, volume: float, price: float):
+        info = self.asset_pairs[order.pair]
+        base, quote = info['base'], info['quote']
+        balances = self._account(order.account)
+        held = self.held[order.account]
+        cost = volume * price
+        fee = cost * self.fee_rate
+
+        if order.side == "buy":
+            release = min(order.hold, cost + fee) if order.ordertype == "limit" else 0.0
+            balances[quote] = balances.get(quote, 0.0) - cost - fee
+            balances[base] = balances.get(base, 0.0) + volume
+            held[quote] = held.get(quote, 0.0) - release
+        else:
+            release = min(order.hold, volume)
+            balances[base] = balances.get(base, 0.0) - volume
+            balances[quote] = balances.get(quote, 0.0) + cost - fee
+            held[base] = held.get(base, 0.0) - release
+        order.hold -= release
+
+        order.vol_exec += volume
+        order.cost += cost
+        order.fee += fee
+        self._record_trade(order, volume, price, cost, fee)
+        if order.remaining <= 1e-12:
+            self._close(order, "closed")
+
+    def _record_trade(self, order: MockOrder, volume: float, price: float, cost: float, fee: float):
+        """Add a fill to the account's TradesHistory and Ledgers."""
+        info = self.asset_pairs[order.pair]
+        now = time.time()
+        trade_id = self._new_txid("T")
+        self.trades.setdefault(order.account, []).append((trade_id, {
+            "ordertxid": order.txid,
+            "postxid": self._new_txid("P"),
+            "pair": order.pair,
+            "time": now,
+            "type": order.side,
+            "ordertype": order.ordertype,
+            "price": "{:.8f}".format(price),
+            "cost": "{:.8f}".format(cost),
+            "fee": "{:.8f}".format(fee),
+            "vol": "{:.8f}".format(volume),
+            "margin": "0.00000000",
+            "misc": "",
+        }))
+        balances = self._account(order.account)
+        sign = 1 if order.side == "buy" else -1
+        ledger = self.ledgers.setdefault(order.account, [])
+        for asset, amount, entry_fee in ((info['base'], sign * volume, 0.0), (info['quote'], -sign * cost, fee)):
+            ledger.append((self._new_txid("L"), {
+                "refid": trade_id,
+                "time": now,
+                "type": "trade",
+                "subtype": "",
+                "aclass": "currency",
+                "asset": asset,
+                "amount": "{:.8f}".format(amount),
+                "fee": "{:.8f}".format(entry_fee),
+                "balance": "{:.8f}".format(balances.get(asset, 0.0)),
+            }))
+
+    def _close(self, order: MockOrder, status: str):
+        order.status = status
+        order.closetm = time.time()
+        if order.hold:
+            asset = self.asset_pairs[order.pair]['quote' if order.side == "buy" else 'base']
+            held = self.held[order.account]
+            held[asset] = held.get(asset, 0.0) - order.hold
+            order.hold = 0.0
+
+    def _new_txid(self, prefix: str = "O") -> str:
+        chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZ234567"
+        raw = "".join(self._random.choice(chars) for _ in range(16))
+        return "{}{}-{}-{}".format(prefix, raw[:5], raw[5:10], raw[10:])
+
+    # --- endpoints ---------------------------------------------------------
+
+    def handle(self, endpoint: str, params: Optional[dict] = None, api_key: str = "") -> dict:
+        """
+        Serve one REST request.
+
+        Args:
+            endpoint: Kraken endpoint name (e.g. "Ticker", "AddOrder")
+            params: Request parameters
+            api_key: Account the request is made for (private endpoints)
+
+        Returns:
+            Kraken response body: {"error": [...], "result": ...}
+        """
+        delay = self.latency(endpoint) if callable(self.latency) else self.latency
+        if delay:
+            time.sleep(delay)
+
+        handler = getattr(self, "_ep_{}".format(endpoint), None)
+        with self._lock:
+            if self.cancel_after:
+                self.check_dead_mans_switches()
+            self.requests += 1
+            self.request_counts[endpoint] = self.request_counts.get(endpoint, 0) + 1
+            try:
+                if handler is None:
+                    raise MockError("EGeneral:Unknown method")
+                scripted = self._scripted_errors.get(endpoint)
+                if scripted:
+                    raise MockError(scripted.pop(0))
+                if self.error_rate and self._random.random() < self.error_rate:
+                    raise MockError(self.error)
+                return {"error": [], "result": handler(params or {}, api_key)}
+            except MockError as e:
+                return {"error": [str(e)]}
+
+    def _ep_AssetPairs(self, params: dict, api_key: str) -> dict:
+        return self.asset_pairs
+
+    def _ep_Assets(self, params: dict, api_key: str) -> dict:
+        return self.assets
+
+    def _ep_Ticker(self, params: dict, api_key: str) -> dict:
+        if self.auto_advance:
+            self.advance()
+        keys = [self.pair_key(p) for p in _split(params.get('pair'))] or list(self.last_prices)
+        result = {}
+        for key in keys:
+            last = self.last_prices.get(key)
+            if last is None:
+                raise MockError("EGeneral:Invalid arguments:Index unavailable")
+            book = self.books[key]
+            ask = book.best_ask() or last
+            bid = book.best_bid() or last
+            result[key] = {
+                "a": ["{}".format(ask), "1", "1.000"],
+                "b": ["{}".format(bid), "1", "1.000"],
+                "c": ["{}".format(last), "0.00000000"],
+                "v": ["0", "0"],
+                "p": ["{}".format(last), "{}".format(last)],
+                "t": [0, 0],
+                "l": ["{}".format(last), "{}".format(last)],
+                "h": ["{}".format(last), "{}".format(last)],
+                "o": "{}".format(last),
+            }
+        return result
+
+    def _ep_OHLC(self, params: dict, api_key: str) -> dict:
+        key = self.pair_key(params.get('pair', ''))
+        interval = int(params.get('interval') or 1) * 60
+        since = float(params.get('since') or 0)
+        prints = list(self.prints[key]) or [(time.time(), self.last_prices.get(key, 0.0), 0.0)]
+        candles = []
+        for ts, price, volume in prints:
+            start = int(ts // interval * interval)
+            if start <= since:
+                continue
+            if candles and candles[-1][0] == start:
+                candle = candles[-1]
+                candle[2] = max(candle[2], price)
+                candle[3] = min(candle[3], price)
+                candle[4] = price
+                candle[5] += price * volume
+                candle[6] += volume
+                candle[7] += 1
+            else:
+                candles.append([start, price, price, price, price, price * volume, volume, 1])
+        rows = [[start, "{}".format(o), "{}".format(h), "{}".format(l), "{}".format(c),
+                 "{}".format(pv / volume if volume else c), "{:.8f}".format(volume), count]
+                for start, o, h, l, c, pv, volume, count in candles[-720:]]
+        return {key: rows, "last": rows[-1][0] if rows else int(since)}
+
+    def _ep_Trades(self, params: dict, api_key: str) -> dict:
+        key = self.pair_key(params.get('pair', ''))
+        since = float(params.get('since') or 0)
+        if since > 1e12:
+            since /= 1e9  # nanosecond cursor, as returned in "last"
+        prints = self.prints[key]
+        timestamps = [ts for ts, _, _ in prints]
+        start = bisect.bisect_right(timestamps, since)
+        rows = []
+        previous = prints[start - 1][1] if start else None
+        for ts, price, volume in itertools.islice(prints, start, start + TRADES_PAGE):
+            side = "s" if previous is not None and price < previous else "b"
+            rows.append(["{}".format(price), "{:.8f}".format(volume), ts, side, "l", "", int(ts * 1e9)])
+            previous = price
+        last = rows[-1][2] if rows else since
+        return {key: rows, "last": str(int(last * 1e9))}
+
+    def _ep_Balance(self, params: dict, api_key: str) -> dict:
+        return {asset: "{:.10f}".format(amount) for asset, amount in self._account(api_key).items()}
+
+    def _ep_OpenOrders(self, params: dict, api_key: str) -> dict:
+        return {"open": {
+            txid: order.to_dict(self.asset_pairs[order.pair]['altname'])
+            for txid, order in self.orders.items()
+            if order.account == api_key and order.status == "open"
+        }}
+
+    def _ep_QueryOrders(self, params: dict, api_key: str) -> dict:
+        result = {}
+        for txid in _split(params.get('txid')):
+            order = self.orders.get(txid)
+            if order is None or order.account != api_key:
+                raise MockError("EOrder:Invalid order")
+            result[txid] = order.to_dict(self.asset_pairs[order.pair]['altname'])
+        return result
+
+    def _ep_ClosedOrders(self, params: dict, api_key: str) -> dict:
+        start = float(params.get('start') or 0)
+        closed = sorted((order for order in self.orders.values()
+                         if order.account == api_key and order.status != "open" and order.closetm > start),
+                        key=lambda order: order.closetm, reverse=True)
+        ofs = int(params.get('ofs') or 0)
+        return {"closed": {order.txid: order.to_dict(self.asset_pairs[order.pair]['altname'])
+                           for order in closed[ofs:ofs + 50]},
+                "count": len(closed)}
+
+    @staticmethod
+    def _history_page(entries: List[tuple], params: dict) -> Tuple[dict, int]:
+        """Newest-first page of up to 50 (id, entry) records with start < time <= end."""
+        start = float(params.get('start') or 0)
+        end = float(params.get('end') or 0)
+        selected = [(key, entry) for key, entry in reversed(entries)
+                    if entry['time'] > start and (not end or entry['time'] <= end)]
+        ofs = int(params.get('ofs') or 0)
+        return dict(selected[ofs:ofs + 50]), len(selected)
+
+    def _ep_TradesHistory(self, params: dict, api_key: str) -> dict:
+        trades, count = self._history_page(self.trades.get(api_key, []), params)
+        return {"trades": trades, "count": count}
+
+    def _ep_Ledgers(self, params: dict, api_key: str) -> dict:
+        ledger, count = self._history_page(self.ledgers.get(api_key, []), params)
+        return {"ledger": ledger, "count": count}
+
+    def _ep_AddOrder(self, params: dict, api_key: str) -> dict:
+        key = self.pair_key(params.get('pair', ''))
+        info = self.asset_pairs[key]
+        side = params.get('type')
+        ordertype = params.get('ordertype')
+        if side not in ("buy", "sell") or ordertype not in ("limit", "market"):
+            raise MockError("EGeneral:Invalid arguments")
+        try:
+            volume = float(params.get('volume'))
+            price = float(params.get('price')) if ordertype == "limit" else 0.0
+        except (TypeError, ValueError):
+            raise MockError("EGeneral:Invalid arguments")
+        if volume < float(info.get('ordermin', 0)):
+            raise MockError("EOrder:Order minimum not met")
+        if ordertype == "limit" and _decimals(params.get('price')) > int(info.get('pair_decimals', 8)):
+            raise MockError("EOrder:Invalid price:{} price can only be specified up to {} decimals.".format(
+                info['altname'], info['pair_decimals']))
+
+        book = self.books[key]
+        if ordertype == "market":
+            price = (book.best_ask() if side == "buy" else book.best_bid()) or self.last_prices.get(key, 0.0)
+        hold_asset = info['quote'] if side == "buy" else info['base']
+        hold = volume * price * (1 + self.fee_rate) if side == "buy" else volume
+        if self._available(api_key, hold_asset) + 1e-9 < hold:
+            raise MockError("EOrder:Insufficient funds")
+
+        descr = {"order": "{} {} {} @ {} {}".format(side, params.get('volume'), info['altname'], ordertype,
+                                                     params.get('price', ''))}
+        if str(params.get('validate', '')).lower() in ("true", "1"):
+            return {"descr": descr}
+
+        order = MockOrder(self._new_txid(), api_key, key, side, ordertype, price, volume, next(self._seq))
+        self.orders[order.txid] = order
+        if ordertype == "limit":
+            order.hold = hold
+            held = self.held[api_key]
+            held[hold_asset] = held.get(hold_asset, 0.0) + hold
+
+        for resting, fill, fill_price in book.match(order, price if ordertype == "limit" else None):
+            self._execute(resting, fill, fill_price)
+            self._execute(order, fill, fill_price)
+            self.last_prices[key] = fill_price
+        if order.status == "open":
+            if ordertype == "limit":
+                book.rest(order)
+            else:
+                # Liquidity beyond the book: fill the rest at the last price
+                self._execute(order, order.remaining, price)
+        return {"descr": descr, "txid": [order.txid]}
+
+    def _ep_AddOrderBatch(self, params: dict, api_key: str) -> dict:
+        orders = params.get('orders') or []
+        if not 2 <= len(orders) <= 15:
+            raise MockError("EGeneral:Invalid arguments:orders")
+        self.pair_key(params.get('pair', ''))
+        results = []
+        for order in orders:
+            try:
+                placed = self._ep_AddOrder(dict(order, pair=params['pair'], validate=params.get('validate')), api_key)
+                result = {"descr": placed["descr"]}
+                if "txid" in placed:
+                    result["txid"] = placed["txid"][0]
+                results.append(result)
+            except MockError as e:
+                results.append({"error": str(e)})
+        return {"orders": results}
+
+    def _ep_CancelOrder(self, params: dict, api_key: str) -> dict:
+        order = self.orders.get(str(params.get('txid')))
+        if order is None or order.account != api_key:
+            raise MockError("EOrder:Unknown order")
+        if order.status != "open":
+            return {"count": 0}
+        self._close(order, "canceled")
+        return {"count": 1}
+
+    def _ep_CancelOrderBatch(self, params: dict, api_key: str) -> dict:
+        txids = _split(params.get('orders'))
+        if not 1 <= len(txids) <= 50:
+            raise MockError("EGeneral:Invalid arguments:orders")
+        count = 0
+        for txid in txids:
+            order = self.orders.get(txid)
+            if order is not None and order.account == api_key and order.status == "open":
+                self._close(order, "canceled")
+                count += 1
+        return {"count": count}
+
+    def _ep_CancelAll(self, params: dict, api_key: str) -> dict:
+        return {"count": self._cancel_all(api_key)}
+
+    def _ep_CancelAllOrdersAfter(self, params: dict, api_key: str) -> dict:
+        timeout = int(params.get('timeout', 0))
+        now = time.time()
+        if timeout:
+            self.cancel_after[api_key] = now + timeout
+        else:
+            self.cancel_after.pop(api_key, None)
+        stamp = "%Y-%m-%dT%H:%M:%SZ"
+        return {"currentTime": time.strftime(stamp, time.gmtime(now)),
+                "triggerTime": time.strftime(stamp, time.gmtime(now + timeout)) if timeout else "0"}
+
+    def _cancel_all(self, api_key: str) -> int:
+        orders = [order for order in self.orders.values() if order.account == api_key and order.status == "open"]
+        for order in orders:
+            self._close(order, "canceled")
+        return len(orders)
+
+    def check_dead_mans_switches(self):
+        """Cancel the orders of accounts whose CancelAllOrdersAfter timer has run out."""
+        now = time.time()
+        with self._lock:
+            for api_key, trigger in list(self.cancel_after.items()):
+                if now >= trigger:
+                    del self.cancel_after[api_key]
+                    count = self._cancel_all(api_key)
+                    logger.info("Dead man's switch fired for %s: %s order(s) cancelled", api_key or "default", count)
+
+
+def _split(value) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value]
+    return [v for v in str(value).split(',') if v]
+
+
+def _decimals(value) -> int:
+    text = str(value)
+    if 'e' in text.lower():
+        text = "{:f}".format(float(text))
+    return len(text.split('.')[1].rstrip('0')) if '.' in text else 0
+
+
+class _MockSpotClient:
+    """Stand-in for a python-kraken-sdk Spot client that calls a MockExchange directly."""
+
+    def __init__(self, exchange: MockExchange, key: str = ""):
+        self.exchange = exchange
+        self.key = key
+        self._errors = KrakenErrorHandler()
+
+    def _call(self, endpoint: str, **params):
+        # Same result unwrapping and exception mapping as the real SDK
+        return self._errors.check(self.exchange.handle(endpoint, params, self.key))
+
+
+class MockMarket(_MockSpotClient):
+    """In-process replacement for kraken.spot.Market."""
+
+    def get_asset_pairs(self, pair=None, info=None):
+        return self._call("AssetPairs")
+
+    def get_assets(self, assets=None, aclass=None):
+        return self._call("Assets")
+
+    def get_ticker(self, pair=None):
+        return self._call("Ticker", pair=pair)
+
+    def get_ohlc(self, pair, interval=1, since=None):
+        return self._call("OHLC", pair=pair, interval=interval, since=since)
+
+    def get_recent_trades(self, pair, since=None, count=None):
+        return self._call("Trades", pair=pair, since=since)
+
+
+class MockUser(_MockSpotClient):
+    """In-process replacement for kraken.spot.User."""
+
+    def get_account_balance(self):
+        return self._call("Balance")
+
+    def get_open_orders(self, trades=False, userref=None):
+        return self._call("OpenOrders")
+
+    def get_orders_info(self, txid, trades=False, userref=None, consolidate_taker=True):
+        return self._call("QueryOrders", txid=txid)
+
+    def get_closed_orders(self, trades=False, userref=None, start=None, end=None, ofs=None, closetime="both"):
+        return self._call("ClosedOrders", start=start, ofs=ofs)
+
+    def get_trades_history(self, type_="all", trades=False, start=None, end=None, ofs=None, consolidate_taker=True):
+        return self._call("TradesHistory", start=start, end=end, ofs=ofs)
+
+    def get_ledgers_info(self, asset="all", aclass="currency", type_="all", start=None, end=None, ofs=None):
+        return self._call("Ledgers", start=start, end=end, ofs=ofs)
+
+
+class MockTrade(_MockSpotClient):
+    """In-process replacement for kraken.spot.Trade."""
+
+    def create_order(self, ordertype, side, volume, pair, price=None, validate=False, **kwargs):
+        return self._call("AddOrder", ordertype=ordertype, type=side, volume=volume, pair=pair, price=price,
+                          validate=validate)
+
+    def cancel_order_batch(self, orders):
+        return self._call("CancelOrderBatch", orders=orders)
+
+    def cancel_all_orders(self):
+        return self._call("CancelAll")
+
+    def cancel_all_orders_after_x(self, timeout=0):
+        return self._call("CancelAllOrdersAfter", timeout=timeout)
+
+    def create_order_batch(self, orders, pair, deadline=None, validate=False):
+        return self._call("AddOrderBatch", orders=orders, pair=pair, validate=validate)
+
+    def cancel_order(self, txid):
+        return self._call("CancelOrder", txid=txid)
+
+
+def connect_client(client, exchange: MockExchange):
+    """
+    Point a KrakenClient at a MockExchange in-process.
+
+    Args:
+        client: KrakenClient whose SDK clients are replaced
+        exchange: Exchange to trade on (the client's API key selects the account)
+    """
+    client.market = MockMarket(exchange)
+    client.trade = MockTrade(exchange, client.api_key)
+    client.user = MockUser(exchange, client.api_key)
+    client.registry.market = client.market
+    return client
+
+
+class _MockRequestHandler(BaseHTTPRequestHandler):
+    """Serves /0/public/<Endpoint> and /0/private/<Endpoint> from the server's exchange."""
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body are written separately; avoid Nagle/delayed ACK stalls
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _serve(self, params: dict):
+        parts = urlparse(self.path).path.strip('/').split('/')
+        if len(parts) != 3 or parts[1] not in ("public", "private"):
+            self.send_error(404)
+            return
+        endpoint = parts[2]
+        api_key = self.headers.get("API-Key", "")
+        if parts[1] == "private" and not api_key:
+            body = {"error": ["EAPI:Invalid key"]}
+        elif parts[1] == "public" and endpoint not in PUBLIC_ENDPOINTS:
+            body = {"error": ["EGeneral:Unknown method"]}
+        else:
+            body = self.server.exchange.handle(endpoint, params, api_key)
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        self._serve({k: v[0] if len(v) == 1 else v for k, v in query.items()})
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            params = json.loads(raw or "{}")
+        else:
+            params = {k: v[0] if len(v) == 1 else v for k, v in parse_qs(raw).items()}
+        self._serve(params)
+
+    def log_message(self, format, *args):
+        logger.debug("Mock Kraken: " + format, *args)
+
+
+class MockKrakenServer:
+    """Localhost HTTP front end for a MockExchange (plain HTTP, keep-alive, one thread per connection)."""
+
+    def __init__(self, exchange: MockExchange, host: str = "127.0.0.1", port: int = 0):
+        """
+        Initialize mock server.
+
+        Args:
+            exchange: Exchange that serves requests
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port)
+        """
+        self.exchange = exchange
+        self._server = ThreadingHTTPServer((host, port), _MockRequestHandler)
+        self._server.daemon_threads = True
+        self._server.exchange = exchange
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """REST base URL to use as KRAKEN_API_URL."""
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}/0".format(host, port)
+
+    def start(self):
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-kraken", daemon=True)
+        self._thread.start()
+        logger.info("Mock Kraken API listening on %s", self.url)
+
+    def stop(self):
+        """Stop serving and close the listening socket."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def main():
+    """Run a mock Kraken API on localhost."""
+    parser = argparse.ArgumentParser(description="Local mock Kraken REST API with a matching engine")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--usd", type=float, default=1000.0, help="starting USD balance of every account")
+    parser.add_argument("--pair", default="XRPUSD", help="pair the price path applies to")
+    parser.add_argument("--path", default="", help="comma separated prices to step through")
+    parser.add_argument("--step", type=float, default=0.0, help="seconds between price path steps (0 = on each Ticker call)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    exchange = MockExchange(balances={"ZUSD": args.usd}, latency=args.latency, error_rate=args.error_rate,
+                            auto_advance=bool(args.path) and not args.step)
+    if args.path:
+        exchange.set_price_path(args.pair, [float(p) for p in args.path.split(',')])
+
+    server = MockKrakenServer(exchange, args.host, args.port)
+    server.start()
+    try:
+        while True:
+            time.sleep(args.step or 1)
+            if args.step:
+                exchange.advance()
+    except KeyboardInterrupt:
+        server.stop()
+        logger.info("Served %s requests: %s", exchange.requests, exchange.request_counts)
+
+
+if __name__ == "__main__":
+    main()
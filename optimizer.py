@@ -0,0 +1,226 @@
+"""Parallel parameter sweep of BUY_PRICE / SELL_PRICE / DOLLARS_BUY_AMOUNT / SELL_ALL.
+
+Every combination is backtested with backtester.run_backtest over one
+historical price series. The series is copied once into shared memory and
+every worker process maps it as NumPy views, so nothing is pickled per task.
+Combinations are grouped by price so each worker reuses its fill-tick arrays.
+Results are appended to the output CSV as they arrive and the file is
+rewritten ranked by P&L when the sweep finishes.
+
+Usage:
+    python optimizer.py prices.csv --buy 0.40:0.50:0.005 --sell 0.50:0.70:0.005 \\
+        --dollars 50,100,200 --sell-all both --usd 1000
+"""
+import argparse
+import csv
+import itertools
+import logging
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+from backtester import DEFAULT_FEE_RATE, PriceSeries, load_prices, run_backtest
+from config import Config
+import strategy
+
+logger = logging.getLogger(__name__)
+
+RESULT_FIELDS = ['buy_price', 'sell_price', 'dollars_buy_amount', 'sell_all', 'pnl', 'realized_pnl',
+                 'round_trips', 'fills', 'fees', 'end_equity']
+
+# Worker process state, set by _init_worker
+_worker_prices: Optional[PriceSeries] = None
+_worker_shm: Optional[shared_memory.SharedMemory] = None
+_worker_settings: dict = {}
+_worker_fill_cache: dict = {}
+MAX_FILL_CACHE = 256  # fill-tick arrays kept per worker
+
+
+def parse_values(spec: str) -> List[float]:
+    """
+    Parse a sweep axis.
+
+    Args:
+        spec: "start:stop:step" (stop inclusive) or a comma separated list
+
+    Returns:
+        List of values
+    """
+    if ':' in spec:
+        start, stop, step = (float(x) for x in spec.split(':'))
+        if step <= 0:
+            raise ValueError("Step must be greater than 0 in '{}'".format(spec))
+        count = int(round((stop - start) / step)) + 1
+        return [round(start + i * step, 10) for i in range(count)]
+    return [float(x) for x in spec.split(',') if x.strip()]
+
+
+def build_combinations(buy_prices: List[float], sell_prices: List[float], dollars: List[float],
+                       sell_all: List[bool], samples: int = 0, seed: int = 0) -> List[Tuple[float, float, float, bool]]:
+    """
+    Build the parameter combinations to evaluate.
+
+    Args:
+        buy_prices: Buy price axis
+        sell_prices: Sell price axis
+        dollars: DOLLARS_BUY_AMOUNT axis
+        sell_all: SELL_ALL values
+        samples: Evaluate this many random grid points instead of the full grid (0 = full grid)
+        seed: Random seed for sampling
+
+    Returns:
+        (buy_price, sell_price, dollars_buy_amount, sell_all) tuples, grouped by price
+    """
+    grid = [combo for combo in itertools.product(buy_prices, sell_prices, dollars, sell_all)
+            if combo[1] > combo[0]]
+    if samples and samples < len(grid):
+        grid = random.Random(seed).sample(grid, samples)
+    # Group combinations that share limit prices so workers reuse fill-tick arrays
+    grid.sort(key=lambda combo: (combo[0], combo[1]))
+    return grid
+
+
+def _attach_prices(name: str, length: int) -> Tuple[shared_memory.SharedMemory, PriceSeries]:
+    shm = shared_memory.SharedMemory(name=name)
+    block = np.ndarray((4, length), dtype=np.float64, buffer=shm.buf)
+    return shm, PriceSeries(block[0], block[1], block[2], block[3])
+
+
+def _init_worker(name: str, length: int, settings: dict):
+    global _worker_prices, _worker_shm, _worker_settings
+    _worker_shm, _worker_prices = _attach_prices(name, length)
+    _worker_settings = settings
+
+
+def _evaluate(chunk: List[Tuple[float, float, float, bool]]) -> List[list]:
+    """Backtest a chunk of combinations in a worker process."""
+    if len(_worker_fill_cache) > MAX_FILL_CACHE:
+        _worker_fill_cache.clear()
+    rows = []
+    for buy_price, sell_price, dollars, sell_all in chunk:
+        params = strategy.StrategyParams(buy_price, sell_price, dollars, sell_all, _worker_settings['min_trade_size'])
+        result = run_backtest(
+            _worker_prices, params,
+            usd_balance=_worker_settings['usd_balance'],
+            crypto_balance=_worker_settings['crypto_balance'],
+            fee_rate=_worker_settings['fee_rate'],
+            fill_on_touch=_worker_settings['fill_on_touch'],
+            fill_cache=_worker_fill_cache
+        )
+        rows.append([buy_price, sell_price, dollars, sell_all, round(result.pnl, 2), round(result.realized_pnl, 2),
+                     result.round_trips, len(result.fills), round(result.fees, 2), round(result.end_equity, 2)])
+    return rows
+
+
+def _chunks(combos: List, size: int) -> Iterable[List]:
+    for i in range(0, len(combos), size):
+        yield combos[i:i + size]
+
+
+def run_sweep(prices: PriceSeries, combos: List[Tuple[float, float, float, bool]], out_path: str,
+              usd_balance: float, crypto_balance: float = 0.0, fee_rate: float = DEFAULT_FEE_RATE,
+              fill_on_touch: bool = False, min_trade_size: float = 0.0,
+              workers: Optional[int] = None, chunk_size: int = 64) -> List[list]:
+    """
+    Backtest every combination in parallel and write a ranked CSV.
+
+    Args:
+        prices: Historical price series
+        combos: Combinations from build_combinations()
+        out_path: Result CSV path (streamed while running, ranked by P&L at the end)
+        usd_balance: Starting USD balance for every run
+        crypto_balance: Starting crypto balance for every run
+        fee_rate: Fee charged on every fill
+        fill_on_touch: Fill when the market trades exactly at the limit price
+        min_trade_size: Minimum crypto order size
+        workers: Worker processes (defaults to all cores)
+        chunk_size: Combinations per task
+
+    Returns:
+        Result rows ranked by P&L, best first
+    """
+    length = len(prices.timestamps)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, 4 * length * 8))
+    try:
+        block = np.ndarray((4, length), dtype=np.float64, buffer=shm.buf)
+        block[0], block[1], block[2], block[3] = prices.timestamps, prices.lows, prices.highs, prices.closes
+        del block
+
+        settings = {
+            'usd_balance': usd_balance,
+            'crypto_balance': crypto_balance,
+            'fee_rate': fee_rate,
+            'fill_on_touch': fill_on_touch,
+            'min_trade_size': min_trade_size,
+        }
+        rows = []
+        start = time.time()
+        with open(out_path, 'w', newline='') as f, ProcessPoolExecutor(
+                max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                initargs=(shm.name, length, settings)) as pool:
+            writer = csv.writer(f)
+            writer.writerow(RESULT_FIELDS)
+            futures = [pool.submit(_evaluate, chunk) for chunk in _chunks(combos, chunk_size)]
+            for future in as_completed(futures):
+                chunk_rows = future.result()
+                writer.writerows(chunk_rows)
+                f.flush()
+                rows.extend(chunk_rows)
+                logger.info("Evaluated %s/%s combinations (%.1fs)", len(rows), len(combos), time.time() - start)
+    finally:
+        shm.close()
+        shm.unlink()
+
+    rows.sort(key=lambda row: row[RESULT_FIELDS.index('pnl')], reverse=True)
+    tmp_path = "{}.tmp".format(out_path)
+    with open(tmp_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(RESULT_FIELDS)
+        writer.writerows(rows)
+    os.replace(tmp_path, out_path)
+    return rows
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Sweep BUY_PRICE/SELL_PRICE/DOLLARS_BUY_AMOUNT/SELL_ALL over historical prices")
+    parser.add_argument("prices", help="CSV of timestamp,price[,volume] trades or Kraken OHLC candles (or .npy)")
+    parser.add_argument("--buy", required=True, help="buy prices as start:stop:step or a comma separated list")
+    parser.add_argument("--sell", required=True, help="sell prices as start:stop:step or a comma separated list")
+    parser.add_argument("--dollars", default=str(Config.DOLLARS_BUY_AMOUNT), help="USD per buy values")
+    parser.add_argument("--sell-all", choices=("true", "false", "both"), default="both")
+    parser.add_argument("--samples", type=int, default=0, help="evaluate this many random grid points (0 = full grid)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for --samples")
+    parser.add_argument("--usd", type=float, default=1000.0, help="starting USD balance")
+    parser.add_argument("--crypto", type=float, default=0.0, help="starting crypto balance")
+    parser.add_argument("--fee", type=float, default=DEFAULT_FEE_RATE, help="fee rate per fill")
+    parser.add_argument("--fill-on-touch", action="store_true", help="fill when price touches the limit")
+    parser.add_argument("--min-trade-size", type=float, default=Config.MIN_CRYPTO_TRADE_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--out", default="sweep_results.csv", help="ranked result CSV")
+    parser.add_argument("--top", type=int, default=10, help="print this many best combinations")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=Config.LOG_LEVEL, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    sell_all = {'true': [True], 'false': [False], 'both': [False, True]}[args.sell_all]
+    combos = build_combinations(parse_values(args.buy), parse_values(args.sell), parse_values(args.dollars),
+                                sell_all, args.samples, args.seed)
+    prices = load_prices(args.prices)
+    logger.info("Sweeping %s combinations over %s ticks", len(combos), len(prices.timestamps))
+
+    start = time.time()
+    rows = run_sweep(prices, combos, args.out, args.usd, args.crypto, args.fee, args.fill_on_touch,
+                     args.min_trade_size, args.workers)
+    logger.info("Done in %.1fs - results in %s", time.time() - start, args.out)
+
+    print(",".join(RESULT_FIELDS))
+    for row in rows[:args.top]:
+        print(",".join(str(value) for value in row))
+
+
+if __name__ == "__main__":
+    main()
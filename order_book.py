@@ -0,0 +1,449 @@
+"""Local L2 order books maintained from Kraken's WebSocket book channel."""
+import argparse
+import json
+import logging
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from market_data import PriceFeed, to_ws_pair
+
+logger = logging.getLogger(__name__)
+
+# Depths Kraken's book channel accepts
+BOOK_DEPTHS = (10, 25, 100, 500, 1000)
+
+# Levels per side covered by Kraken's book checksum
+CHECKSUM_LEVELS = 10
+
+
+def _decimals(value: str) -> int:
+    """Digits after the decimal point of a Kraken price/volume string."""
+    return len(value.partition(".")[2])
+
+
+def _to_ticks(value: str, decimals: int) -> int:
+    """Parse a Kraken decimal string into an integer count of its smallest unit."""
+    whole, _, frac = value.partition(".")
+    return int(whole + frac[:decimals].ljust(decimals, "0"))
+
+
+class BookSide:
+    """
+    One side of an order book as two preallocated int64 arrays, best level first.
+
+    Prices and volumes are kept as integer ticks (the decimal strings Kraken
+    sends with the point removed), so levels compare exactly and the checksum
+    string is just their decimal representation. Bids are stored with negated
+    prices so both sides are sorted ascending from the best level. Inserting or
+    deleting a level is a binary search plus one in-place shift of at most
+    depth entries; levels pushed past depth are dropped, as Kraken expects.
+    """
+
+    def __init__(self, depth: int, descending: bool):
+        """
+        Initialize book side.
+
+        Args:
+            depth: Levels kept
+            descending: True for bids (best price is the highest)
+        """
+        self.depth = depth
+        self.sign = -1 if descending else 1
+        self.keys = np.zeros(depth, dtype=np.int64)  # sign * price ticks
+        self.volumes = np.zeros(depth, dtype=np.int64)  # volume ticks
+        self.size = 0
+
+    def clear(self):
+        self.size = 0
+
+    def update(self, price: int, volume: int):
+        """
+        Set the volume at a price level (volume 0 deletes the level).
+
+        Args:
+            price: Price in ticks
+            volume: Volume in ticks
+        """
+        key = self.sign * price
+        n = self.size
+        keys = self.keys
+        i = int(np.searchsorted(keys[:n], key))
+        if i < n and keys[i] == key:
+            if volume:
+                self.volumes[i] = volume
+            else:
+                keys[i:n - 1] = keys[i + 1:n]
+                self.volumes[i:n - 1] = self.volumes[i + 1:n]
+                self.size = n - 1
+        elif volume and i < self.depth:
+            if n == self.depth:
+                n -= 1  # the worst level falls out of the book
+            keys[i + 1:n + 1] = keys[i:n]
+            self.volumes[i + 1:n + 1] = self.volumes[i:n]
+            keys[i] = key
+            self.volumes[i] = volume
+            self.size = n + 1
+
+    def prices(self, n: Optional[int] = None) -> np.ndarray:
+        """Price ticks of the best n levels (all if None), best first."""
+        n = self.size if n is None else min(n, self.size)
+        return self.sign * self.keys[:n]
+
+    def find(self, price: int) -> Tuple[int, bool]:
+        """Index of a price level (or where it would go) and whether the level exists."""
+        key = self.sign * price
+        i = int(np.searchsorted(self.keys[:self.size], key))
+        return i, i < self.size and self.keys[i] == key
+
+
+class OrderBook:
+    """
+    L2 order book of one pair, built from a book snapshot and kept current with deltas.
+
+    Query methods take prices in quote currency and return floats; they are
+    safe to call from another thread than the one applying updates.
+    """
+
+    def __init__(self, pair: str, depth: int = 100):
+        """
+        Initialize order book.
+
+        Args:
+            pair: WebSocket pair name (e.g., "XBT/USD")
+            depth: Levels kept per side
+        """
+        self.pair = pair
+        self.depth = depth
+        self.asks = BookSide(depth, descending=False)
+        self.bids = BookSide(depth, descending=True)
+        self.price_decimals = 0
+        self.volume_decimals = 0
+        self.updated = 0.0
+        self._lock = threading.Lock()
+
+    def apply_snapshot(self, asks: Iterable[list], bids: Iterable[list]):
+        """
+        Replace the book with a snapshot.
+
+        Args:
+            asks: [price, volume, timestamp] entries as sent by Kraken
+            bids: [price, volume, timestamp] entries as sent by Kraken
+        """
+        asks, bids = list(asks), list(bids)
+        sample = (asks or bids or [["0", "0"]])[0]
+        with self._lock:
+            self.price_decimals = _decimals(sample[0])
+            self.volume_decimals = _decimals(sample[1])
+            self.asks.clear()
+            self.bids.clear()
+            self._apply(self.asks, asks)
+            self._apply(self.bids, bids)
+            self.updated = time.time()
+
+    def apply_update(self, asks: Iterable[list] = (), bids: Iterable[list] = ()):
+        """
+        Apply level updates (volume "0.00000000" deletes a level).
+
+        Args:
+            asks: [price, volume, timestamp(, "r")] entries as sent by Kraken
+            bids: [price, volume, timestamp(, "r")] entries as sent by Kraken
+        """
+        with self._lock:
+            self._apply(self.asks, asks)
+            self._apply(self.bids, bids)
+            self.updated = time.time()
+
+    def _apply(self, side: BookSide, entries: Iterable[list]):
+        price_decimals, volume_decimals = self.price_decimals, self.volume_decimals
+        for entry in entries:
+            side.update(_to_ticks(entry[0], price_decimals), _to_ticks(entry[1], volume_decimals))
+
+    def checksum(self) -> int:
+        """
+        Kraken's CRC32 checksum of the top 10 asks and bids.
+
+        Each level contributes its price and volume with the decimal point and
+        leading zeros removed - exactly the decimal form of the tick integers.
+        """
+        with self._lock:
+            parts = []
+            for side in (self.asks, self.bids):
+                n = min(CHECKSUM_LEVELS, side.size)
+                for price, volume in zip(side.prices(n).tolist(), side.volumes[:n].tolist()):
+                    parts.append(str(price))
+                    parts.append(str(volume))
+        return zlib.crc32("".join(parts).encode())
+
+    def _price(self, ticks: int) -> float:
+        return ticks / 10 ** self.price_decimals
+
+    def _volume(self, ticks: int) -> float:
+        return ticks / 10 ** self.volume_decimals
+
+    def best_bid(self) -> Optional[float]:
+        """Highest bid price (None if there are no bids)."""
+        with self._lock:
+            return self._price(-int(self.bids.keys[0])) if self.bids.size else None
+
+    def best_ask(self) -> Optional[float]:
+        """Lowest ask price (None if there are no asks)."""
+        with self._lock:
+            return self._price(int(self.asks.keys[0])) if self.asks.size else None
+
+    def spread(self) -> Optional[float]:
+        """Best ask minus best bid (None unless both sides have levels)."""
+        bid, ask = self.best_bid(), self.best_ask()
+        return None if bid is None or ask is None else ask - bid
+
+    def mid(self) -> Optional[float]:
+        """Midpoint of the best bid and ask."""
+        bid, ask = self.best_bid(), self.best_ask()
+        return None if bid is None or ask is None else (bid + ask) / 2
+
+    def _side(self, side: str) -> BookSide:
+        if side not in ("buy", "sell"):
+            raise ValueError("side must be 'buy' or 'sell', not {!r}".format(side))
+        return self.bids if side == "buy" else self.asks
+
+    def depth_at(self, side: str, price: float) -> float:
+        """
+        Volume resting at exactly one price level.
+
+        Args:
+            side: "buy" for the bids, "sell" for the asks
+            price: Price level
+
+        Returns:
+            Volume at the level (0 if there is none)
+        """
+        book_side = self._side(side)
+        with self._lock:
+            i, found = book_side.find(round(price * 10 ** self.price_decimals))
+            return self._volume(int(book_side.volumes[i])) if found else 0.0
+
+    def volume_ahead(self, side: str, price: float) -> float:
+        """
+        Volume an order placed now at price would queue behind.
+
+        That is all volume on the same side at the same or a better price
+        (higher for bids, lower for asks), within the book's depth.
+
+        Args:
+            side: Order side, "buy" or "sell"
+            price: Limit price
+
+        Returns:
+            Volume ahead in the queue
+        """
+        book_side = self._side(side)
+        with self._lock:
+            i, found = book_side.find(round(price * 10 ** self.price_decimals))
+            return self._volume(int(book_side.volumes[:i + found].sum()))
+
+    def imbalance(self, levels: int = 10) -> Optional[float]:
+        """
+        Bid/ask volume imbalance over the best levels, from -1 (all asks) to 1 (all bids).
+
+        Args:
+            levels: Levels per side included
+
+        Returns:
+            (bid volume - ask volume) / (bid volume + ask volume), None for an empty book
+        """
+        with self._lock:
+            bid = self._volume(int(self.bids.volumes[:min(levels, self.bids.size)].sum()))
+            ask = self._volume(int(self.asks.volumes[:min(levels, self.asks.size)].sum()))
+        total = bid + ask
+        return (bid - ask) / total if total > 0 else None
+
+    def levels(self, side: str, n: int = 10) -> List[Tuple[float, float]]:
+        """
+        Best price levels of one side.
+
+        Args:
+            side: "buy" for the bids, "sell" for the asks
+            n: Levels returned
+
+        Returns:
+            (price, volume) pairs, best first
+        """
+        book_side = self._side(side)
+        with self._lock:
+            n = min(n, book_side.size)
+            return [(self._price(price), self._volume(volume))
+                    for price, volume in zip(book_side.prices(n).tolist(), book_side.volumes[:n].tolist())]
+
+
+class OrderBookFeed(PriceFeed):
+    """
+    Order books for several pairs streamed over Kraken's public book channel.
+
+    Connection handling, reconnects and resubscription come from PriceFeed.
+    Every update that carries a checksum is verified against the local book;
+    on a mismatch the book is marked stale and the pair is resubscribed, which
+    makes Kraken send a fresh snapshot. get_book() returns None while a pair's
+    book is stale, so callers never act on a book that has drifted.
+
+    Raw messages can be recorded to a file (one per line) and replayed through
+    the same handling code with replay(), without a connection.
+    """
+
+    def __init__(self, url: str = PriceFeed.DEFAULT_URL, depth: int = 100,
+                 record_file: Optional[str] = None, **kwargs):
+        """
+        Initialize order book feed.
+
+        Args:
+            url: WebSocket endpoint
+            depth: Levels per side (one of BOOK_DEPTHS)
+            record_file: Append every raw message to this file (None = off)
+            **kwargs: Further PriceFeed options (idle_timeout, reconnect_delay, max_reconnect_delay)
+        """
+        if depth not in BOOK_DEPTHS:
+            raise ValueError("Order book depth must be one of {}".format(BOOK_DEPTHS))
+        super().__init__(url=url, channels=("book",), record_file=record_file, **kwargs)
+        self.depth = depth
+        self.books: Dict[str, OrderBook] = {}
+        self.checksum_failures = 0
+        self.resyncs = 0
+
+    def get_book(self, pair: str) -> Optional[OrderBook]:
+        """
+        Get a pair's order book without blocking.
+
+        Args:
+            pair: Trading pair (e.g., "XBTUSD" or "XBT/USD")
+
+        Returns:
+            The book, or None unless it was built from a snapshot on the current
+            connection and has passed every checksum since
+        """
+        ws_pair = to_ws_pair(pair)
+        if ws_pair not in self._live:
+            return None
+        return self.books.get(ws_pair)
+
+    def replay(self, messages: Iterable[str]) -> int:
+        """
+        Feed recorded raw messages through the message handling.
+
+        Args:
+            messages: Raw WebSocket messages, e.g. the lines of a recorded file
+
+        Returns:
+            Number of messages replayed
+        """
+        count = 0
+        for raw in messages:
+            raw = raw.strip()
+            if raw:
+                self._handle_message(raw)
+                count += 1
+        return count
+
+    async def _send_subscribe(self, ws_pairs):
+        socket = self._socket
+        if socket is None:
+            return
+        await socket.send(json.dumps({
+            "event": "subscribe",
+            "pair": list(ws_pairs),
+            "subscription": {"name": "book", "depth": self.depth}
+        }))
+
+    async def _resubscribe(self, ws_pair: str):
+        socket = self._socket
+        if socket is None:
+            return
+        await socket.send(json.dumps({
+            "event": "unsubscribe",
+            "pair": [ws_pair],
+            "subscription": {"name": "book", "depth": self.depth}
+        }))
+        await self._send_subscribe([ws_pair])
+
+    def _resync(self, ws_pair: str):
+        """Mark a book stale and request a fresh snapshot."""
+        with self._lock:
+            self._live.discard(ws_pair)
+        self.resyncs += 1
+        loop = self._loop
+        if loop is not None and self._socket is not None:
+            loop.create_task(self._resubscribe(ws_pair))
+
+    def _handle_message(self, raw):
+        self._record_message(raw)
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            logger.debug("Ignoring non-JSON order book message: %s", raw)
+            return
+
+        if isinstance(message, dict):
+            if message.get("event") == "subscriptionStatus" and message.get("status") == "error":
+                logger.error("Order book subscription error for %s: %s", message.get("pair"),
+                             message.get("errorMessage"))
+            return
+
+        # Book messages: [channelID, payload(, payload), "book-<depth>", pair]; an
+        # update touching both sides carries the asks and bids as separate payloads
+        if not isinstance(message, list) or len(message) < 4 or not str(message[-2]).startswith("book"):
+            return
+        ws_pair = message[-1]
+        payloads = message[1:-2]
+        try:
+            if "as" in payloads[0] or "bs" in payloads[0]:
+                book = self.books.get(ws_pair)
+                if book is None:
+                    book = self.books[ws_pair] = OrderBook(ws_pair, self.depth)
+                book.apply_snapshot(payloads[0].get("as", ()), payloads[0].get("bs", ()))
+                with self._lock:
+                    self._live.add(ws_pair)
+                self._updated[ws_pair] = time.time()
+                return
+
+            if ws_pair not in self._live:
+                return  # stale until the next snapshot
+            book = self.books[ws_pair]
+            checksum = None
+            for payload in payloads:
+                book.apply_update(payload.get("a", ()), payload.get("b", ()))
+                checksum = payload.get("c", checksum)
+        except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+            logger.debug("Ignoring malformed book message: %s", message)
+            return
+
+        self._updated[ws_pair] = time.time()
+        if checksum is not None and book.checksum() != int(checksum):
+            self.checksum_failures += 1
+            logger.warning("Order book checksum mismatch for %s - resynchronizing", ws_pair)
+            self._resync(ws_pair)
+
+
+def main():
+    """Replay a recorded book feed file and print the resulting books."""
+    parser = argparse.ArgumentParser(description="Replay a recorded Kraken book feed")
+    parser.add_argument("file", help="raw WebSocket messages, one per line (ORDER_BOOK_RECORD_FILE)")
+    parser.add_argument("--depth", type=int, default=100, choices=BOOK_DEPTHS)
+    parser.add_argument("--levels", type=int, default=5, help="levels per side to print")
+    args = parser.parse_args()
+
+    feed = OrderBookFeed(depth=args.depth)
+    start = time.perf_counter()
+    with open(args.file) as f:
+        count = feed.replay(f)
+    elapsed = time.perf_counter() - start
+    print("messages={} seconds={:.3f} per_message_us={:.1f} checksum_failures={}".format(
+        count, elapsed, elapsed / count * 1e6 if count else 0.0, feed.checksum_failures))
+    for ws_pair, book in sorted(feed.books.items()):
+        print("{} bid={} ask={} spread={} imbalance={}".format(
+            ws_pair, book.best_bid(), book.best_ask(), book.spread(), book.imbalance()))
+        for (ask, ask_volume), (bid, bid_volume) in zip(book.levels("sell", args.levels),
+                                                        book.levels("buy", args.levels)):
+            print("  {:>16.8f} {:>16.8f} | {:>16.8f} {:>16.8f}".format(bid_volume, bid, ask, ask_volume))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Limit order pre-validation: quantize volume and price to a pair's precision before sending."""
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+from typing import NamedTuple
+from asset_registry import PairInfo
+
+
+class PreparedOrder(NamedTuple):
+    """A limit order with its volume and price already formatted the way Kraken accepts them."""
+    pair: str  # REST key
+    side: str
+    volume: str  # at most lot_decimals decimals
+    price: str  # at most pair_decimals decimals, a multiple of the tick size
+    requested_volume: float  # volume before quantizing
+    requested_price: float  # price before quantizing
+
+    def matches(self, side: str, volume: float, price: float) -> bool:
+        """True if this order was prepared from the same side, volume and price."""
+        return self.side == side and self.requested_volume == volume and self.requested_price == price
+
+
+def quantize(value: float, step: Decimal, rounding: str = ROUND_FLOOR) -> Decimal:
+    """
+    Round a value to a multiple of step.
+
+    Args:
+        value: Value to round
+        step: Increment, e.g. Decimal("0.00000001")
+        rounding: decimal rounding mode
+
+    Returns:
+        The rounded value, with as many decimals as step
+    """
+    return ((Decimal(repr(value)) / step).to_integral_value(rounding=rounding) * step).quantize(step)
+
+
+def prepare_limit_order(info: PairInfo, side: str, volume: float, price: float) -> PreparedOrder:
+    """
+    Quantize and check a limit order against the pair's trading rules.
+
+    The volume is rounded down to lot_decimals, so it never exceeds the
+    balance it was computed from. The price is rounded to pair_decimals and
+    the tick size away from the market (buys down, sells up), so quantizing
+    never makes an order pay more or sell for less than asked.
+
+    Args:
+        info: Pair metadata
+        side: "buy" or "sell"
+        volume: Volume in base currency
+        price: Limit price in quote currency
+
+    Returns:
+        Prepared order
+
+    Raises:
+        ValueError: If Kraken would reject the order (bad side or price, volume
+            below ordermin, value below costmin)
+    """
+    if side not in ("buy", "sell"):
+        raise ValueError("Order side must be 'buy' or 'sell', not {!r}".format(side))
+    step = Decimal(1).scaleb(-info.pair_decimals)
+    if info.tick_size > 0:
+        step = max(step, Decimal(repr(info.tick_size)))
+    quantized_price = quantize(price, step, ROUND_FLOOR if side == "buy" else ROUND_CEILING)
+    quantized_volume = quantize(volume, Decimal(1).scaleb(-info.lot_decimals))
+    if quantized_price <= 0:
+        raise ValueError("Limit price {} for {} rounds to {}".format(price, info.altname, quantized_price))
+    if quantized_volume <= 0 or quantized_volume < Decimal(repr(info.ordermin)):
+        raise ValueError("Volume {} {} is below the pair minimum of {}".format(
+            quantized_volume, info.altname, info.ordermin))
+    if info.costmin and quantized_volume * quantized_price < Decimal(repr(info.costmin)):
+        raise ValueError("Order value {} for {} is below the pair minimum of {}".format(
+            quantized_volume * quantized_price, info.altname, info.costmin))
+    # Fixed-point strings: str() would switch to exponent notation below 1e-6
+    return PreparedOrder(info.key, side, format(quantized_volume, "f"), format(quantized_price, "f"), volume, price)
@@ -0,0 +1,269 @@
+"""Paper trading: live or replayed public prices, simulated fills, no private API calls."""
+import argparse
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from kraken.spot import Market
+from account_state import AccountState
+from config import Config
+from kraken_client import KrakenClient
+from market_data import PriceFeed
+from mock_exchange import DEFAULT_FEE_RATE, MockError, MockExchange, MockOrder, OrderBook, connect_client
+
+logger = logging.getLogger(__name__)
+
+
+class PaperBook(OrderBook):
+    """
+    Resting paper orders of one pair, filled only by market prints.
+
+    Paper accounts trade against the real market, not against each other, so
+    incoming orders never match resting ones and the paper orders are not
+    quoted as the pair's bid and ask.
+    """
+
+    def best_bid(self) -> Optional[float]:
+        return None
+
+    def best_ask(self) -> Optional[float]:
+        return None
+
+    def match(self, order: MockOrder, limit: Optional[float]) -> List[tuple]:
+        return []
+
+
+class PaperExchange(MockExchange):
+    """
+    MockExchange whose prices come from Kraken's public market data.
+
+    Every Ticker request first refreshes the prices of the pairs asked for,
+    at most once per refresh_interval for all accounts together: from the
+    shared WebSocket price feed when it has a live price, otherwise with one
+    public Ticker call covering every pair in use. Each refreshed price is
+    printed as a market trade, so resting paper orders fill by MockExchange's
+    rules: a buy fills at its limit once the market trades below it, a sell
+    once it trades above it (touching the limit is not enough, since real
+    orders ahead in the queue would take that volume first). A limit order
+    placed through the market fills at once at the last price, as a taker.
+    Fees are charged at fee_rate on every fill. Accounts never trade with
+    each other (see PaperBook).
+
+    The pair and asset metadata is loaded once from the public API, so paper
+    orders are checked against the real ordermin and decimals. Without a
+    market or feed the exchange serves replayed prices set with
+    set_price_path() and stepped with advance().
+    """
+
+    def __init__(self, market: Optional[Market] = None, price_feed: Optional[PriceFeed] = None,
+                 refresh_interval: float = 1.0, fee_rate: float = DEFAULT_FEE_RATE, **kwargs):
+        """
+        Initialize paper exchange.
+
+        Args:
+            market: Public Kraken market client (None for replayed prices only)
+            price_feed: Shared streaming price feed, read before the REST ticker
+            refresh_interval: Seconds a refreshed price is reused by every account
+            fee_rate: Fee charged on every fill, in quote currency
+            **kwargs: Further MockExchange options (balances, asset_pairs, ...)
+        """
+        if market is not None and 'asset_pairs' not in kwargs:
+            kwargs['asset_pairs'] = market.get_asset_pairs()
+            kwargs['assets'] = market.get_assets()
+        super().__init__(fee_rate=fee_rate, **kwargs)
+        self.books = {key: PaperBook() for key in self.asset_pairs}
+        self.market = market
+        self.price_feed = price_feed
+        self.refresh_interval = refresh_interval
+        self.watched: Dict[str, str] = {}  # pair key -> wsname, every pair any account asked a price for
+        self._refreshed = 0.0
+        self._refresh_lock = threading.Lock()
+        if market is not None:
+            # Real prices only: no made-up starting prices for real pairs
+            self.last_prices = {}
+
+    def handle(self, endpoint: str, params: Optional[dict] = None, api_key: str = "") -> dict:
+        if endpoint == "Ticker" and (self.market is not None or self.price_feed is not None):
+            try:
+                self.refresh(_pairs(params))
+            except Exception as e:
+                logger.warning("Could not refresh paper prices: %s", e)
+        return super().handle(endpoint, params, api_key)
+
+    def refresh(self, pairs: Iterable[str] = (), force: bool = False) -> int:
+        """
+        Fetch current prices for the watched pairs (plus pairs) and trade them on the exchange.
+
+        Args:
+            pairs: Pairs to start watching
+            force: Refresh even if the last refresh is recent
+
+        Returns:
+            Number of prices printed
+        """
+        for pair in pairs:
+            try:
+                key = self.pair_key(pair)
+            except MockError:
+                continue
+            if key not in self.watched:
+                self.watched[key] = self.asset_pairs[key].get('wsname') or self.asset_pairs[key]['altname']
+                if self.price_feed is not None:
+                    self.price_feed.subscribe(self.watched[key])
+        with self._refresh_lock:
+            if not self.watched or (not force and time.monotonic() - self._refreshed < self.refresh_interval):
+                return 0
+            prices = {}
+            for key, wsname in self.watched.items():
+                price = self.price_feed.get_price(wsname) if self.price_feed is not None else None
+                if price is not None:
+                    prices[key] = price
+            missing = [key for key in self.watched if key not in prices]
+            if missing and self.market is not None:
+                for key, info in self.market.get_ticker(pair=missing).items():
+                    if key in self.watched:
+                        prices[key] = float(info["c"][0])
+            self._refreshed = time.monotonic()
+        for key, price in prices.items():
+            self.trade(key, price)
+        return len(prices)
+
+    def _ep_AddOrder(self, params: dict, api_key: str) -> dict:
+        result = super()._ep_AddOrder(params, api_key)
+        for txid in result.get("txid", []):
+            order = self.orders[txid]
+            last = self.last_prices.get(order.pair)
+            if order.status == "open" and last is not None and (
+                    order.price >= last if order.side == "buy" else order.price <= last):
+                self._execute(order, order.remaining, last)
+        return result
+
+    def equity(self, api_key: str, quote: str = "ZUSD") -> float:
+        """Value of an account's balances in the quote currency at the last prices."""
+        with self._lock:
+            total = 0.0
+            for asset, amount in self._account(api_key).items():
+                if asset == quote:
+                    total += amount
+                    continue
+                for key, info in self.asset_pairs.items():
+                    if info.get('base') == asset and info.get('quote') == quote and key in self.last_prices:
+                        total += amount * self.last_prices[key]
+                        break
+            return total
+
+
+def _pairs(params: Optional[dict]) -> List[str]:
+    pair = (params or {}).get('pair')
+    if not pair:
+        return []
+    return list(pair) if isinstance(pair, (list, tuple)) else str(pair).split(',')
+
+
+def create_paper_client(exchange: PaperExchange, name: str, balances: Optional[Dict[str, float]] = None) -> KrakenClient:
+    """
+    Create a KrakenClient that trades a virtual account on a paper exchange.
+
+    Args:
+        exchange: Shared paper exchange
+        name: Account name (used as the API key)
+        balances: Starting balances by asset key (the exchange default if None)
+
+    Returns:
+        Client whose every call is served in memory
+    """
+    if balances is not None:
+        exchange.add_account(name, balances)
+    return connect_client(KrakenClient(api_key=name, api_secret="paper"), exchange)
+
+
+def parse_balances(spec: str) -> Dict[str, float]:
+    """Parse "ZUSD:1000,XXRP:50" into a balances dict."""
+    balances = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        asset, _, amount = item.partition(':')
+        balances[asset.strip()] = float(amount)
+    return balances
+
+
+def main():
+    """Run several paper strategies side by side on one pair."""
+    from trading_bot import CryptoTradingBot
+    parser = argparse.ArgumentParser(description="Paper trade buy/sell strategies against live or replayed prices")
+    parser.add_argument("--pair", default=Config.TRADING_PAIR)
+    parser.add_argument("--strategy", action="append", default=[],
+                        help="BUY:SELL[:DOLLARS[:SELL_ALL]], repeat for more (default: BUY_PRICE/SELL_PRICE)")
+    parser.add_argument("--balances", default="ZUSD:1000", help="starting balances of every strategy")
+    parser.add_argument("--replay", help="price file to replay instead of live prices (backtester formats)")
+    parser.add_argument("--interval", type=float, default=Config.CHECK_INTERVAL, help="seconds between rounds")
+    parser.add_argument("--rounds", type=int, default=0, help="stop after this many rounds (0 = until Ctrl+C)")
+    parser.add_argument("--fee-rate", type=float, default=DEFAULT_FEE_RATE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger.setLevel(logging.INFO)
+
+    balances = parse_balances(args.balances)
+    if args.replay:
+        from backtester import load_prices
+        series = load_prices(args.replay)
+        path = []
+        for low, high, close in zip(series.lows.tolist(), series.highs.tolist(), series.closes.tolist()):
+            path.extend((low, high) if low < high else (close,))
+        exchange = PaperExchange(balances=balances, fee_rate=args.fee_rate)
+        exchange.set_price_path(args.pair, path)
+        exchange.advance(args.pair)
+    else:
+        feed = None
+        if Config.USE_PRICE_FEED:
+            feed = PriceFeed(url=Config.KRAKEN_WS_URL)
+            feed.start()
+        exchange = PaperExchange(market=Market(url=Config.KRAKEN_API_URL), price_feed=feed, balances=balances,
+                                 fee_rate=args.fee_rate)
+
+    strategies = args.strategy or ["{}:{}:{}:{}".format(Config.BUY_PRICE, Config.SELL_PRICE,
+                                                        Config.DOLLARS_BUY_AMOUNT, Config.SELL_ALL)]
+    bots = []
+    for i, spec in enumerate(strategies):
+        parts = spec.split(':')
+        name = "paper-{}".format(i + 1)
+        client = create_paper_client(exchange, name, balances)
+        pair_config = {
+            'pair': args.pair,
+            'buy_price': float(parts[0]),
+            'sell_price': float(parts[1]),
+            'dollars_buy_amount': float(parts[2]) if len(parts) > 2 else Config.DOLLARS_BUY_AMOUNT,
+            'sell_all': parts[3].lower() in ('true', '1', 'yes') if len(parts) > 3 else Config.SELL_ALL,
+        }
+        bot = CryptoTradingBot(client=client, pair_config=pair_config, account=AccountState(client, ttl=0))
+        bot.logger.extra['prefix'] = "{} {}".format(name, args.pair)
+        bots.append((name, spec, bot))
+    logger.info("Paper trading %s strategies on %s (%s prices)", len(bots), args.pair,
+                "replayed" if args.replay else "live")
+
+    start_equity = {name: exchange.equity(name) for name, _, _ in bots}
+    rounds = 0
+    try:
+        while not args.rounds or rounds < args.rounds:
+            rounds += 1
+            for _, _, bot in bots:
+                bot.run_iteration()
+            if args.replay:
+                if not exchange.advance(args.pair):
+                    break
+            else:
+                time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+    print("rounds={} price={}".format(rounds, exchange.last_prices.get(exchange.pair_key(args.pair))))
+    for name, spec, _ in bots:
+        fills = len(exchange.trades.get(name, []))
+        end = exchange.equity(name)
+        print("{} {:<28} fills={:<5} equity=${:.2f} pnl=${:.2f} balances={}".format(
+            name, spec, fills, end, end - start_equity[name],
+            {asset: round(amount, 8) for asset, amount in exchange.balances[name].items() if amount}))
+
+
+if __name__ == "__main__":
+    main()
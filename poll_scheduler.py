@@ -0,0 +1,143 @@
+"""Adaptive loop interval: poll often near the order levels, rarely far from them."""
+import logging
+import math
+import time
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+from rate_limiter import PRIORITY_INFO, RateLimitGovernor
+
+logger = logging.getLogger(__name__)
+
+# Price distance (as a fraction) treated as "far" before any volatility has been measured
+FAR_DISTANCE = 0.05
+
+
+class PollScheduler:
+    """
+    Chooses the sleep before the next trading iteration.
+
+    For each pair the expected time for the price to reach the nearest order
+    level is estimated from the distance to it and the pair's recent volatility
+    (a random walk needs about (distance / volatility)^2 seconds to travel that
+    far); the next wake-up is a fraction of the shortest such time. The result
+    is not shorter than what the private API budget can sustain (an iteration's
+    counter cost divided by the tier's decay rate, of which the loop may use
+    budget_share), and always between min_interval and max_interval.
+
+    Only the loop's own trade and account calls count as its cost;
+    informational reads (PRIORITY_INFO, e.g. a background history sync) are
+    left out, as they are not made more or less often by changing the interval.
+    """
+
+    def __init__(self, min_interval: float = 5, max_interval: float = 300,
+                 governor: Optional[RateLimitGovernor] = None, budget_share: float = 0.5,
+                 safety: float = 0.25, alpha: float = 0.2):
+        """
+        Initialize poll scheduler.
+
+        Args:
+            min_interval: Shortest sleep in seconds
+            max_interval: Longest sleep in seconds
+            governor: Rate limit governor whose spending and counter bound the interval
+            budget_share: Share of the tier's counter decay the polling loop may use
+            safety: Fraction of the expected time-to-level to sleep
+            alpha: Weight of the newest price move in the volatility average
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.governor = governor
+        self.budget_share = budget_share
+        self.safety = safety
+        self.alpha = alpha
+        self._last: Dict[str, Tuple[float, float]] = {}  # key -> (time, price)
+        self._variance: Dict[str, float] = {}  # key -> squared log return per second
+        self._spent = self._loop_spent()
+
+    def observe(self, key: str, price: Optional[float], now: Optional[float] = None):
+        """
+        Record a price so the pair's volatility stays current.
+
+        Args:
+            key: Pair name
+            price: Latest price (ignored if None)
+            now: Timestamp of the price (time.monotonic() if None)
+        """
+        if not price:
+            return
+        now = time.monotonic() if now is None else now
+        last = self._last.get(key)
+        self._last[key] = (now, price)
+        if last is None or now <= last[0]:
+            return
+        rate = math.log(price / last[1]) ** 2 / (now - last[0])
+        previous = self._variance.get(key)
+        self._variance[key] = rate if previous is None else previous + self.alpha * (rate - previous)
+
+    def volatility(self, key: str) -> float:
+        """Recent volatility of a pair in log-price per square-root second (0 if unknown)."""
+        return math.sqrt(self._variance.get(key, 0.0))
+
+    def time_to_level(self, key: str, price: Optional[float], levels: Sequence[float]) -> float:
+        """
+        Seconds the price of a pair can be left unchecked.
+
+        Args:
+            key: Pair name
+            price: Current price (max_interval if unknown)
+            levels: Prices of the pair's working orders (or the prices it would trade at)
+
+        Returns:
+            Suggested interval for this pair, before the min/max and budget bounds
+        """
+        levels = [level for level in levels if level > 0]
+        if not price or not levels:
+            return self.max_interval
+        distance = min(abs(math.log(level / price)) for level in levels)
+        sigma = self.volatility(key)
+        if sigma <= 0:
+            # No moves seen yet: scale linearly with the distance
+            return self.min_interval + (self.max_interval - self.min_interval) * min(1.0, distance / FAR_DISTANCE)
+        return self.safety * (distance / sigma) ** 2
+
+    def _loop_spent(self) -> float:
+        """Counter units the governor has spent on calls above PRIORITY_INFO."""
+        if self.governor is None:
+            return 0.0
+        return sum(cost for priority, cost in list(self.governor.spent_by_priority.items())
+                   if priority < PRIORITY_INFO)
+
+    def budget_floor(self) -> float:
+        """
+        Shortest interval the rate limit budget sustains.
+
+        Uses the loop's own counter cost since the previous call as the cost of
+        one iteration, and stretches the interval while the counter is more
+        than half full.
+        """
+        if self.governor is None:
+            return self.min_interval
+        spent = self._loop_spent()
+        cost, self._spent = spent - self._spent, spent
+        floor = cost / (self.governor.decay_rate * self.budget_share)
+        stats = self.governor.stats()
+        fill = stats['counter'] / stats['max_counter'] if stats['max_counter'] else 1.0
+        if fill > 0.5:
+            floor *= 2 * fill
+        return floor
+
+    def next_interval(self, watches: Iterable[Tuple[str, Optional[float], Sequence[float]]]) -> float:
+        """
+        Seconds to sleep before the next iteration.
+
+        Args:
+            watches: (pair, current price, order levels) for every pair traded
+
+        Returns:
+            Interval bounded by the API budget, then clamped to min_interval..max_interval
+        """
+        interval = self.max_interval
+        for key, price, levels in watches:
+            interval = min(interval, self.time_to_level(key, price, levels))
+        floor = self.budget_floor()
+        if floor > self.max_interval:
+            logger.warning("API budget needs %.1f seconds between iterations, capped at POLL_MAX_INTERVAL", floor)
+        return min(max(interval, self.min_interval, floor), self.max_interval)
@@ -0,0 +1,260 @@
+"""Fixed-capacity rolling price history with incrementally maintained indicators."""
+import logging
+import math
+from collections import deque
+from typing import Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# EMA weights below this no longer change a float64 average
+EMA_NEGLIGIBLE = 1e-18
+
+
+class PriceHistory:
+    """
+    Ring buffer of one pair's most recent timestamped prices, on NumPy arrays.
+
+    The arrays are allocated once at the given capacity and overwritten in
+    place, so memory never grows. Each append updates the indicators in O(1)
+    (amortized for min/max) without touching the rest of the window:
+
+    - EMA of every price seen, alpha = 2 / (ema_span + 1)
+    - mean and variance of the window (Welford update, replacing the oldest value)
+    - min and max of the window (monotonic queues of sequence numbers)
+    - VWAP of the window (running turnover and volume sums)
+
+    The live bot feeds it every price it fetches, after seeding it from Kraken's
+    OHLC endpoint; the backtester feeds it the same way from historical ticks,
+    so indicator values match between live trading and backtests.
+    """
+
+    def __init__(self, capacity: int = 720, ema_span: int = 20):
+        """
+        Initialize price history.
+
+        Args:
+            capacity: Prices kept in the rolling window
+            ema_span: EMA span in samples
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.alpha = 2.0 / (ema_span + 1)
+        self.timestamps = np.zeros(capacity)
+        self.prices = np.zeros(capacity)
+        self.volumes = np.zeros(capacity)
+        self.turnover = np.zeros(capacity)  # price * volume (candle VWAP * volume for OHLC rows)
+        self.count = 0  # prices appended in total; sequence number of the next one
+        self.ema: Optional[float] = None
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._turnover = 0.0
+        self._volume = 0.0
+        self._mins: deque = deque()  # sequence numbers in the window, prices increasing
+        self._maxs: deque = deque()  # sequence numbers in the window, prices decreasing
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def append(self, timestamp: float, price: float, volume: float = 0.0, turnover: Optional[float] = None):
+        """
+        Add one price and update every indicator.
+
+        Args:
+            timestamp: Unix time of the price
+            price: Price
+            volume: Traded volume behind the price (0 if unknown)
+            turnover: Quote value traded (price * volume if None)
+        """
+        price = float(price)
+        turnover = price * volume if turnover is None else float(turnover)
+        slot = self.count % self.capacity
+        n = len(self)
+        if n == self.capacity:
+            # Replace the oldest price in the window
+            old = self.prices[slot]
+            old_mean = self._mean
+            self._mean += (price - old) / n
+            self._m2 += (price - old) * (price - self._mean + old - old_mean)
+            self._turnover += turnover - self.turnover[slot]
+            self._volume += volume - self.volumes[slot]
+        else:
+            delta = price - self._mean
+            self._mean += delta / (n + 1)
+            self._m2 += delta * (price - self._mean)
+            self._turnover += turnover
+            self._volume += volume
+        self.timestamps[slot] = timestamp
+        self.prices[slot] = price
+        self.volumes[slot] = volume
+        self.turnover[slot] = turnover
+        self.ema = price if self.ema is None else self.ema + self.alpha * (price - self.ema)
+
+        seq = self.count
+        self.count += 1
+        first = self.count - len(self)
+        prices = self.prices
+        capacity = self.capacity
+        for queue, worse in ((self._mins, lambda p: p >= price), (self._maxs, lambda p: p <= price)):
+            while queue and queue[0] < first:
+                queue.popleft()
+            while queue and worse(prices[queue[-1] % capacity]):
+                queue.pop()
+            queue.append(seq)
+
+    def extend(self, timestamps, prices, volumes=None, turnover=None):
+        """
+        Add many prices, oldest first.
+
+        Batches shorter than the capacity are appended one by one. Longer ones
+        are applied in bulk: the EMA is advanced with the closed-form weighted
+        sum over the prices whose weight is still significant, and the window is
+        rebuilt from the batch's last capacity rows.
+
+        Args:
+            timestamps: Unix times
+            prices: Prices
+            volumes: Traded volumes (zeros if None)
+            turnover: Quote values traded (prices * volumes if None)
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        n = len(prices)
+        if n == 0:
+            return
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        volumes = np.zeros(n) if volumes is None else np.asarray(volumes, dtype=np.float64)
+        turnover = prices * volumes if turnover is None else np.asarray(turnover, dtype=np.float64)
+        if n < self.capacity:
+            for i in range(n):
+                self.append(timestamps[i], prices[i], volumes[i], turnover[i])
+            return
+
+        decay = 1.0 - self.alpha
+        start, rest = (prices[0], prices[1:]) if self.ema is None else (self.ema, prices)
+        m = len(rest)
+        keep = m if decay <= 0 else min(m, int(math.log(EMA_NEGLIGIBLE) / math.log(decay)) + 1)
+        weights = self.alpha * decay ** np.arange(keep - 1, -1, -1, dtype=np.float64)
+        self.ema = float(start * decay ** m + np.dot(weights, rest[m - keep:]))
+
+        cap = self.capacity
+        self.count += n
+        slots = np.arange(self.count - cap, self.count) % cap
+        self.timestamps[slots] = timestamps[-cap:]
+        self.prices[slots] = prices[-cap:]
+        self.volumes[slots] = volumes[-cap:]
+        self.turnover[slots] = turnover[-cap:]
+        window = prices[-cap:]
+        self._mean = float(window.mean())
+        self._m2 = float(((window - self._mean) ** 2).sum())
+        self._turnover = float(turnover[-cap:].sum())
+        self._volume = float(volumes[-cap:].sum())
+        self._mins.clear()
+        self._maxs.clear()
+        for offset, price in enumerate(window.tolist()):
+            seq = self.count - cap + offset
+            while self._mins and self.prices[self._mins[-1] % cap] >= price:
+                self._mins.pop()
+            self._mins.append(seq)
+            while self._maxs and self.prices[self._maxs[-1] % cap] <= price:
+                self._maxs.pop()
+            self._maxs.append(seq)
+
+    def seed_from_ohlc(self, client, pair: str, interval: int = 1) -> int:
+        """
+        Fill the history from Kraken's OHLC candles (closes, volumes and candle VWAPs).
+
+        Args:
+            client: KrakenClient (or anything with get_ohlc)
+            pair: Trading pair
+            interval: Candle length in minutes
+
+        Returns:
+            Number of candles loaded
+        """
+        rows = client.get_ohlc(pair, interval=interval)
+        if not rows:
+            return 0
+        data = np.asarray(rows, dtype=np.float64)
+        # Candle time is its start; the close is the price at its end
+        self.extend(data[:, 0] + interval * 60, data[:, 4], data[:, 6], data[:, 5] * data[:, 6])
+        logger.info("Seeded %s price history with %s %s-minute candles", pair, len(rows), interval)
+        return len(rows)
+
+    @property
+    def last(self) -> Optional[float]:
+        """Most recent price (None if empty)."""
+        return float(self.prices[(self.count - 1) % self.capacity]) if self.count else None
+
+    @property
+    def mean(self) -> float:
+        """Mean price of the window."""
+        return self._mean
+
+    @property
+    def variance(self) -> float:
+        """Population variance of the window's prices."""
+        n = len(self)
+        return max(self._m2, 0.0) / n if n else 0.0
+
+    @property
+    def std(self) -> float:
+        """Standard deviation of the window's prices."""
+        return math.sqrt(self.variance)
+
+    @property
+    def min(self) -> Optional[float]:
+        """Lowest price in the window."""
+        return float(self.prices[self._mins[0] % self.capacity]) if self._mins else None
+
+    @property
+    def max(self) -> Optional[float]:
+        """Highest price in the window."""
+        return float(self.prices[self._maxs[0] % self.capacity]) if self._maxs else None
+
+    @property
+    def vwap(self) -> Optional[float]:
+        """Volume weighted average price of the window (the mean when no volume was recorded)."""
+        if not self.count:
+            return None
+        return self._turnover / self._volume if self._volume > 0 else self._mean
+
+    def band(self, k: float) -> Tuple[float, float]:
+        """
+        EMA minus and plus k standard deviations, e.g. as dynamic buy/sell levels.
+
+        Args:
+            k: Width in standard deviations
+
+        Returns:
+            (lower, upper)
+        """
+        ema = self.ema if self.ema is not None else 0.0
+        return ema - k * self.std, ema + k * self.std
+
+    def window(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Timestamps and prices of the window, oldest first (copies).
+
+        Returns:
+            (timestamps, prices)
+        """
+        n = len(self)
+        if self.count <= self.capacity:
+            return self.timestamps[:n].copy(), self.prices[:n].copy()
+        slot = self.count % self.capacity
+        return (np.concatenate((self.timestamps[slot:], self.timestamps[:slot])),
+                np.concatenate((self.prices[slot:], self.prices[:slot])))
+
+    def summary(self) -> dict:
+        """Current indicator values."""
+        return {
+            'samples': len(self),
+            'last': self.last,
+            'ema': self.ema,
+            'mean': self.mean,
+            'std': self.std,
+            'min': self.min,
+            'max': self.max,
+            'vwap': self.vwap,
+        }
@@ -0,0 +1,354 @@
+"""On-demand profiling of a running bot: stack sampling, cProfile, tracemalloc and phase timings.
+
+Captures are triggered without restarting the bot (which would cancel its
+orders) and only ever write files:
+
+- SIGUSR1: sample every thread's stack for PROFILE_SECONDS
+- SIGUSR2: tracemalloc snapshot (diffed against the previous one) and phase timings
+- PROFILE_SOCKET: a local Unix socket taking the commands below, one per line
+
+Commands:
+    sample [SECONDS]    collapsed stacks of all threads (flamegraph.pl / speedscope input)
+    profile [SECONDS]   cProfile of the trading loop (and the engine's executor calls), from its next iteration
+    memory             tracemalloc snapshot; the first one starts tracing
+    memory stop        stop tracemalloc tracing
+    phases             per-phase loop timings from the metrics registry
+
+Usage:
+    kill -USR1 $(cat bot.pid)
+    python3 profiling.py bot_profile.sock profile 120
+"""
+import argparse
+import cProfile
+import io
+import linecache
+import logging
+import os
+import pstats
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import List, Optional
+from metrics import NULL_METRICS, Metrics
+
+logger = logging.getLogger(__name__)
+
+# Frames kept per tracemalloc traceback (more frames, more overhead while tracing)
+TRACEMALLOC_FRAMES = 10
+
+
+class Profiler:
+    """
+    Runtime profiling controls for one bot process.
+
+    Every capture runs on a background thread except cProfile, which only
+    sees the thread that enables it: a profile request is picked up by the
+    trading loop at its next checkpoint() and stopped at the first checkpoint
+    after the requested duration. Work the loop hands to other threads (the
+    engine's executor calls) is profiled by running it through call(), and
+    merged into the same capture.
+    """
+
+    def __init__(self, directory: str, metrics: Metrics = NULL_METRICS, seconds: float = 30.0,
+                 sample_interval: float = 0.005, top: int = 30, socket_path: Optional[str] = None):
+        """
+        Initialize profiler.
+
+        Args:
+            directory: Where capture files are written
+            metrics: Registry whose histograms the phase dump reports
+            seconds: Default capture length
+            sample_interval: Seconds between stack samples
+            top: Lines kept in the text summaries
+            socket_path: Unix socket to accept commands on (None for signals only)
+        """
+        self.directory = directory
+        self.metrics = metrics
+        self.seconds = seconds
+        self.sample_interval = sample_interval
+        self.top = top
+        self.socket_path = socket_path
+        self._lock = threading.Lock()  # one sampling run at a time
+        self._profile: Optional[cProfile.Profile] = None
+        self._profile_until = 0.0
+        self._profile_requested: Optional[float] = None
+        self._thread_profiles: List[cProfile.Profile] = []  # finished call() profiles of the capture
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._server: Optional[socketserver.UnixStreamServer] = None
+
+    def start(self):
+        """Install the signal handlers (main thread only) and start the command socket."""
+        os.makedirs(self.directory, exist_ok=True)
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, self._on_sample_signal)
+            signal.signal(signal.SIGUSR2, self._on_memory_signal)
+        if self.socket_path:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self._server = socketserver.UnixStreamServer(self.socket_path, _CommandHandler)
+            self._server.profiler = self
+            threading.Thread(target=self._server.serve_forever, name="profiler-socket", daemon=True).start()
+        logger.info("Profiling hooks ready (pid %s, output %s%s)", os.getpid(), self.directory,
+                    ", socket {}".format(self.socket_path) if self.socket_path else "")
+
+    def stop(self):
+        """Close the command socket and write any cProfile capture in progress."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+        if self._profile is not None:
+            self._finish_profile()
+
+    def command(self, line: str) -> str:
+        """
+        Run one command.
+
+        Args:
+            line: e.g. "sample 10", "profile", "memory", "memory stop", "phases"
+
+        Returns:
+            What was written (or will be), for the caller to show
+        """
+        words = line.split()
+        name = words[0].lower() if words else ""
+        if name == "sample":
+            return self.sample(float(words[1]) if len(words) > 1 else self.seconds)
+        if name == "profile":
+            return self.request_profile(float(words[1]) if len(words) > 1 else self.seconds)
+        if name == "memory":
+            if len(words) > 1 and words[1].lower() == "stop":
+                tracemalloc.stop()
+                self._snapshot = None
+                return "tracemalloc stopped"
+            return self.memory_snapshot()
+        if name == "phases":
+            return self.dump_phases()
+        return "unknown command {!r} (sample, profile, memory, memory stop, phases)".format(line.strip())
+
+    # --- stack sampling --------------------------------------------------
+
+    def sample(self, seconds: float) -> str:
+        """
+        Sample every thread's stack for a while and write collapsed stacks.
+
+        Args:
+            seconds: Sampling duration
+
+        Returns:
+            Path of the collapsed-stacks file
+        """
+        if not self._lock.acquire(blocking=False):
+            return "a sampling run is already in progress"
+        try:
+            stacks = Counter()
+            me = threading.get_ident()
+            names = {}
+            deadline = time.monotonic() + seconds
+            samples = 0
+            while time.monotonic() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    if ident not in names:
+                        names = {thread.ident: thread.name for thread in threading.enumerate()}
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append("{} ({}:{})".format(code.co_name, os.path.basename(code.co_filename),
+                                                         code.co_firstlineno))
+                        frame = frame.f_back
+                    stack.append(names.get(ident, str(ident)))
+                    stacks[";".join(reversed(stack))] += 1
+                samples += 1
+                time.sleep(self.sample_interval)
+            path = self._path("samples", "txt")
+            with open(path, 'w') as f:
+                for stack, count in stacks.most_common():
+                    f.write("{} {}\n".format(stack, count))
+        finally:
+            self._lock.release()
+        logger.info("Wrote %s stack samples over %ss to %s", samples, seconds, path)
+        return path
+
+    # --- cProfile ----------------------------------------------------------
+
+    def request_profile(self, seconds: float) -> str:
+        """Ask the trading loop to run under cProfile for at least `seconds`."""
+        if self._profile is not None or self._profile_requested is not None:
+            return "a cProfile capture is already in progress"
+        self._profile_requested = seconds
+        return "cProfile capture of {}s starts at the next iteration; written to {}".format(seconds, self.directory)
+
+    def checkpoint(self):
+        """Start or finish a requested cProfile capture; called by the trading loop between iterations."""
+        if self._profile is not None and time.monotonic() >= self._profile_until:
+            self._finish_profile()
+        if self._profile_requested is not None and self._profile is None:
+            self._profile_until = time.monotonic() + self._profile_requested
+            self._profile_requested = None
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+            logger.info("cProfile capture started")
+
+    def call(self, func, *args):
+        """
+        Run func(*args), under cProfile while a capture is in progress.
+
+        For work the trading loop runs on other threads (cProfile only sees
+        the thread that enabled it); each call gets its own profile, merged
+        into the capture when it ends. Calls still running then are left out.
+        """
+        if self._profile is None:
+            return func(*args)
+        profiles = self._thread_profiles
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ profiles every thread from the loop's profile already
+            return func(*args)
+        try:
+            return func(*args)
+        finally:
+            profile.disable()
+            profiles.append(profile)
+
+    def _finish_profile(self):
+        profile, self._profile = self._profile, None
+        profiles, self._thread_profiles = self._thread_profiles, []
+        profile.disable()
+        path = self._path("profile", "prof")
+        text = io.StringIO()
+        stats = pstats.Stats(profile, stream=text)
+        if profiles:
+            stats.add(*profiles)
+        stats.dump_stats(path)
+        stats.sort_stats("cumulative").print_stats(self.top)
+        with open(path[:-len("prof")] + "txt", 'w') as f:
+            f.write(text.getvalue())
+        logger.info("Wrote cProfile capture to %s (%s worker thread call(s) merged)", path, len(profiles))
+
+    # --- tracemalloc -------------------------------------------------------
+
+    def memory_snapshot(self) -> str:
+        """
+        Write the top allocations, and their growth since the previous snapshot.
+
+        The first call starts tracemalloc, so allocations made before it are not
+        attributed; take a second snapshot later to see what grew in between.
+
+        Returns:
+            Path of the report (or a note that tracing just started)
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._snapshot = tracemalloc.take_snapshot()
+            logger.info("tracemalloc started; the next memory snapshot reports growth from now")
+            return "tracemalloc started; request another snapshot to see growth"
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, linecache.__file__),
+            tracemalloc.Filter(False, pstats.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        lines = ["traced: {:.1f} KiB, peak {:.1f} KiB".format(current / 1024, peak / 1024), "",
+                 "Top allocations by line:"]
+        lines.extend(str(stat) for stat in snapshot.statistics('lineno')[:self.top])
+        if self._snapshot is not None:
+            lines.extend(["", "Growth since the previous snapshot:"])
+            lines.extend(str(stat) for stat in snapshot.compare_to(self._snapshot, 'lineno')[:self.top])
+            lines.extend(["", "Largest growth, full traceback:"])
+            for stat in snapshot.compare_to(self._snapshot, 'traceback')[:3]:
+                lines.append(str(stat))
+                lines.extend("    " + line for line in stat.traceback.format())
+        self._snapshot = snapshot
+        path = self._path("memory", "txt")
+        with open(path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        logger.info("Wrote tracemalloc snapshot to %s (%.1f KiB traced)", path, current / 1024)
+        return path
+
+    # --- phase timings -----------------------------------------------------
+
+    def dump_phases(self) -> str:
+        """Write every timing histogram (iterations, loop phases, API calls) as a table."""
+        rows = self.metrics.histogram_summary()
+        lines = ["{:<28} {:<36} {:>8} {:>10} {:>10} {:>8} {:>8} {:>8}".format(
+            "metric", "labels", "count", "total s", "mean ms", "p50<=", "p95<=", "p99<=")]
+        for name, labels, count, total, (p50, p95, p99) in rows:
+            lines.append("{:<28} {:<36} {:>8} {:>10.3f} {:>10.2f} {:>8} {:>8} {:>8}".format(
+                name, ",".join("{}={}".format(k, v) for k, v in sorted(labels.items())), count, total,
+                1000 * total / count if count else 0.0, p50, p95, p99))
+        if not rows:
+            lines.append("(no timings recorded; metrics are disabled for this client)")
+        path = self._path("phases", "txt")
+        with open(path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        logger.info("Wrote phase timings to %s", path)
+        return path
+
+    # --- triggers ----------------------------------------------------------
+
+    def _on_sample_signal(self, signum, frame):
+        self._in_background(self.sample, self.seconds)
+
+    def _on_memory_signal(self, signum, frame):
+        self._in_background(self._memory_and_phases)
+
+    def _memory_and_phases(self):
+        self.memory_snapshot()
+        self.dump_phases()
+
+    @staticmethod
+    def _in_background(func, *args):
+        # Signal handlers interrupt the trading loop; do the work elsewhere
+        def run():
+            try:
+                func(*args)
+            except Exception as e:
+                logger.warning("Profiling capture failed: %s", e)
+        threading.Thread(target=run, name="profiler", daemon=True).start()
+
+    def _path(self, kind: str, extension: str) -> str:
+        return os.path.join(self.directory, "{}-{}-{}.{}".format(
+            kind, time.strftime("%Y%m%d-%H%M%S"), os.getpid(), extension))
+
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for raw in self.rfile:
+            line = raw.decode(errors='replace').strip()
+            if not line:
+                continue
+            try:
+                reply = self.server.profiler.command(line)
+            except Exception as e:
+                reply = "error: {}".format(e)
+            self.wfile.write((reply + "\n").encode())
+
+
+def main():
+    """Send one command to a running bot's profiling socket and print the reply."""
+    parser = argparse.ArgumentParser(description="Trigger a profiling capture in a running bot")
+    parser.add_argument("socket", help="the bot's PROFILE_SOCKET path")
+    parser.add_argument("command", nargs="+", help="sample|profile [SECONDS], memory [stop], phases")
+    args = parser.parse_args()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(args.socket)
+        sock.sendall((" ".join(args.command) + "\n").encode())
+        sock.shutdown(socket.SHUT_WR)
+        print(sock.makefile().read().strip())
+
+
+if __name__ == "__main__":
+    main()
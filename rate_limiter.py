@@ -0,0 +1,173 @@
+"""Client-side model of Kraken's private API rate limit counter."""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# Queue priorities (lower runs first)
+PRIORITY_TRADE = 0  # AddOrder / CancelOrder
+PRIORITY_ACCOUNT = 1  # Balance / OpenOrders / QueryOrders
+PRIORITY_INFO = 2  # history and other informational reads
+
+# Counter cost per private endpoint. Ledger and trade history queries cost 2,
+# everything else 1. Order placement and cancellation are limited by the
+# separate per-pair matching engine limiter, not by this counter.
+ENDPOINT_COSTS: Dict[str, int] = {
+    "Ledgers": 2,
+    "QueryLedgers": 2,
+    "TradesHistory": 2,
+    "QueryTrades": 2,
+    "AddOrder": 0,
+    "AddOrderBatch": 0,
+    "CancelOrder": 0,
+    "CancelOrderBatch": 0,
+    "CancelAll": 0,
+    "CancelAllOrdersAfter": 0,
+}
+
+# Verification tier -> (maximum counter, decay per second)
+TIERS: Dict[str, tuple] = {
+    "starter": (15, 0.33),
+    "intermediate": (20, 0.5),
+    "pro": (20, 1.0),
+}
+
+
+def endpoint_cost(endpoint: str) -> int:
+    """Get the counter cost of a private endpoint (1 unless listed in ENDPOINT_COSTS)."""
+    return ENDPOINT_COSTS.get(endpoint, 1)
+
+
+class RateLimitGovernor:
+    """
+    Shared gate for private API calls that mirrors Kraken's decaying counter.
+
+    Each call adds its cost to the counter, which decays at the tier's rate.
+    A call that would push the counter over the tier maximum waits until enough
+    has decayed. Waiting callers are served by priority, then arrival order, so
+    order placement and cancels overtake queued informational reads.
+    """
+
+    def __init__(self, tier: str = "starter", headroom: float = 0):
+        """
+        Initialize rate limit governor.
+
+        Args:
+            tier: Kraken verification tier ("starter", "intermediate" or "pro")
+            headroom: Counter units to keep unused below the tier maximum
+        """
+        tier = tier.lower()
+        if tier not in TIERS:
+            raise ValueError("Unknown Kraken tier '{}': expected one of {}".format(tier, ", ".join(TIERS)))
+        max_counter, self.decay_rate = TIERS[tier]
+        self.tier = tier
+        self.max_counter = max_counter - headroom
+
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self._counter = 0.0
+        self._updated = time.monotonic()
+
+        self.calls = 0
+        self.spent = 0.0  # counter units consumed in total
+        self.spent_by_priority: Dict[int, float] = {}  # priority -> counter units consumed
+        self.waited_calls = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.rate_limit_errors = 0
+
+    def _decay(self, now: float):
+        self._counter = max(0.0, self._counter - (now - self._updated) * self.decay_rate)
+        self._updated = now
+
+    def acquire(self, cost: float = 1, priority: int = PRIORITY_ACCOUNT) -> float:
+        """
+        Block until a call of the given cost fits under the limit, then count it.
+
+        Args:
+            cost: Counter units the call consumes
+            priority: Queue priority (PRIORITY_TRADE first, PRIORITY_INFO last)
+
+        Returns:
+            Seconds spent waiting
+        """
+        start = time.monotonic()
+        entry = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._queue, entry)
+            while True:
+                now = time.monotonic()
+                self._decay(now)
+                excess = self._counter + cost - self.max_counter
+                if self._queue[0] == entry and excess <= 0:
+                    break
+                timeout = excess / self.decay_rate if self._queue[0] == entry else None
+                self._cond.wait(timeout)
+            heapq.heappop(self._queue)
+            self._counter += cost
+
+            waited = time.monotonic() - start
+            self.calls += 1
+            self.spent += cost
+            self.spent_by_priority[priority] = self.spent_by_priority.get(priority, 0.0) + cost
+            if waited > 0.001:
+                self.waited_calls += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+            self._cond.notify_all()
+        return waited
+
+    @contextmanager
+    def limit(self, endpoint: str, priority: int = PRIORITY_ACCOUNT):
+        """
+        Context manager that acquires the endpoint's cost and records rate limit errors.
+
+        Args:
+            endpoint: Kraken private endpoint name (e.g. "Balance", "AddOrder")
+            priority: Queue priority
+        """
+        waited = self.acquire(endpoint_cost(endpoint), priority)
+        if waited > 0.001:
+            logger.debug("Rate limit governor delayed %s by %.2f seconds", endpoint, waited)
+        try:
+            yield
+        except Exception as e:
+            if "Rate limit exceeded" in str(e):
+                self.penalize()
+            raise
+
+    def penalize(self):
+        """Assume the exchange counter is full after Kraken reported a rate limit error."""
+        with self._cond:
+            self.rate_limit_errors += 1
+            self._decay(time.monotonic())
+            self._counter = max(self._counter, self.max_counter)
+        logger.warning("Kraken rate limit exceeded - backing off private API calls")
+
+    def stats(self) -> dict:
+        """
+        Get current governor statistics.
+
+        Returns:
+            Dictionary with counter, queue depth and wait time stats
+        """
+        with self._cond:
+            self._decay(time.monotonic())
+            return {
+                'tier': self.tier,
+                'counter': round(self._counter, 3),
+                'max_counter': self.max_counter,
+                'queue_depth': len(self._queue),
+                'calls': self.calls,
+                'waited_calls': self.waited_calls,
+                'total_wait': round(self.total_wait, 3),
+                'avg_wait': round(self.total_wait / self.waited_calls, 3) if self.waited_calls else 0.0,
+                'max_wait': round(self.max_wait, 3),
+                'rate_limit_errors': self.rate_limit_errors,
+            }
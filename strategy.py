@@ -0,0 +1,125 @@
+"""Pure buy/sell decision logic shared by the live bot and the backtester."""
+from typing import List, NamedTuple, Optional
+
+# Actions returned by step()
+WAIT_SELL = "wait_sell"  # a sell order is open - wait for it to fill
+WAIT_BUY = "wait_buy"  # a buy order is open - wait for it to fill
+SELL = "sell"  # no orders, crypto held - place a sell order
+SELL_TOO_SMALL = "sell_too_small"  # no orders, crypto held but below the minimum trade size
+BUY = "buy"  # no orders, no crypto, enough USD - place a buy order
+WAIT_FUNDS = "wait_funds"  # no orders, no crypto, not enough USD
+
+
+class StrategyParams(NamedTuple):
+    """Per-pair trading settings."""
+    buy_price: float
+    sell_price: float
+    dollars_buy_amount: float
+    sell_all: bool
+    min_trade_size: float
+
+
+class Decision(NamedTuple):
+    """What the state machine wants to do this iteration."""
+    action: str
+    sell_amount: float = 0.0  # crypto to sell (SELL/SELL_TOO_SMALL), or to sell once the buy fills (WAIT_BUY)
+    sell_total: float = 0.0  # USD value of sell_amount at the sell price
+    buy_amount: float = 0.0  # crypto the next buy order will be for
+    buy_if_no_sell: bool = False  # place a buy if no sell order ends up placed (SELL/SELL_TOO_SMALL)
+
+
+def buy_volume(params: StrategyParams) -> float:
+    """Crypto volume of a buy order for DOLLARS_BUY_AMOUNT at the buy price."""
+    return params.dollars_buy_amount / params.buy_price
+
+
+def sell_volume(params: StrategyParams, crypto_amount: float) -> float:
+    """Crypto volume of a sell order, honoring SELL_ALL."""
+    if params.sell_all:
+        # Sell all of trading pair crypto
+        return crypto_amount
+    # Sell DOLLARS_BUY_AMOUNT worth
+    return params.dollars_buy_amount / params.sell_price
+
+
+def step(params: StrategyParams, sell_order_volume: Optional[float], buy_order_volume: Optional[float],
+         crypto_amount: float, usd_balance: float) -> Decision:
+    """
+    Decide the next action of the buy/sell state machine.
+
+    1. A sell order is open: wait for it to fill.
+    2. A buy order is open: wait for it to fill.
+    3. Crypto is held: sell it at the sell price (or, below the minimum trade
+       size, fall through to buying if there is enough USD).
+    4. Enough USD: buy at the buy price.
+    5. Otherwise wait for funds.
+
+    Args:
+        params: Trading settings
+        sell_order_volume: Volume of the open sell order, None if there is none
+        buy_order_volume: Volume of the open buy order, None if there is none
+        crypto_amount: Crypto balance of the base asset
+        usd_balance: USD balance
+
+    Returns:
+        Decision for this iteration
+    """
+    if sell_order_volume is not None:
+        return Decision(WAIT_SELL, buy_amount=buy_volume(params))
+
+    if buy_order_volume is not None:
+        # Sell what the buy order will bring in (SELL_ALL) or DOLLARS_BUY_AMOUNT worth
+        sell_amount = sell_volume(params, buy_order_volume)
+        sell_total = sell_amount * params.sell_price if params.sell_all else params.dollars_buy_amount
+        return Decision(WAIT_BUY, sell_amount=sell_amount, sell_total=sell_total)
+
+    can_buy = usd_balance >= params.dollars_buy_amount
+    if crypto_amount > 0:
+        sell_amount = sell_volume(params, crypto_amount)
+        sell_total = sell_amount * params.sell_price if params.sell_all else params.dollars_buy_amount
+        action = SELL if sell_amount >= params.min_trade_size else SELL_TOO_SMALL
+        return Decision(action, sell_amount=sell_amount, sell_total=sell_total,
+                        buy_amount=buy_volume(params), buy_if_no_sell=can_buy)
+
+    if can_buy:
+        return Decision(BUY, buy_amount=buy_volume(params))
+
+    return Decision(WAIT_FUNDS)
+
+
+class GridLevel(NamedTuple):
+    """One rung of a grid: buy at buy_price, sell what it bought at sell_price, repeat."""
+    buy_price: float
+    sell_price: float
+    side: str  # side of the level's first order
+
+
+def grid_levels(params: StrategyParams, levels: int, spacing: float, price_decimals: int = 8) -> List[GridLevel]:
+    """
+    Lay out a buy/sell grid around BUY_PRICE and SELL_PRICE.
+
+    The buy ladder steps down from BUY_PRICE and the sell ladder steps up from
+    SELL_PRICE, levels rungs each, spacing apart. Every rung keeps the
+    SELL_PRICE/BUY_PRICE ratio between its buy and sell price, so a level that
+    fills on one side is re-armed on the other at the same margin.
+
+    Args:
+        params: Trading settings
+        levels: Rungs on each side
+        spacing: Distance between rungs as a fraction of the price (0.01 = 1%)
+        price_decimals: Price precision of the pair
+
+    Returns:
+        Buy-ladder levels (nearest first), then sell-ladder levels (nearest first)
+    """
+    if levels * spacing >= 1:
+        raise ValueError("Grid of {} levels {:.2%} apart reaches a price of zero".format(levels, spacing))
+    ratio = params.sell_price / params.buy_price
+    grid = []
+    for k in range(levels):
+        low = params.buy_price * (1 - k * spacing)
+        grid.append(GridLevel(round(low, price_decimals), round(low * ratio, price_decimals), "buy"))
+    for k in range(levels):
+        high = params.sell_price * (1 + k * spacing)
+        grid.append(GridLevel(round(high / ratio, price_decimals), round(high, price_decimals), "sell"))
+    return grid
@@ -0,0 +1,306 @@
+"""Run one bot process per Kraken account, restart crashed ones, and share one market data feed.
+
+Each account is a settings file in the ~/.krakenapi / .env format: KEY=VALUE
+lines holding at least KRAKEN_API_KEY and KRAKEN_API_SECRET, plus any other
+Config setting that differs from the defaults (TRADING_PAIRS, BUY_PRICE, ...).
+The account name is the file name without its extension.
+
+Workers are forked from a single preloaded server process, so the SDK, NumPy
+and the parsed configuration are loaded once and their memory is shared
+copy-on-write. Prices come from one MarketDataHub in the supervisor, published
+in shared memory, so public ticker traffic no longer grows with the number
+of accounts.
+
+Usage:
+    python3 supervisor.py accounts/alice.env accounts/bob.env --log-file supervisor.log
+"""
+import argparse
+import atexit
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from typing import Dict, List, Optional
+from kraken.spot import Market
+from asset_registry import AssetRegistry
+from config import Config
+from logging_setup import setup_logging
+from market_data import PriceFeed
+from market_hub import MarketDataHub, SharedPriceTable
+
+logger = logging.getLogger(__name__)
+
+# Imported once in the fork server and shared by every worker; none of them
+# start threads or open files at import (trading_bot does, so it is left out)
+PRELOAD_MODULES = ["config", "kraken_client", "account_state", "fill_tracker", "journal", "market_hub",
+                   "numpy", "requests", "websockets"]
+
+# Per-account copies of these paths are used unless an account file sets them
+ACCOUNT_FILE_SETTINGS = ("LOG_FILE", "LOG_JSON_FILE", "JOURNAL_FILE", "HISTORY_DB", "METRICS_FILE",
+                         "ORDER_BOOK_RECORD_FILE")
+
+
+def load_account(path: str) -> Dict[str, str]:
+    """
+    Read an account settings file.
+
+    Args:
+        path: File of KEY=VALUE lines ('#' starts a comment)
+
+    Returns:
+        Settings by Config attribute name
+
+    Raises:
+        ValueError: If a setting is not a Config attribute or the API credentials are missing
+    """
+    settings = {}
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line and '=' in line and not line.startswith('#'):
+                key, value = line.split('=', 1)
+                key = key.strip()
+                if not hasattr(Config, key):
+                    raise ValueError("Unknown setting {} in {}".format(key, path))
+                settings[key] = value.strip()
+    if not settings.get("KRAKEN_API_KEY") or not settings.get("KRAKEN_API_SECRET"):
+        raise ValueError("{} must set KRAKEN_API_KEY and KRAKEN_API_SECRET".format(path))
+    return settings
+
+
+def account_settings(name: str, settings: Dict[str, str], index: int) -> Dict[str, str]:
+    """
+    Complete an account's settings with its own log, journal, history and metrics locations.
+
+    Args:
+        name: Account name
+        settings: Settings from the account file
+        index: Position of the account (offsets METRICS_PORT)
+
+    Returns:
+        Settings to apply in the worker
+    """
+    settings = dict(settings)
+    for key in ACCOUNT_FILE_SETTINGS:
+        path = getattr(Config, key)
+        if key not in settings and path:
+            head, tail = os.path.split(path)
+            settings[key] = os.path.join(head, "{}_{}".format(name, tail))
+    if "METRICS_PORT" not in settings and Config.METRICS_PORT:
+        settings["METRICS_PORT"] = str(Config.METRICS_PORT + index)
+    return settings
+
+
+def account_pairs(settings: Dict[str, str]) -> List[str]:
+    """Pairs an account trades, from its TRADING_PAIRS or TRADING_PAIR setting."""
+    pairs = settings.get("TRADING_PAIRS", Config.TRADING_PAIRS)
+    if not pairs.strip():
+        return [settings.get("TRADING_PAIR", Config.TRADING_PAIR).upper()]
+    return [entry.split(':')[0].strip().upper() for entry in pairs.split(',') if entry.strip()]
+
+
+def apply_settings(settings: Dict[str, str]):
+    """Set Config attributes from strings, converted to each attribute's type."""
+    for key, value in settings.items():
+        current = getattr(Config, key)
+        if isinstance(current, bool):
+            value = value.lower() in ('true', '1', 'yes', 'on')
+        elif isinstance(current, (int, float)):
+            value = type(current)(value)
+        setattr(Config, key, value)
+        if key in ("DOLLARS_BUY_AMOUNT", "DOLLARS_BEING_TRADED"):
+            # DOLLARS_BEING_TRADED is a backward-compatible alias: keep both names equal
+            Config.DOLLARS_BUY_AMOUNT = Config.DOLLARS_BEING_TRADED = value
+
+
+def run_worker(name: str, settings: Dict[str, str], hub: str):
+    """
+    Worker process entry point: configure this account and run its bot (or engine with TRADING_PAIRS).
+
+    Args:
+        name: Account name
+        settings: Config overrides for the account
+        hub: Shared memory name of the market data hub's price table
+    """
+    # Own session: Ctrl+C in the supervisor's terminal reaches only the supervisor,
+    # which then stops each worker once
+    os.setsid()
+    apply_settings(settings)
+    Config.MARKET_DATA_HUB = hub
+    try:
+        if Config.TRADING_PAIRS.strip():
+            import engine
+            engine.main()
+        else:
+            import trading_bot
+            trading_bot.main()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # multiprocessing exits without atexit handlers; flush the log writer
+        atexit._run_exitfuncs()
+
+
+class Worker:
+    """One account's bot process and its restart bookkeeping."""
+
+    def __init__(self, name: str, settings: Dict[str, str]):
+        self.name = name
+        self.settings = settings
+        self.process: Optional[multiprocessing.Process] = None
+        self.started = 0.0
+        self.failures = 0  # consecutive quick exits
+        self.restart_at = 0.0
+
+
+class Supervisor:
+    """
+    Start a worker process per account, restart any that exit, and feed them all prices.
+
+    A worker that exits (crash, failed startup, or a bot giving up) is
+    restarted after an exponential backoff; a worker that had been running
+    for stable_after seconds starts again from the base delay.
+    """
+
+    def __init__(self, accounts: Dict[str, Dict[str, str]], hub_interval: float = 1.0, backoff: float = 5.0,
+                 max_backoff: float = 300.0, stable_after: float = 600.0):
+        """
+        Initialize supervisor.
+
+        Args:
+            accounts: Settings by account name (see load_account)
+            hub_interval: Seconds between market data hub refreshes
+            backoff: Restart delay after the first exit
+            max_backoff: Upper bound for the restart delay
+            stable_after: Seconds of uptime after which an exit counts as the first again
+        """
+        self.workers = [Worker(name, account_settings(name, settings, i))
+                        for i, (name, settings) in enumerate(accounts.items())]
+        self.hub_interval = hub_interval
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self.restarts = 0
+        self._context = multiprocessing.get_context("forkserver")
+        self._context.set_forkserver_preload(PRELOAD_MODULES)
+        self.table: Optional[SharedPriceTable] = None
+        self.hub: Optional[MarketDataHub] = None
+        self.price_feed: Optional[PriceFeed] = None
+
+    def start(self):
+        """Start the market data hub and every worker."""
+        market = Market(url=Config.KRAKEN_API_URL)
+        registry = AssetRegistry(market, cache_file=Config.ASSET_CACHE_FILE, ttl=Config.ASSET_CACHE_TTL)
+        # Refresh the shared metadata cache once here so the workers start from it
+        registry.load()
+        pairs = []
+        for worker in self.workers:
+            for pair in account_pairs(worker.settings):
+                # Slots are named like the clients ask for prices: by wsname (XDG/USD for DOGEUSD)
+                info = registry.get_pair(pair)
+                pairs.append(info.wsname or info.altname if info is not None else pair)
+        self.table = SharedPriceTable.create(pairs)
+        if Config.USE_PRICE_FEED:
+            self.price_feed = PriceFeed(url=Config.KRAKEN_WS_URL)
+            self.price_feed.start()
+        self.hub = MarketDataHub(self.table, market, price_feed=self.price_feed, registry=registry,
+                                 interval=self.hub_interval)
+        self.hub.start()
+        for worker in self.workers:
+            self._spawn(worker)
+
+    def _spawn(self, worker: Worker):
+        worker.process = self._context.Process(target=run_worker, name="bot-{}".format(worker.name),
+                                               args=(worker.name, worker.settings, self.table.name))
+        worker.process.start()
+        worker.started = time.monotonic()
+        logger.info("Started %s (pid %s)", worker.name, worker.process.pid)
+
+    def check(self):
+        """Schedule restarts for workers that exited and start those that are due."""
+        now = time.monotonic()
+        for worker in self.workers:
+            process = worker.process
+            if process is not None and process.exitcode is not None:
+                uptime = now - worker.started
+                worker.failures = 1 if uptime >= self.stable_after else worker.failures + 1
+                delay = min(self.backoff * 2 ** (worker.failures - 1), self.max_backoff)
+                worker.restart_at = now + delay
+                worker.process = None
+                logger.warning("%s exited with code %s after %.0fs; restarting in %.0fs",
+                               worker.name, process.exitcode, uptime, delay)
+            elif process is None and now >= worker.restart_at:
+                self.restarts += 1
+                self._spawn(worker)
+
+    def run(self, poll: float = 1.0):
+        """Supervise until interrupted (Ctrl+C or SIGTERM), then stop everything."""
+        signal.signal(signal.SIGTERM, _raise_interrupt)
+        self.start()
+        try:
+            while True:
+                self.check()
+                time.sleep(poll)
+        except KeyboardInterrupt:
+            logger.info("Supervisor stopping")
+        finally:
+            self.stop()
+
+    def stop(self, timeout: float = 60.0):
+        """
+        Stop every worker the way Ctrl+C stops a bot, then the hub.
+
+        Args:
+            timeout: Seconds to wait for workers to cancel their orders and exit
+                before they are killed
+        """
+        running = [worker for worker in self.workers if worker.process is not None and worker.process.is_alive()]
+        for worker in running:
+            os.kill(worker.process.pid, signal.SIGINT)
+        deadline = time.monotonic() + timeout
+        for worker in running:
+            worker.process.join(max(deadline - time.monotonic(), 0))
+            if worker.process.is_alive():
+                logger.warning("%s did not stop in time; terminating it", worker.name)
+                worker.process.terminate()
+                worker.process.join(5)
+            logger.info("Stopped %s (exit code %s)", worker.name, worker.process.exitcode)
+        if self.hub is not None:
+            self.hub.stop()
+        if self.price_feed is not None:
+            self.price_feed.stop()
+        if self.table is not None:
+            self.table.close()
+            self.table = None
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main():
+    """Supervise the accounts given on the command line."""
+    parser = argparse.ArgumentParser(description="Run one trading bot process per Kraken account with a shared market data hub")
+    parser.add_argument("accounts", nargs="+", help="account settings files (KEY=VALUE lines)")
+    parser.add_argument("--hub-interval", type=float, default=1.0, help="seconds between price refreshes")
+    parser.add_argument("--backoff", type=float, default=5.0, help="restart delay after a worker exits")
+    parser.add_argument("--max-backoff", type=float, default=300.0, help="longest restart delay")
+    parser.add_argument("--log-file", default="supervisor.log")
+    args = parser.parse_args()
+
+    setup_logging(level=Config.LOG_LEVEL, log_file=args.log_file, max_bytes=Config.LOG_MAX_BYTES,
+                  rotate_when=Config.LOG_ROTATE_WHEN, backup_count=Config.LOG_BACKUP_COUNT,
+                  compress=Config.LOG_COMPRESS, console=Config.LOG_CONSOLE)
+    accounts = {}
+    for path in args.accounts:
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name in accounts:
+            parser.error("two account files are named {}".format(name))
+        accounts[name] = load_account(path)
+    Supervisor(accounts, hub_interval=args.hub_interval, backoff=args.backoff,
+               max_backoff=args.max_backoff).run()
+
+
+if __name__ == "__main__":
+    main()
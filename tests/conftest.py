@@ -0,0 +1,18 @@
+"""Shared test setup: import the bot's top-level modules from the repository root."""
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+
+
+@pytest.fixture
+def offline_config(monkeypatch):
+    """Config without anything that would start threads, open files or reach Kraken."""
+    for key, value in (("ADAPTIVE_POLLING", True), ("CANCEL_AFTER_TIMEOUT", 0), ("HISTORY_DB", ""),
+                       ("PROFILE_DIR", ""), ("JOURNAL_FILE", ""), ("FILL_TRACKER", False),
+                       ("PRICE_HISTORY_SIZE", 0), ("CANCEL_ON_SHUTDOWN", False), ("KRAKEN_API_KEY", "test"),
+                       ("KRAKEN_API_SECRET", "test")):
+        monkeypatch.setattr(Config, key, value)
@@ -0,0 +1,77 @@
+"""AccountState with a fill tracker, against the in-process mock exchange."""
+import pytest
+from account_state import AccountState
+from fill_tracker import FillTracker
+from kraken_client import KrakenClient
+from mock_exchange import MockExchange, connect_client
+
+
+@pytest.fixture
+def client():
+    exchange = MockExchange(balances={"ZUSD": 1000.0})
+    return connect_client(KrakenClient(api_key="test", api_secret="test"), exchange)
+
+
+def test_failed_seed_is_retried(client):
+    # An order the journal does not know, e.g. left by an earlier run
+    existing = client.trade.create_order(ordertype="limit", side="buy", volume=20, pair="XRPUSD",
+                                         price=0.4)["txid"][0]
+    tracker = FillTracker(client, pairs=["XRPUSD"])
+    account = AccountState(client, ttl=0, tracker=tracker)
+
+    client.trade.exchange.inject_error("OpenOrders", "EService:Unavailable")
+    with pytest.raises(Exception):
+        account.get_open_orders()
+    assert not tracker.seeded
+
+    assert list(account.get_open_orders()) == [existing]
+    assert tracker.seeded
+
+
+def test_seeded_once(client):
+    account = AccountState(client, ttl=0, tracker=FillTracker(client, pairs=["XRPUSD"]))
+    account.get_open_orders()
+    account.get_open_orders()
+    assert client.trade.exchange.request_counts.get("OpenOrders") == 1
+
+
+def test_bot_skips_iteration_until_seeded(offline_config, client):
+    from trading_bot import CryptoTradingBot
+    existing = client.trade.create_order(ordertype="limit", side="buy", volume=20, pair="XRPUSD",
+                                         price=0.4)["txid"][0]
+    account = AccountState(client, ttl=0, tracker=FillTracker(client, pairs=["XRPUSD"]))
+    pair_config = {'pair': "XRPUSD", 'buy_price': 0.45, 'sell_price': 0.55, 'dollars_buy_amount': 10.0,
+                   'sell_all': False}
+    bot = CryptoTradingBot(client=client, pair_config=pair_config, account=account)
+    exchange = client.trade.exchange
+
+    exchange.inject_error("OpenOrders", "EService:Unavailable")
+    bot.run_iteration()
+    # Nothing was placed while the existing order could not be seen
+    assert list(exchange.orders) == [existing]
+
+    bot.run_iteration()
+    assert list(exchange.orders) == [existing]
+
+
+def test_seed_adopts_only_this_pairs_journal_orders(client, tmp_path):
+    from journal import OrderJournal
+    journal = OrderJournal(str(tmp_path / "journal.db"))
+    own = client.trade.create_order(ordertype="limit", side="buy", volume=20, pair="XRPUSD", price=0.4)["txid"][0]
+    other = client.trade.create_order(ordertype="limit", side="buy", volume=0.001, pair="XBTUSD",
+                                      price=20000)["txid"][0]
+    journal.record_placed(own, "XRPUSD", "buy", 0.4, 20)
+    # Placed by another bot sharing the journal file
+    journal.record_placed(other, "XBTUSD", "buy", 20000, 0.001)
+
+    tracker = FillTracker(client, pairs=["XRPUSD"])
+    account = AccountState(client, ttl=0, journal=journal, tracker=tracker)
+    assert list(account.get_open_orders()) == [own]
+    assert len(tracker) == 1
+
+    queried = []
+    query_orders = client.query_orders
+    client.query_orders = lambda txids: queried.append(list(txids)) or query_orders(txids)
+    account.get_open_orders()
+    assert queried == [[own]]
+    journal.close()
@@ -0,0 +1,35 @@
+"""Dead man's switch against the mock exchange's CancelAllOrdersAfter timer."""
+from dead_mans_switch import DeadMansSwitch
+from kraken_client import KrakenClient
+from mock_exchange import MockExchange, connect_client
+
+
+def make_clients(exchange, count):
+    # Several bots on the same API key, e.g. one systemd instance per pair
+    return [connect_client(KrakenClient(api_key="shared", api_secret="test"), exchange) for _ in range(count)]
+
+
+def test_stop_disarms_when_asked():
+    exchange = MockExchange()
+    client, = make_clients(exchange, 1)
+    switch = DeadMansSwitch(client, timeout=120, disarm_on_stop=True)
+    switch.start()
+    assert "shared" in exchange.cancel_after
+    switch.stop()
+    assert "shared" not in exchange.cancel_after
+
+
+def test_shared_key_stays_armed_when_one_bot_stops():
+    exchange = MockExchange()
+    first, second = make_clients(exchange, 2)
+    # Default settings: a stopping bot leaves the timer to the others
+    stopping = DeadMansSwitch(first, timeout=120)
+    running = DeadMansSwitch(second, timeout=120)
+    stopping.start()
+    running.start()
+
+    stopping.stop()
+    assert "shared" in exchange.cancel_after
+    running.refresh()
+    assert "shared" in exchange.cancel_after
+    running.stop()
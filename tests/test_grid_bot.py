@@ -0,0 +1,97 @@
+"""GridBot run loop against the in-process mock exchange."""
+import pytest
+import trading_bot
+from grid_bot import GridBot
+from kraken_client import KrakenClient
+from mock_exchange import MockExchange, connect_client
+
+
+def run_once(bot, monkeypatch):
+    """Run the bot's main loop for one iteration and return the interval it chose."""
+    intervals = []
+
+    def sleep(seconds):
+        intervals.append(seconds)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(trading_bot.time, "sleep", sleep)
+    bot.run()
+    return intervals
+
+
+PAIR_CONFIG = {'pair': "XRPUSD", 'buy_price': 0.45, 'sell_price': 0.55, 'dollars_buy_amount': 10.0,
+               'sell_all': False}
+
+
+def make_bot(balances, levels=3):
+    exchange = MockExchange(balances=balances, prices={"XRPUSD": 0.5})
+    client = connect_client(KrakenClient(api_key="test", api_secret="test"), exchange)
+    return GridBot(client=client, pair_config=PAIR_CONFIG, levels=levels, spacing_pct=1.0), exchange
+
+
+def test_run_loop_without_working_orders(offline_config, monkeypatch):
+    # $1 buys no level and there is no XRP to sell, so nothing is placed
+    bot, exchange = make_bot({"ZUSD": 1.0})
+    intervals = run_once(bot, monkeypatch)
+    assert not exchange.orders
+    assert len(intervals) == 1 and intervals[0] > 0
+    # The scheduler watched the whole grid rather than the level count
+    assert bot.grid_levels == 3
+    assert sorted(bot.levels) == sorted(bot._slot_price(slot) for slot in bot.slots)
+
+
+def test_run_loop_watches_working_orders(offline_config, monkeypatch):
+    bot, exchange = make_bot({"ZUSD": 1000.0})
+    run_once(bot, monkeypatch)
+    working = [slot for slot in bot.slots if slot['order_id']]
+    assert working
+    assert sorted(bot.levels) == sorted(bot._slot_price(slot) for slot in working)
+
+
+def open_orders(exchange):
+    return {order_id: order for order_id, order in exchange.orders.items() if order.remaining > 0}
+
+
+def test_filled_buy_level_is_rearmed_as_sell(offline_config, monkeypatch):
+    bot, exchange = make_bot({"ZUSD": 1000.0})
+    run_once(bot, monkeypatch)
+    # No XRP yet: only the buy ladder is working
+    assert sorted(order.price for order in open_orders(exchange).values()) == [0.441, 0.4455, 0.45]
+    top = bot.slots[0]
+    bought = top['order_id']
+
+    exchange.trade("XRPUSD", 0.449)  # fills the 0.45 level only
+    bot.account.invalidate()
+    run_once(bot, monkeypatch)
+    assert bought not in open_orders(exchange)
+    assert top['side'] == "sell" and top['order_id'] in open_orders(exchange)
+    sell = open_orders(exchange)[top['order_id']]
+    assert (sell.side, sell.price) == ("sell", 0.55)
+    assert sell.volume == pytest.approx(10.0 / 0.45, abs=1e-5)
+
+    exchange.trade("XRPUSD", 0.551)
+    bot.account.invalidate()
+    run_once(bot, monkeypatch)
+    assert top['side'] == "buy"
+    assert open_orders(exchange)[top['order_id']].price == 0.45
+
+
+def test_restart_adopts_existing_orders(offline_config, monkeypatch):
+    bot, exchange = make_bot({"ZUSD": 1000.0})
+    run_once(bot, monkeypatch)
+    working = {slot['order_id'] for slot in bot.slots if slot['order_id']}
+
+    # A new process on the same account finds the orders and places nothing twice
+    restarted = GridBot(client=bot.client, pair_config=PAIR_CONFIG, levels=3, spacing_pct=1.0)
+    run_once(restarted, monkeypatch)
+    assert {slot['order_id'] for slot in restarted.slots if slot['order_id']} == working
+    assert set(open_orders(exchange)) == working
+
+
+def test_large_grid_is_placed_in_batches_of_fifteen(offline_config, monkeypatch):
+    bot, exchange = make_bot({"ZUSD": 1000.0, "XXRP": 1000.0}, levels=10)
+    run_once(bot, monkeypatch)
+    assert len(open_orders(exchange)) == 20
+    assert all(slot['order_id'] for slot in bot.slots)
+    assert exchange.request_counts.get("AddOrderBatch") == 2
+    assert "AddOrder" not in exchange.request_counts
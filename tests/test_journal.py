@@ -0,0 +1,85 @@
+"""OrderJournal reconciliation against canned OpenOrders, QueryOrders and ClosedOrders results."""
+import pytest
+from journal import OrderJournal
+
+
+class CannedClient:
+    """Answers QueryOrders from a fixed result and remembers what was asked."""
+
+    def __init__(self, orders):
+        self.orders = orders
+        self.queries = []
+
+    def query_orders(self, txids):
+        self.queries.append(list(txids))
+        return {txid: self.orders[txid] for txid in txids if txid in self.orders}
+
+
+def open_order(pair, side, price, vol, vol_exec=0.0):
+    return {'descr': {'pair': pair, 'type': side, 'price': str(price), 'order': "{} {} {}".format(side, vol, pair)},
+            'vol': str(vol), 'vol_exec': str(vol_exec), 'cost': str(vol_exec * price), 'fee': "0", 'status': "open",
+            'opentm': 1700000000.0}
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = OrderJournal(str(tmp_path / "journal.db"))
+    journal.record_placed("OBUY", "XRPUSD", "buy", 0.45, 22.0)
+    journal.record_placed("OSELL", "XRPUSD", "sell", 0.55, 18.0)
+    yield journal
+    journal.close()
+
+
+def test_nothing_gone_costs_no_query(journal):
+    client = CannedClient({})
+    snapshot = {"OBUY": open_order("XRPUSD", "buy", 0.45, 22.0), "OSELL": open_order("XRPUSD", "sell", 0.55, 18.0)}
+    assert journal.reconcile(client, snapshot) == []
+    assert client.queries == []
+
+
+def test_reconcile_records_fills_partials_and_imports(journal):
+    filled = dict(open_order("XRPUSD", "sell", 0.55, 18.0, vol_exec=18.0), status="closed", closetm=1700000100.0)
+    client = CannedClient({"OSELL": filled})
+    snapshot = {
+        "OBUY": open_order("XRPUSD", "buy", 0.45, 22.0, vol_exec=5.0),  # partly filled
+        "OHAND": open_order("XBTUSD", "buy", 20000, 0.001),  # placed by hand
+    }
+
+    assert journal.reconcile(client, snapshot) == ["OSELL"]
+    # Only the order that left OpenOrders was queried
+    assert client.queries == [["OSELL"]]
+
+    rows = {row['txid']: row for row in journal.history()}
+    assert rows["OSELL"]['status'] == "closed" and rows["OSELL"]['vol_exec'] == 18.0
+    assert rows["OSELL"]['closed_at'] == 1700000100.0
+    assert rows["OBUY"]['status'] == "open" and rows["OBUY"]['vol_exec'] == 5.0
+    assert rows["OHAND"]['source'] == "exchange" and rows["OHAND"]['pair'] == "XBTUSD"
+    assert set(journal.open_orders()) == {"OBUY", "OHAND"}
+    assert set(journal.open_orders(["XRPUSD"])) == {"OBUY"}
+
+
+def test_cancelled_orders_are_not_queried(journal):
+    journal.record_cancelled("OSELL")
+    client = CannedClient({})
+    assert journal.reconcile(client, {"OBUY": open_order("XRPUSD", "buy", 0.45, 22.0)}) == []
+    assert client.queries == []
+    assert [row['status'] for row in journal.history() if row['txid'] == "OSELL"] == ["canceled"]
+
+
+def test_order_unknown_to_kraken_stays_open(journal):
+    client = CannedClient({})
+    assert journal.reconcile(client, {"OBUY": open_order("XRPUSD", "buy", 0.45, 22.0)}) == []
+    assert client.queries == [["OSELL"]]
+    assert "OSELL" in journal.open_orders()
+
+
+def test_closed_orders_result_is_applied(journal):
+    # A partly filled cancel is recorded; an entry that is not final leaves its row alone
+    closed = {
+        "OBUY": dict(open_order("XRPUSD", "buy", 0.45, 22.0, vol_exec=4.0), status="canceled", closetm=1700000200.0),
+        "OSELL": open_order("XRPUSD", "sell", 0.55, 18.0),
+    }
+    journal.apply_order_info(closed)
+    rows = {row['txid']: row for row in journal.history()}
+    assert rows["OBUY"]['status'] == "canceled" and rows["OBUY"]['vol_exec'] == 4.0
+    assert rows["OSELL"]['status'] == "open"
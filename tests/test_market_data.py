@@ -0,0 +1,127 @@
+"""PriceFeed against a local WebSocket server replaying recorded Kraken messages."""
+import json
+import time
+import pytest
+from market_data import PriceFeed, to_ws_pair
+from ws_replay import ReplayServer, load_messages
+
+
+def ticker(channel_id, pair, price):
+    return json.dumps([channel_id, {"c": [str(price), "0.1"], "a": [str(price), 1, "1.0"]}, "ticker", pair])
+
+
+RECORDING = [
+    json.dumps({"event": "systemStatus", "status": "online"}),
+    ticker(340, "XBT/USD", 60000.0),
+    ticker(341, "ETH/USD", 3000.0),
+    ticker(340, "XBT/USD", 60010.5),
+    json.dumps({"event": "heartbeat"}),
+    ticker(341, "ETH/USD", 3001.25),
+    json.dumps([342, [["0.5012", "100.0", "1700000000.1", "b", "l", ""]], "trade", "XRP/USD"]),
+]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def server():
+    server = ReplayServer(RECORDING, heartbeat=0.2)
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def feed(server):
+    feed = PriceFeed(url=server.url, idle_timeout=2.0, reconnect_delay=0.05)
+    yield feed
+    feed.stop()
+
+
+def test_to_ws_pair():
+    assert to_ws_pair("XBTUSD") == "XBT/USD"
+    assert to_ws_pair("XXBTZUSD") == "XBT/USD"
+    assert to_ws_pair("USDTUSD") == "USDT/USD"
+    assert to_ws_pair("eth/usd") == "ETH/USD"
+
+
+def test_subscribe_and_price_updates(server, feed):
+    feed.subscribe("XBTUSD")
+    feed.start()
+    assert wait_for(lambda: feed.get_price("XBTUSD") == 60010.5)
+    assert server.subscriptions == [(1, "ticker", ["XBT/USD"])]
+    # Pairs that were not subscribed are not streamed
+    assert feed.get_price("ETHUSD") is None
+    assert feed.get_age("XBT/USD") < 5
+
+
+def test_subscribe_while_connected(server, feed):
+    feed.start()
+    assert wait_for(lambda: feed.connected)
+    feed.subscribe("ETHUSD")
+    assert wait_for(lambda: feed.get_price("ETH/USD") == 3001.25)
+    feed.subscribe("ETHUSD")  # already subscribed: nothing is sent
+    time.sleep(0.1)
+    assert server.subscriptions == [(1, "ticker", ["ETH/USD"])]
+
+
+def test_trade_channel(server):
+    feed = PriceFeed(url=server.url, channels=("trade",), reconnect_delay=0.05)
+    feed.subscribe("XRPUSD")
+    feed.start()
+    try:
+        assert wait_for(lambda: feed.get_price("XRPUSD") == 0.5012)
+    finally:
+        feed.stop()
+
+
+def test_reconnect_resubscribes_every_pair(server, feed):
+    feed.subscribe("XBTUSD")
+    feed.start()
+    assert wait_for(lambda: feed.get_price("XBTUSD") is not None)
+    feed.subscribe("ETHUSD")
+    assert wait_for(lambda: feed.get_price("ETHUSD") is not None)
+
+    server.drop_connections()
+    assert wait_for(lambda: server.connections == 2 and feed.reconnects == 1)
+    assert wait_for(lambda: feed.get_price("XBTUSD") == 60010.5 and feed.get_price("ETHUSD") == 3001.25)
+    # Both pairs are requested again, in one subscribe on the new connection
+    assert (2, "ticker", ["ETH/USD", "XBT/USD"]) in server.subscriptions
+
+
+def test_price_unavailable_while_disconnected(server, feed):
+    feed.subscribe("XBTUSD")
+    feed.start()
+    assert wait_for(lambda: feed.get_price("XBTUSD") is not None)
+    server.stop()
+    assert wait_for(lambda: not feed.connected)
+    assert feed.get_price("XBTUSD") is None
+
+
+def test_record_and_replay(server, tmp_path):
+    path = str(tmp_path / "recording.txt")
+    feed = PriceFeed(url=server.url, reconnect_delay=0.05, record_file=path)
+    feed.subscribe("XBTUSD")
+    feed.start()
+    assert wait_for(lambda: feed.get_price("XBTUSD") == 60010.5)
+    feed.stop()
+
+    messages = load_messages(path)
+    assert ticker(340, "XBT/USD", 60010.5) in messages
+    replay = ReplayServer(messages)
+    replay.start()
+    feed = PriceFeed(url=replay.url, reconnect_delay=0.05)
+    feed.subscribe("XBT/USD")
+    feed.start()
+    try:
+        assert wait_for(lambda: feed.get_price("XBTUSD") == 60010.5)
+    finally:
+        feed.stop()
+        replay.stop()
@@ -0,0 +1,165 @@
+"""MarketStore downloads over HTTP from the mock exchange serving canned Trades and OHLC pages."""
+import os
+import numpy as np
+import pytest
+from kraken.spot import Market
+import market_store
+from asset_registry import AssetRegistry
+from market_store import DAY, MarketDownloader, MarketStore, day_of
+from mock_exchange import TRADES_PAGE, MockExchange, MockKrakenServer
+
+START = 1700000000.0  # 2023-11-14 22:13:20 UTC
+COUNT = 6000
+
+
+class RecordingExchange(MockExchange):
+    """Mock exchange that remembers the `since` of every Trades request."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.trade_requests = []
+
+    def _ep_Trades(self, params, api_key):
+        self.trade_requests.append(params.get('since'))
+        return super()._ep_Trades(params, api_key)
+
+
+@pytest.fixture
+def history():
+    rng = np.random.default_rng(7)
+    times = START + np.cumsum(rng.uniform(1, 60, COUNT))
+    prices = np.round(0.5 + np.cumsum(rng.normal(0, 0.001, COUNT)), 5)
+    volumes = np.round(rng.uniform(1, 100, COUNT), 8)
+    return times, prices, volumes
+
+
+@pytest.fixture
+def exchange(history):
+    exchange = RecordingExchange()
+    exchange.load_prints("XRPUSD", zip(*history))
+    server = MockKrakenServer(exchange)
+    server.start()
+    exchange.url = server.url
+    yield exchange
+    server.stop()
+
+
+@pytest.fixture
+def downloader(exchange, tmp_path):
+    market = Market(url=exchange.url)
+    return MarketDownloader(MarketStore(str(tmp_path / "market_data")), market, AssetRegistry(market), pause=0)
+
+
+def test_paged_download(downloader, exchange, history):
+    times, prices, volumes = history
+    assert downloader.download_trades("XRPUSD", START, times[-1] + 1) == COUNT
+    # One page per TRADES_PAGE trades, plus the empty page that shows the end
+    assert len(exchange.trade_requests) == COUNT // TRADES_PAGE + 1
+
+    trades = downloader.store.trades("XRPUSD")
+    assert len(trades) == COUNT
+    assert trades.days == sorted({day_of(t) for t in times})
+    assert np.array_equal(trades.column('time'), times)
+    assert np.array_equal(trades.column('price'), prices)
+    assert np.array_equal(trades.column('volume'), volumes)
+    assert trades.gaps(START, times[-1]) == []
+
+
+def test_resume_from_stored_cursor(downloader, exchange, history, monkeypatch):
+    times = history[0]
+    # Flush every page, so each page commits its cursor
+    monkeypatch.setattr(market_store, "FLUSH_ROWS", TRADES_PAGE)
+    middle = times[2500]
+    downloader.download_trades("XRPUSD", START, middle)
+    trades = downloader.store.trades("XRPUSD")
+    covered_end, cursor = trades.meta['cursor']
+    assert covered_end == trades.covered[-1][1] == middle
+
+    exchange.trade_requests.clear()
+    added = downloader.download_trades("XRPUSD", START, times[-1] + 1)
+    # The next run starts from the stored cursor, not from the beginning
+    assert exchange.trade_requests[0] == cursor
+    assert added == COUNT - 2500
+    trades = downloader.store.trades("XRPUSD")
+    assert len(trades) == COUNT
+    assert np.array_equal(trades.column('time'), times)
+
+
+def test_fill_gap(downloader, exchange, history):
+    times = history[0]
+    downloader.download_trades("XRPUSD", START, times[1000])
+    downloader.download_trades("XRPUSD", times[3000], times[-1] + 1)
+    trades = downloader.store.trades("XRPUSD")
+    assert trades.gaps(START, times[-1]) == [(times[1000], times[3000])]
+    assert len(trades) == COUNT - 2000
+
+    exchange.trade_requests.clear()
+    assert downloader.download_trades("XRPUSD", START, times[-1] + 1) == 2000
+    # Only the hole (and the end) is fetched
+    assert times[1000] - 1 <= float(exchange.trade_requests[0]) / 1e9 < times[1000]
+    trades = downloader.store.trades("XRPUSD")
+    assert trades.gaps(START, times[-1]) == []
+    assert np.array_equal(trades.column('time'), times)
+
+
+def test_rewrite_day_as_new_version(tmp_path):
+    store = MarketStore(str(tmp_path))
+    trades = store.trades("XRPUSD")
+    day = START // DAY * DAY + DAY  # a whole day after START
+    first = {'time': day + np.arange(5.0), 'price': np.full(5, 1.0), 'volume': np.ones(5),
+             'side': np.ones(5), 'market': np.zeros(5), 'trade_id': np.arange(5)}
+    trades.write(first)
+    name = day_of(day)
+    assert trades.meta['days'][name] == {'rows': 5, 'version': 1}
+    old_view = trades.column('price')
+
+    # Trade 4 is replaced and 5 and 6 are added
+    second = {'time': day + np.array([4.0, 5.0, 6.0]), 'price': np.full(3, 2.0), 'volume': np.ones(3),
+              'side': -np.ones(3), 'market': np.ones(3), 'trade_id': np.array([4, 5, 6])}
+    trades.write(second)
+    assert trades.meta['days'][name] == {'rows': 7, 'version': 2}
+    assert trades.column('price').tolist() == [1.0] * 4 + [2.0] * 3
+    assert trades.column('trade_id').tolist() == list(range(7))
+    # The first version's files are gone, but views already handed out stay valid
+    assert sorted(os.listdir(trades.path)) == sorted(
+        ["meta.json"] + ["{}.v2.{}.npy".format(name, column) for column, _ in market_store.TRADE_COLUMNS])
+    assert old_view.tolist() == [1.0] * 5
+
+    reopened = store.trades("XRPUSD")
+    assert isinstance(reopened.column('price'), np.memmap)
+    assert len(reopened) == 7
+
+
+def test_ohlc_rebuilt_from_trades(downloader, exchange, history):
+    times, prices, volumes = history
+    assert downloader.download_ohlc("XRPUSD", 1, start=START) > 720
+    candles = downloader.store.ohlc("XRPUSD", 1)
+
+    # Reference candles, one per minute with trades, the last one still open
+    expected = {}
+    for t, price, volume in zip(times, prices, volumes):
+        start = t // 60 * 60
+        candle = expected.setdefault(start, [price, price, price, price, 0.0, 0.0, 0])
+        candle[1] = max(candle[1], price)
+        candle[2] = min(candle[2], price)
+        candle[3] = price
+        candle[4] += price * volume
+        candle[5] += volume
+        candle[6] += 1
+    starts = sorted(expected)[:-1]
+    assert candles.column('time').tolist() == starts
+    rows = np.array([expected[start] for start in starts])
+    assert np.allclose(candles.column('open'), rows[:, 0])
+    assert np.allclose(candles.column('high'), rows[:, 1])
+    assert np.allclose(candles.column('low'), rows[:, 2])
+    assert np.allclose(candles.column('close'), rows[:, 3])
+    assert np.allclose(candles.column('vwap'), rows[:, 4] / rows[:, 5])
+    assert np.allclose(candles.column('volume'), rows[:, 5])
+    assert candles.column('count').tolist() == rows[:, 6].astype(int).tolist()
+    # Only the trades before the endpoint's candles (720 less the open one) were needed
+    trades = downloader.store.trades("XRPUSD")
+    assert 0 < len(trades) < COUNT
+    assert starts[-720] <= trades.last_time() < starts[-719]
+
+    # Up to date: a second run adds nothing
+    assert downloader.download_ohlc("XRPUSD", 1, start=START) == 0
@@ -0,0 +1,18 @@
+"""Prometheus export of the rate limit governor's statistics."""
+from metrics import Metrics, governor_collector
+from rate_limiter import RateLimitGovernor
+
+
+def test_governor_totals_are_counters():
+    governor = RateLimitGovernor(tier="starter")
+    governor.acquire()
+    governor.penalize()
+    metrics = Metrics()
+    metrics.add_collector(governor_collector(governor))
+    text = metrics.render()
+
+    assert "# TYPE rate_limit_counter gauge" in text
+    assert "# TYPE rate_limit_queue_depth gauge" in text
+    for name in ("rate_limit_waited_calls_total", "rate_limit_wait_seconds_total", "rate_limit_errors_total"):
+        assert "# TYPE {} counter".format(name) in text
+    assert 'rate_limit_errors_total{tier="starter"} 1' in text
@@ -0,0 +1,66 @@
+"""OrderBook checksum and OrderBookFeed handling of recorded book messages."""
+import json
+import pytest
+from order_book import OrderBook, OrderBookFeed
+
+TS = "1582905487.684110"
+
+# The example book from Kraken's WebSocket checksum documentation
+ASKS = [[price, "0.00000500", TS] for price in
+        ("0.05005", "0.05010", "0.05015", "0.05020", "0.05025", "0.05030", "0.05035", "0.05040", "0.05045", "0.05050")]
+BIDS = [[price, "0.00000500", TS] for price in
+        ("0.05000", "0.04995", "0.04990", "0.04980", "0.04975", "0.04970", "0.04965", "0.04960", "0.04955", "0.04950")]
+CHECKSUM = 974947235
+
+
+def make_book():
+    book = OrderBook("XBT/USD", depth=10)
+    book.apply_snapshot(ASKS, BIDS)
+    return book
+
+
+def test_checksum_matches_kraken_example():
+    assert make_book().checksum() == CHECKSUM
+
+
+def test_updates_change_levels_and_checksum():
+    book = make_book()
+    book.apply_update(bids=[["0.05000", "0.00000000", TS]])
+    assert book.best_bid() == pytest.approx(0.04995)
+    assert book.checksum() != CHECKSUM
+
+    book.apply_update(bids=[["0.05000", "0.00000500", TS]])
+    assert book.best_bid() == pytest.approx(0.05)
+    assert book.checksum() == CHECKSUM
+    assert book.spread() == pytest.approx(0.00005)
+
+
+def book_message(payload):
+    return json.dumps([336, payload, "book-10", "XBT/USD"])
+
+
+def test_feed_keeps_book_while_checksums_match():
+    feed = OrderBookFeed(depth=10)
+    snapshot = make_book()
+    snapshot.apply_update(asks=[["0.05005", "0.00001000", TS]])
+    feed.replay([
+        book_message({"as": ASKS, "bs": BIDS}),
+        book_message({"a": [["0.05005", "0.00001000", TS]], "c": str(snapshot.checksum())}),
+    ])
+    assert feed.checksum_failures == 0
+    book = feed.get_book("XBTUSD")
+    assert book is not None and book.depth_at("sell", 0.05005) == pytest.approx(0.00001)
+
+
+def test_feed_drops_book_on_checksum_mismatch():
+    feed = OrderBookFeed(depth=10)
+    feed.replay([
+        book_message({"as": ASKS, "bs": BIDS}),
+        book_message({"a": [["0.05005", "0.00001000", TS]], "c": str(CHECKSUM)}),
+    ])
+    assert feed.checksum_failures == 1
+    assert feed.get_book("XBTUSD") is None
+
+    # A fresh snapshot makes the book usable again
+    feed.replay([book_message({"as": ASKS, "bs": BIDS})])
+    assert feed.get_book("XBT/USD").checksum() == CHECKSUM
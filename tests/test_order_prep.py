@@ -0,0 +1,52 @@
+"""Limit order pre-validation against a pair's tick size, lot size and minimums."""
+from dataclasses import replace
+import pytest
+from asset_registry import PairInfo
+from order_prep import prepare_limit_order
+
+XBTUSD = PairInfo(key="XXBTZUSD", altname="XBTUSD", wsname="XBT/USD", base="XXBT", quote="ZUSD",
+                  ordermin=0.0001, costmin=0.5, lot_decimals=8, pair_decimals=1, tick_size=0.5)
+XRPUSD = PairInfo(key="XXRPZUSD", altname="XRPUSD", wsname="XRP/USD", base="XXRP", quote="ZUSD",
+                  ordermin=10, costmin=0.5, lot_decimals=8, pair_decimals=5, tick_size=0.00001)
+
+
+def test_price_rounds_to_tick_away_from_the_market():
+    assert prepare_limit_order(XBTUSD, "buy", 0.01, 50000.74).price == "50000.5"
+    assert prepare_limit_order(XBTUSD, "sell", 0.01, 50000.26).price == "50000.5"
+    assert prepare_limit_order(XBTUSD, "buy", 0.01, 50000.5).price == "50000.5"
+
+
+def test_volume_rounds_down_to_lot_decimals():
+    order = prepare_limit_order(XRPUSD, "buy", 22.222222229, 0.45)
+    assert order.volume == "22.22222222"
+    assert order.pair == "XXRPZUSD"
+    assert order.matches("buy", 22.222222229, 0.45)
+    assert not order.matches("sell", 22.222222229, 0.45)
+
+
+def test_small_values_are_fixed_point():
+    # str(Decimal) would give "5.0E-7"
+    order = prepare_limit_order(replace(XBTUSD, ordermin=0, costmin=0), "buy", 0.0000005, 50000)
+    assert order.volume == "0.00000050"
+
+
+@pytest.mark.parametrize("volume, price", [
+    (9.99999999, 0.45),  # below ordermin
+    (10.000000009, 0.000049),  # value below costmin
+    (20, 0.000001),  # price rounds to zero
+])
+def test_rejected_orders(volume, price):
+    with pytest.raises(ValueError):
+        prepare_limit_order(XRPUSD, "buy", volume, price)
+
+
+def test_ordermin_applies_after_rounding():
+    # 10 XRP asked for, but 9.999999999 rounds down below the minimum
+    with pytest.raises(ValueError, match="below the pair minimum"):
+        prepare_limit_order(XRPUSD, "sell", 9.999999999, 0.55)
+    assert prepare_limit_order(XRPUSD, "sell", 10, 0.55).volume == "10.00000000"
+
+
+def test_bad_side():
+    with pytest.raises(ValueError):
+        prepare_limit_order(XRPUSD, "hold", 20, 0.5)
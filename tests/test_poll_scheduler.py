@@ -0,0 +1,27 @@
+"""PollScheduler bounds under a busy rate limit governor."""
+from poll_scheduler import PollScheduler
+from rate_limiter import PRIORITY_ACCOUNT, PRIORITY_INFO, RateLimitGovernor
+
+
+def test_interval_never_exceeds_max_interval():
+    governor = RateLimitGovernor(tier="starter")
+    scheduler = PollScheduler(min_interval=5, max_interval=300, governor=governor)
+    intervals = []
+    for _ in range(10):
+        # Far more account calls per iteration than the budget sustains
+        governor.spent_by_priority[PRIORITY_ACCOUNT] = governor.spent_by_priority.get(PRIORITY_ACCOUNT, 0) + 200
+        governor.penalize()  # counter full
+        intervals.append(scheduler.next_interval([("XBTUSD", 50000.0, [40000.0])]))
+    assert intervals == [300] * 10
+
+
+def test_history_reads_do_not_raise_the_floor():
+    governor = RateLimitGovernor(tier="starter")
+    scheduler = PollScheduler(min_interval=5, max_interval=300, governor=governor)
+    for _ in range(3):
+        governor.acquire(cost=2, priority=PRIORITY_INFO)
+    assert governor.spent == 6
+    assert scheduler.budget_floor() == 0
+
+    governor.acquire(cost=1, priority=PRIORITY_ACCOUNT)
+    assert scheduler.budget_floor() == 1 / (governor.decay_rate * scheduler.budget_share)
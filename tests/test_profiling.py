@@ -0,0 +1,45 @@
+"""cProfile captures of the multi-pair engine, whose pairs run on executor threads."""
+import asyncio
+import os
+import pstats
+from engine import TradingEngine
+from kraken_client import KrakenClient
+from mock_exchange import MockExchange, connect_client
+from profiling import Profiler
+
+
+def make_engine():
+    exchange = MockExchange(balances={"ZUSD": 1000.0}, prices={"XRPUSD": 0.5, "ETHUSD": 3000.0})
+    client = connect_client(KrakenClient(api_key="test", api_secret="test"), exchange)
+    pair_configs = [
+        {'pair': "XRPUSD", 'buy_price': 0.45, 'sell_price': 0.55, 'dollars_buy_amount': 10.0, 'sell_all': False},
+        {'pair': "ETHUSD", 'buy_price': 2800.0, 'sell_price': 3200.0, 'dollars_buy_amount': 10.0, 'sell_all': False},
+    ]
+    return TradingEngine(pair_configs=pair_configs, client=client)
+
+
+def profiled_functions(directory):
+    prof = [name for name in os.listdir(directory) if name.endswith(".prof")]
+    assert len(prof) == 1
+    return {name for _, _, name in pstats.Stats(os.path.join(directory, prof[0])).stats}
+
+
+def test_engine_capture_includes_executor_calls(offline_config, tmp_path):
+    engine = make_engine()
+    engine.profiler = Profiler(str(tmp_path))
+    engine.profiler.request_profile(0)
+    engine.profiler.checkpoint()
+    asyncio.run(engine.tick())
+    engine.profiler.checkpoint()
+
+    functions = profiled_functions(str(tmp_path))
+    # The account refresh and both pairs' iterations ran on executor threads
+    assert "refresh" in functions
+    assert "run_iteration" in functions
+    assert "submit_order" in functions  # each pair placed its buy order
+
+
+def test_calls_outside_a_capture_are_not_profiled(offline_config, tmp_path):
+    profiler = Profiler(str(tmp_path))
+    assert profiler.call(sum, [1, 2, 3]) == 6
+    assert profiler._thread_profiles == []
@@ -0,0 +1,83 @@
+"""RateLimitGovernor: counter decay, waiting and priority order."""
+import threading
+import time
+import pytest
+import rate_limiter
+from rate_limiter import PRIORITY_ACCOUNT, PRIORITY_INFO, PRIORITY_TRADE, RateLimitGovernor
+
+
+class FakeClock:
+    """time.monotonic stand-in that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock)
+    return clock
+
+
+def test_counter_decays_at_the_tier_rate(clock):
+    governor = RateLimitGovernor(tier="intermediate")
+    for _ in range(10):
+        governor.acquire()
+    assert governor.stats()['counter'] == 10
+    clock.now += 4
+    assert governor.stats()['counter'] == 8  # 0.5 per second
+    clock.now += 100
+    assert governor.stats()['counter'] == 0
+
+
+def test_endpoint_costs():
+    assert rate_limiter.endpoint_cost("TradesHistory") == 2
+    assert rate_limiter.endpoint_cost("Balance") == 1
+    assert rate_limiter.endpoint_cost("AddOrder") == 0
+
+
+def test_unknown_tier():
+    with pytest.raises(ValueError):
+        RateLimitGovernor(tier="gold")
+
+
+def test_penalize_fills_the_counter(clock):
+    governor = RateLimitGovernor(tier="starter", headroom=3)
+    with pytest.raises(Exception):
+        with governor.limit("Balance"):
+            raise Exception("EAPI:Rate limit exceeded")
+    stats = governor.stats()
+    assert stats['counter'] == stats['max_counter'] == 12
+    assert stats['rate_limit_errors'] == 1
+
+
+def test_full_counter_waits_and_serves_by_priority():
+    # Real clock: pro decays 1 unit per second, so each queued call waits about a second
+    governor = RateLimitGovernor(tier="pro")
+    for _ in range(20):
+        governor.acquire()
+    order = []
+
+    def call(name, priority):
+        governor.acquire(priority=priority)
+        order.append(name)
+
+    threads = []
+    for name, priority in (("history", PRIORITY_INFO), ("balance", PRIORITY_ACCOUNT), ("order", PRIORITY_TRADE)):
+        thread = threading.Thread(target=call, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.05)  # queue them in this order
+    for thread in threads:
+        thread.join(10)
+
+    # Queued lowest priority first, served highest priority first
+    assert order == ["order", "balance", "history"]
+    stats = governor.stats()
+    assert stats['waited_calls'] == 3
+    assert stats['max_wait'] >= 0.5
+    assert governor.spent_by_priority == {PRIORITY_ACCOUNT: 21, PRIORITY_INFO: 1, PRIORITY_TRADE: 1}
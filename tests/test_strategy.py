@@ -0,0 +1,148 @@
+"""The buy/sell state machine: strategy.step, the live bot built on it, and the backtester."""
+import itertools
+import numpy as np
+import pytest
+import strategy
+from backtester import run_backtest, series_from_array
+from kraken_client import KrakenClient
+from mock_exchange import MockExchange, connect_client
+
+
+def legacy_iteration(params, sell_order_volume, buy_order_volume, crypto_amount, usd_balance):
+    """
+    The orders run_iteration placed before step() existed, for comparison.
+
+    Returns:
+        ("wait", None) while an order is open, otherwise the (side, volume)
+        orders the old loop would try in turn ([] when waiting for funds)
+    """
+    if sell_order_volume is not None or buy_order_volume is not None:
+        return "wait", None
+    if crypto_amount > 0:
+        if params.sell_all:
+            sell_amount = crypto_amount
+        else:
+            sell_amount = params.dollars_buy_amount / params.sell_price
+        tries = [("sell", sell_amount)] if sell_amount >= params.min_trade_size else []
+        if usd_balance >= params.dollars_buy_amount:
+            tries.append(("buy", params.dollars_buy_amount / params.buy_price))
+        return "orders", tries
+    if usd_balance >= params.dollars_buy_amount:
+        return "orders", [("buy", params.dollars_buy_amount / params.buy_price)]
+    return "orders", []
+
+
+def step_orders(params, *state):
+    """The orders run_iteration tries for step()'s decision, in legacy_iteration's terms."""
+    decision = strategy.step(params, *state)
+    if decision.action in (strategy.WAIT_SELL, strategy.WAIT_BUY):
+        return "wait", None
+    tries = []
+    if decision.action == strategy.SELL:
+        tries.append(("sell", decision.sell_amount))
+    if decision.action in (strategy.SELL, strategy.SELL_TOO_SMALL):
+        if decision.buy_if_no_sell:
+            tries.append(("buy", decision.buy_amount))
+    elif decision.action == strategy.BUY:
+        tries.append(("buy", decision.buy_amount))
+    return "orders", tries
+
+
+@pytest.mark.parametrize("sell_all", [False, True])
+def test_step_matches_the_old_run_iteration(sell_all):
+    params = strategy.StrategyParams(buy_price=0.45, sell_price=0.55, dollars_buy_amount=10.0, sell_all=sell_all,
+                                     min_trade_size=5.0)
+    states = itertools.product([None, 18.0], [None, 22.0], [0.0, 1.0, 18.18, 40.0], [0.0, 9.99, 10.0, 500.0])
+    for state in states:
+        assert step_orders(params, *state) == legacy_iteration(params, *state), state
+
+
+def test_wait_buy_plans_the_sell():
+    params = strategy.StrategyParams(0.45, 0.55, 10.0, False, 5.0)
+    decision = strategy.step(params, None, 22.0, 0.0, 0.0)
+    assert decision.action == strategy.WAIT_BUY
+    assert decision.sell_amount == pytest.approx(10.0 / 0.55)
+    assert decision.sell_total == 10.0
+
+    decision = strategy.step(params._replace(sell_all=True), None, 22.0, 0.0, 0.0)
+    assert decision.sell_amount == 22.0
+    assert decision.sell_total == pytest.approx(22.0 * 0.55)
+
+
+def make_bot(sell_all):
+    from trading_bot import CryptoTradingBot
+    exchange = MockExchange(balances={"ZUSD": 100.0}, prices={"XRPUSD": 0.5})
+    client = connect_client(KrakenClient(api_key="test", api_secret="test"), exchange)
+    pair_config = {'pair': "XRPUSD", 'buy_price': 0.45, 'sell_price': 0.55, 'dollars_buy_amount': 10.0,
+                   'sell_all': sell_all}
+    return CryptoTradingBot(client=client, pair_config=pair_config), exchange
+
+
+def only_order(exchange):
+    orders = [order for order in exchange.orders.values() if order.remaining > 0]
+    assert len(orders) == 1
+    return orders[0]
+
+
+def test_live_bot_buys_sells_and_buys_again(offline_config):
+    bot, exchange = make_bot(sell_all=True)
+
+    bot.run_iteration()
+    assert bot.last_action == strategy.BUY
+    buy = only_order(exchange)
+    assert (buy.side, buy.price) == ("buy", 0.45)
+    assert buy.volume == pytest.approx(10.0 / 0.45)
+
+    bot.run_iteration()
+    assert bot.last_action == strategy.WAIT_BUY
+    assert only_order(exchange) is buy
+
+    exchange.trade("XRPUSD", 0.44)
+    bot.account.invalidate()
+    bot.run_iteration()
+    assert bot.last_action == strategy.SELL
+    sell = only_order(exchange)
+    # SELL_ALL: everything the buy brought in
+    assert (sell.side, sell.price) == ("sell", 0.55)
+    assert sell.volume == pytest.approx(buy.volume)
+
+    exchange.trade("XRPUSD", 0.56)
+    bot.account.invalidate()
+    bot.run_iteration()
+    assert bot.last_action == strategy.BUY
+    rebuy = only_order(exchange)
+    assert rebuy is not buy and (rebuy.side, rebuy.price) == ("buy", 0.45)
+
+
+def test_live_bot_sells_dollar_amount_without_sell_all(offline_config):
+    bot, exchange = make_bot(sell_all=False)
+    bot.run_iteration()
+    exchange.trade("XRPUSD", 0.44)
+    bot.account.invalidate()
+    bot.run_iteration()
+    assert bot.last_action == strategy.SELL
+    sell = only_order(exchange)
+    assert sell.volume == pytest.approx(10.0 / 0.55, abs=1e-5)
+
+
+def test_backtest_round_trips():
+    # Down through the buy price, up through the sell price, twice
+    prices = [0.50, 0.44, 0.50, 0.56, 0.50, 0.44, 0.50, 0.56, 0.50]
+    series = series_from_array(np.array([[i, price] for i, price in enumerate(prices)]))
+    params = strategy.StrategyParams(0.45, 0.55, 10.0, True, 0.0)
+    result = run_backtest(series, params, usd_balance=100.0, fee_rate=0.0)
+
+    assert [(fill.side, fill.price) for fill in result.fills] == [("buy", 0.45), ("sell", 0.55)] * 2
+    assert result.round_trips == 2
+    # Each round trip buys $10 of XRP at 0.45 and sells all of it at 0.55
+    assert result.realized_pnl == pytest.approx(2 * (10.0 / 0.45 * 0.55 - 10.0))
+    # The third buy is left open; USD is only debited when an order fills
+    assert result.usd_balance == pytest.approx(100.0 + result.realized_pnl)
+    assert result.crypto_balance == pytest.approx(0.0)
+
+
+def test_backtest_waits_for_funds():
+    series = series_from_array(np.array([[0, 0.5], [1, 0.44]]))
+    params = strategy.StrategyParams(0.45, 0.55, 10.0, False, 0.0)
+    result = run_backtest(series, params, usd_balance=5.0)
+    assert result.fills == [] and result.usd_balance == 5.0
@@ -0,0 +1,27 @@
+"""Account settings applied by supervisor workers."""
+import pytest
+from config import Config
+from supervisor import apply_settings
+
+
+@pytest.fixture
+def restore_config(monkeypatch):
+    """Let apply_settings change Config for one test only."""
+    for key in ("DOLLARS_BUY_AMOUNT", "DOLLARS_BEING_TRADED", "SELL_ALL", "TRADING_PAIRS"):
+        monkeypatch.setattr(Config, key, getattr(Config, key))
+    monkeypatch.setattr(Config, "TRADING_PAIRS", "")
+
+
+@pytest.mark.parametrize("key", ["DOLLARS_BUY_AMOUNT", "DOLLARS_BEING_TRADED"])
+def test_account_buy_amount_reaches_pair_configs(restore_config, key):
+    apply_settings({key: "500", "SELL_ALL": "true"})
+    pair_config = Config.get_pair_configs()[0]
+    assert pair_config['dollars_buy_amount'] == 500.0
+    assert pair_config['sell_all'] is True
+    assert Config.DOLLARS_BUY_AMOUNT == Config.DOLLARS_BEING_TRADED == 500.0
+
+
+def test_account_buy_amount_is_the_default_for_trading_pairs(restore_config):
+    Config.TRADING_PAIRS = "XBTUSD:40000:50000,ETHUSD:2000:3000:25"
+    apply_settings({"DOLLARS_BUY_AMOUNT": "250"})
+    assert [c['dollars_buy_amount'] for c in Config.get_pair_configs()] == [250.0, 25.0]
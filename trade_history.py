@@ -0,0 +1,478 @@
+"""Local store of executed trades and ledger entries, synced incrementally, with running P&L."""
+import argparse
+import logging
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    txid TEXT PRIMARY KEY,
+    ordertxid TEXT NOT NULL,
+    pair TEXT NOT NULL,
+    time REAL NOT NULL,
+    side TEXT NOT NULL,
+    ordertype TEXT NOT NULL,
+    price REAL NOT NULL,
+    cost REAL NOT NULL,
+    fee REAL NOT NULL,
+    volume REAL NOT NULL,
+    applied INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS trades_pair_time ON trades (pair, time);
+CREATE INDEX IF NOT EXISTS trades_time ON trades (time);
+CREATE INDEX IF NOT EXISTS trades_order ON trades (ordertxid);
+CREATE INDEX IF NOT EXISTS trades_pending ON trades (time) WHERE applied = 0;
+CREATE TABLE IF NOT EXISTS ledger (
+    id TEXT PRIMARY KEY,
+    refid TEXT NOT NULL,
+    time REAL NOT NULL,
+    type TEXT NOT NULL,
+    subtype TEXT NOT NULL,
+    asset TEXT NOT NULL,
+    amount REAL NOT NULL,
+    fee REAL NOT NULL,
+    balance REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ledger_asset_time ON ledger (asset, time);
+CREATE INDEX IF NOT EXISTS ledger_refid ON ledger (refid);
+CREATE TABLE IF NOT EXISTS positions (
+    pair TEXT PRIMARY KEY,
+    volume REAL NOT NULL DEFAULT 0,
+    cost_basis REAL NOT NULL DEFAULT 0,
+    realized_pnl REAL NOT NULL DEFAULT 0,
+    fees REAL NOT NULL DEFAULT 0,
+    buys INTEGER NOT NULL DEFAULT 0,
+    sells INTEGER NOT NULL DEFAULT 0,
+    bought REAL NOT NULL DEFAULT 0,
+    sold REAL NOT NULL DEFAULT 0,
+    unmatched REAL NOT NULL DEFAULT 0,
+    round_trips INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    last_trade REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS round_trips (
+    txid TEXT PRIMARY KEY,
+    pair TEXT NOT NULL,
+    time REAL NOT NULL,
+    volume REAL NOT NULL,
+    entry_price REAL NOT NULL,
+    exit_price REAL NOT NULL,
+    pnl REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS round_trips_pair_time ON round_trips (pair, time);
+CREATE TABLE IF NOT EXISTS sync_state (
+    stream TEXT PRIMARY KEY,
+    cursor REAL NOT NULL DEFAULT 0,
+    pass_start REAL,
+    pass_end REAL,
+    ofs INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Seconds each sync pass reaches back before the previous one, for trades Kraken reports late
+SYNC_MARGIN = 60
+
+# Volumes below this are treated as a flat position
+DUST = 1e-10
+
+
+class TradeHistory:
+    """
+    SQLite store of the account's trades and ledger, with P&L kept current as trades arrive.
+
+    Trades are indexed by pair and time and by order txid. Realized P&L uses
+    the average cost method: buys add their cost and fee to the pair's cost
+    basis, and each sell realizes its proceeds minus its fee minus the
+    average cost of the volume sold. Every sell is one round trip. Only
+    trades not applied yet are read when P&L is updated, so it costs O(new
+    trades), and P&L queries read one row per pair.
+
+    Sells of volume bought before the history starts have no known cost; that
+    volume is counted as unmatched and left out of realized P&L.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize trade history.
+
+        Args:
+            path: SQLite database file (created if missing)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+    def sync_state(self, stream: str) -> sqlite3.Row:
+        """Sync cursor of a stream ("trades" or "ledger"), with any pass in progress."""
+        with self._lock, self._db:
+            self._db.execute("INSERT OR IGNORE INTO sync_state (stream) VALUES (?)", (stream,))
+            return self._db.execute("SELECT * FROM sync_state WHERE stream = ?", (stream,)).fetchone()
+
+    def _set_state(self, stream: str, cursor: float, pass_start: Optional[float], pass_end: Optional[float],
+                   ofs: int):
+        self._db.execute("UPDATE sync_state SET cursor = ?, pass_start = ?, pass_end = ?, ofs = ? WHERE stream = ?",
+                         (cursor, pass_start, pass_end, ofs, stream))
+
+    def add_trades(self, trades: Dict[str, dict], pair_name: Callable[[str], str], state: Tuple) -> int:
+        """
+        Store a TradesHistory page and the sync position after it, in one transaction.
+
+        Args:
+            trades: TradesHistory page, trade txid -> trade details
+            pair_name: Maps Kraken's pair key to the name stored (e.g. the altname)
+            state: (cursor, pass_start, pass_end, ofs) to save with the page
+
+        Returns:
+            Number of trades not stored before
+        """
+        rows = [(txid, trade.get('ordertxid', ''), pair_name(trade.get('pair', '')), float(trade['time']),
+                 trade.get('type', ''), trade.get('ordertype', ''), float(trade.get('price', 0) or 0),
+                 float(trade.get('cost', 0) or 0), float(trade.get('fee', 0) or 0), float(trade.get('vol', 0) or 0))
+                for txid, trade in trades.items()]
+        with self._lock, self._db:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO trades (txid, ordertxid, pair, time, side, ordertype, price, cost, fee, volume) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            added = self._db.total_changes - before
+            self._set_state("trades", *state)
+        return added
+
+    def add_ledger(self, entries: Dict[str, dict], state: Tuple) -> int:
+        """
+        Store a Ledgers page and the sync position after it, in one transaction.
+
+        Args:
+            entries: Ledgers page, ledger id -> entry details
+            state: (cursor, pass_start, pass_end, ofs) to save with the page
+
+        Returns:
+            Number of entries not stored before
+        """
+        rows = [(ledger_id, entry.get('refid', ''), float(entry['time']), entry.get('type', ''),
+                 entry.get('subtype', ''), entry.get('asset', ''), float(entry.get('amount', 0) or 0),
+                 float(entry.get('fee', 0) or 0), float(entry.get('balance', 0) or 0))
+                for ledger_id, entry in entries.items()]
+        with self._lock, self._db:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO ledger (id, refid, time, type, subtype, asset, amount, fee, balance) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            added = self._db.total_changes - before
+            self._set_state("ledger", *state)
+        return added
+
+    def apply_new_trades(self) -> int:
+        """
+        Update positions, P&L and round trips with the trades not applied yet, oldest first.
+
+        Returns:
+            Number of trades applied
+        """
+        with self._lock, self._db:
+            trades = self._db.execute("SELECT * FROM trades WHERE applied = 0 ORDER BY time, txid").fetchall()
+            if not trades:
+                return 0
+            positions = {}
+            for trade in trades:
+                pair = trade['pair']
+                position = positions.get(pair)
+                if position is None:
+                    row = self._db.execute("SELECT * FROM positions WHERE pair = ?", (pair,)).fetchone()
+                    position = positions[pair] = dict(row) if row else {
+                        'pair': pair, 'volume': 0.0, 'cost_basis': 0.0, 'realized_pnl': 0.0, 'fees': 0.0,
+                        'buys': 0, 'sells': 0, 'bought': 0.0, 'sold': 0.0, 'unmatched': 0.0, 'round_trips': 0,
+                        'wins': 0, 'last_trade': 0.0}
+                self._apply(position, trade)
+            for position in positions.values():
+                columns = list(position)
+                self._db.execute("INSERT OR REPLACE INTO positions ({}) VALUES ({})".format(
+                    ", ".join(columns), ", ".join("?" * len(columns))), [position[c] for c in columns])
+            self._db.executemany("UPDATE trades SET applied = 1 WHERE txid = ?", [(t['txid'],) for t in trades])
+        return len(trades)
+
+    def _apply(self, position: dict, trade: sqlite3.Row):
+        position['fees'] += trade['fee']
+        position['last_trade'] = max(position['last_trade'], trade['time'])
+        if trade['side'] == 'buy':
+            position['buys'] += 1
+            position['bought'] += trade['volume']
+            position['volume'] += trade['volume']
+            position['cost_basis'] += trade['cost'] + trade['fee']
+            return
+
+        position['sells'] += 1
+        position['sold'] += trade['volume']
+        matched = min(trade['volume'], position['volume'])
+        position['unmatched'] += trade['volume'] - matched
+        if matched <= DUST:
+            return
+        entry_price = position['cost_basis'] / position['volume']
+        share = matched / trade['volume']
+        pnl = (trade['cost'] - trade['fee']) * share - entry_price * matched
+        position['volume'] -= matched
+        position['cost_basis'] = 0.0 if position['volume'] <= DUST else position['cost_basis'] - entry_price * matched
+        position['realized_pnl'] += pnl
+        position['round_trips'] += 1
+        if pnl > 0:
+            position['wins'] += 1
+        self._db.execute(
+            "INSERT OR REPLACE INTO round_trips (txid, pair, time, volume, entry_price, exit_price, pnl) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (trade['txid'], trade['pair'], trade['time'], matched, entry_price, trade['price'], pnl))
+
+    def pnl(self, pair: Optional[str] = None, prices: Optional[Dict[str, float]] = None) -> Dict[str, dict]:
+        """
+        Running P&L per pair.
+
+        Args:
+            pair: Only this pair (all pairs if None)
+            prices: Current price per pair, for unrealized P&L (left out where missing)
+
+        Returns:
+            pair -> position, cost basis, realized/unrealized P&L, fees and round trip stats
+        """
+        with self._lock:
+            if pair:
+                rows = self._db.execute("SELECT * FROM positions WHERE pair = ?", (pair,)).fetchall()
+            else:
+                rows = self._db.execute("SELECT * FROM positions ORDER BY pair").fetchall()
+        result = {}
+        for row in rows:
+            position = dict(row)
+            position['avg_entry'] = row['cost_basis'] / row['volume'] if row['volume'] > DUST else 0.0
+            price = (prices or {}).get(row['pair'])
+            position['unrealized_pnl'] = row['volume'] * price - row['cost_basis'] if price else None
+            position['win_rate'] = row['wins'] / row['round_trips'] if row['round_trips'] else None
+            result[row['pair']] = position
+        return result
+
+    def round_trips(self, pair: Optional[str] = None, limit: int = 100) -> List[sqlite3.Row]:
+        """
+        Most recent round trips (sells matched against average cost), newest first.
+
+        Args:
+            pair: Only this pair (all if None)
+            limit: Maximum rows
+
+        Returns:
+            Round trip rows
+        """
+        with self._lock:
+            if pair:
+                return self._db.execute("SELECT * FROM round_trips WHERE pair = ? ORDER BY time DESC LIMIT ?",
+                                        (pair, limit)).fetchall()
+            return self._db.execute("SELECT * FROM round_trips ORDER BY time DESC LIMIT ?", (limit,)).fetchall()
+
+    def trades(self, pair: Optional[str] = None, start: float = 0, end: Optional[float] = None,
+               ordertxid: Optional[str] = None) -> List[sqlite3.Row]:
+        """
+        Stored trades, oldest first.
+
+        Args:
+            pair: Only this pair
+            start: Only trades at or after this Unix timestamp
+            end: Only trades before this Unix timestamp
+            ordertxid: Only the fills of this order
+
+        Returns:
+            Trade rows
+        """
+        query, args = "SELECT * FROM trades WHERE time >= ?", [start]
+        if end is not None:
+            query += " AND time < ?"
+            args.append(end)
+        if pair:
+            query += " AND pair = ?"
+            args.append(pair)
+        if ordertxid:
+            query += " AND ordertxid = ?"
+            args.append(ordertxid)
+        with self._lock:
+            return self._db.execute(query + " ORDER BY time", args).fetchall()
+
+    def ledger_totals(self, asset: Optional[str] = None) -> Dict[Tuple[str, str], Tuple[float, float]]:
+        """
+        Ledger amounts and fees summed by asset and entry type (trade, deposit, withdrawal, ...).
+
+        Args:
+            asset: Only this asset key (all if None)
+
+        Returns:
+            (asset, type) -> (total amount, total fee)
+        """
+        query = "SELECT asset, type, SUM(amount) AS amount, SUM(fee) AS fee FROM ledger"
+        with self._lock:
+            if asset:
+                rows = self._db.execute(query + " WHERE asset = ? GROUP BY asset, type", (asset,)).fetchall()
+            else:
+                rows = self._db.execute(query + " GROUP BY asset, type").fetchall()
+        return {(row['asset'], row['type']): (row['amount'], row['fee']) for row in rows}
+
+
+class HistorySync:
+    """
+    Pages TradesHistory and Ledgers into a TradeHistory from where the last sync stopped.
+
+    Each pass fetches the entries after the stream's cursor (less SYNC_MARGIN)
+    up to a fixed end time, newest first, 50 per call. The end time is fixed
+    for the pass so offsets stay stable while new trades happen, and the pass's
+    position is saved with every page, so an interrupted first sync of a long
+    history resumes where it stopped instead of starting over. Both endpoints
+    cost 2 on the rate limit counter and go through the governor at the lowest
+    priority, behind trading calls. Once a pass completes, the new trades are
+    applied to the P&L.
+    """
+
+    def __init__(self, client, history: TradeHistory, interval: float = 3600, ledgers: bool = True):
+        """
+        Initialize history sync.
+
+        Args:
+            client: KrakenClient used for TradesHistory/Ledgers
+            history: Store the entries are written to
+            interval: Seconds between background syncs
+            ledgers: Also sync the ledger
+        """
+        self.client = client
+        self.history = history
+        self.interval = interval
+        self.ledgers = ledgers
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="history-sync", daemon=True)
+
+    def _pair_name(self, key: str) -> str:
+        try:
+            return self.client.get_pair_info(key).altname
+        except Exception:
+            return key
+
+    def _sync_stream(self, stream: str, fetch, store) -> int:
+        state = self.history.sync_state(stream)
+        cursor = state['cursor']
+        if state['pass_end'] is None:
+            pass_start = cursor - SYNC_MARGIN if cursor else None
+            pass_end, ofs = float(int(time.time())), 0  # Kraken takes whole seconds
+        else:
+            # Resume an interrupted pass at the page it stopped on
+            pass_start, pass_end, ofs = state['pass_start'], state['pass_end'], state['ofs']
+            logger.info("Resuming %s sync at offset %s", stream, ofs)
+        added = 0
+        while True:
+            page, count = fetch(pass_start, pass_end, ofs)
+            ofs += len(page)
+            done = not page or ofs >= count
+            if done:
+                added += store(page, (max(cursor, pass_end), None, None, 0))
+                break
+            added += store(page, (cursor, pass_start, pass_end, ofs))
+            if self._stop.is_set():
+                break  # resumed from the saved offset next time
+            if ofs % 1000 < len(page):
+                logger.info("Synced %s of %s %s entries", ofs, count, stream)
+        return added
+
+    def sync_trades(self) -> int:
+        """Fetch new trades and apply them to the P&L. Returns the number of new trades."""
+        added = self._sync_stream(
+            "trades", self.client.get_trades_history,
+            lambda page, state: self.history.add_trades(page, self._pair_name, state))
+        self.history.apply_new_trades()
+        return added
+
+    def sync_ledger(self) -> int:
+        """Fetch new ledger entries. Returns the number of new entries."""
+        return self._sync_stream("ledger", self.client.get_ledgers, self.history.add_ledger)
+
+    def sync(self) -> Tuple[int, int]:
+        """
+        Sync trades and (if enabled) the ledger.
+
+        Returns:
+            (new trades, new ledger entries)
+        """
+        trades = self.sync_trades()
+        entries = self.sync_ledger() if self.ledgers else 0
+        if trades or entries:
+            logger.info("History sync: %s new trade(s), %s new ledger entries", trades, entries)
+            for pair, position in self.history.pnl().items():
+                logger.info("P&L %s: realized $%.2f, fees $%.2f, %s round trip(s), holding %.8f at avg $%.6f",
+                            pair, position['realized_pnl'], position['fees'], position['round_trips'],
+                            position['volume'], position['avg_entry'])
+        return trades, entries
+
+    def start(self):
+        """Sync in a background thread now and every interval seconds."""
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread after the current sync."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                logger.warning("History sync failed: %s", e)
+            self._stop.wait(self.interval)
+
+
+def main():
+    """Sync the trade history (optionally) and print P&L from the local store."""
+    from config import Config
+    parser = argparse.ArgumentParser(description="Trade history P&L report")
+    parser.add_argument("--db", default=Config.HISTORY_DB or "trade_history.db", help="SQLite trade history file")
+    parser.add_argument("--sync", action="store_true", help="fetch new trades and ledger entries from Kraken first")
+    parser.add_argument("--pair", help="only this pair (altname, e.g. XRPUSD)")
+    parser.add_argument("--round-trips", type=int, default=0, help="also list this many recent round trips")
+    args = parser.parse_args()
+
+    history = TradeHistory(args.db)
+    prices = {}
+    if args.sync:
+        from trading_bot import create_client
+        client = create_client()
+        HistorySync(client, history).sync()
+        for pair in history.pnl(args.pair):
+            try:
+                prices[pair] = client.get_current_price(pair)
+            except Exception as e:
+                logger.warning("No price for %s: %s", pair, e)
+
+    start = time.perf_counter()
+    report = history.pnl(args.pair, prices)
+    elapsed = time.perf_counter() - start
+    for pair, position in report.items():
+        unrealized = position['unrealized_pnl']
+        print("{pair}: realized ${realized:.2f} unrealized {unrealized} fees ${fees:.2f} round_trips={trips} "
+              "win_rate={win_rate} holding={volume:.8f} avg_entry={avg:.6f} unmatched_sold={unmatched:.8f}".format(
+                  pair=pair, realized=position['realized_pnl'],
+                  unrealized="${:.2f}".format(unrealized) if unrealized is not None else "n/a",
+                  fees=position['fees'], trips=position['round_trips'],
+                  win_rate="{:.0%}".format(position['win_rate']) if position['win_rate'] is not None else "n/a",
+                  volume=position['volume'], avg=position['avg_entry'], unmatched=position['unmatched']))
+        for trip in history.round_trips(pair, args.round_trips) if args.round_trips else []:
+            print("  {} {:.8f} @ {:.6f} -> {:.6f} pnl ${:.2f}".format(
+                time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(trip['time'])), trip['volume'],
+                trip['entry_price'], trip['exit_price'], trip['pnl']))
+    print("query_ms={:.2f}".format(elapsed * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,89 +1,264 @@
 """Main trading bot for automated cryptocurrency trading."""
 import logging
 import time
-from typing import Optional
+from typing import List, Optional
+from kraken.spot import Market
 from config import Config
+from account_state import AccountState
+from dead_mans_switch import DeadMansSwitch
+from fill_tracker import FillTracker
 from kraken_client import KrakenClient
+from journal import OrderJournal
+from logging_setup import setup_logging
+from http_session import create_session
+from market_data import PriceFeed
+from market_hub import SharedPriceFeed
+from metrics import Metrics, governor_collector, start_exporters
+from order_book import OrderBookFeed
+from order_prep import PreparedOrder
+from paper_trading import PaperExchange, create_paper_client, parse_balances
+from poll_scheduler import PollScheduler
+from price_history import PriceHistory
+from profiling import Profiler
+from rate_limiter import RateLimitGovernor
+from trade_history import HistorySync, TradeHistory
+import strategy
 
-# Setup logging
-logging.basicConfig(
-    level=Config.LOG_LEVEL,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('trading_bot.log')
-    ],
-    force=True
-)
 logger = logging.getLogger(__name__)
 
-# Add console handler
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-logger.addHandler(console_handler)
-logger.propagate = False
+
+def configure_logging():
+    """Set up the file, console and optional JSON logs from Config (written by a background thread).
+    
+    Called by the entry points rather than at import, so modules that only
+    reuse the bot's classes (benchmarks, paper trading) leave the live log alone.
+    """
+    setup_logging(
+        level=Config.LOG_LEVEL,
+        log_file=Config.LOG_FILE,
+        max_bytes=Config.LOG_MAX_BYTES,
+        rotate_when=Config.LOG_ROTATE_WHEN,
+        backup_count=Config.LOG_BACKUP_COUNT,
+        compress=Config.LOG_COMPRESS,
+        json_file=Config.LOG_JSON_FILE,
+        console=Config.LOG_CONSOLE
+    )
+
+
+def create_client() -> KrakenClient:
+    """Create a Kraken client from Config.
+    
+    The client gets the streaming price feed (or the supervisor's shared price
+    table with MARKET_DATA_HUB) and order books if enabled, a rate limit governor for
+    the account's tier, one pooled HTTP session with explicit timeouts and, when
+    METRICS_PORT or METRICS_FILE is set, a metrics registry with its exporters
+    (PROFILE_DIR alone records metrics for the profiler's phase dumps).
+    
+    With PAPER_TRADING set it returns a client whose orders and balances are
+    simulated in memory against live public prices instead.
+    """
+    price_feed = None
+    if Config.MARKET_DATA_HUB:
+        price_feed = SharedPriceFeed(Config.MARKET_DATA_HUB)
+    elif Config.USE_PRICE_FEED:
+        price_feed = PriceFeed(url=Config.KRAKEN_WS_URL)
+        price_feed.start()
+    if Config.PAPER_TRADING:
+        exchange = PaperExchange(market=Market(url=Config.KRAKEN_API_URL), price_feed=price_feed)
+        return create_paper_client(exchange, "paper", parse_balances(Config.PAPER_BALANCES))
+    order_book = None
+    if Config.USE_ORDER_BOOK:
+        order_book = OrderBookFeed(url=Config.KRAKEN_WS_URL, depth=Config.ORDER_BOOK_DEPTH,
+                                   record_file=Config.ORDER_BOOK_RECORD_FILE or None)
+        order_book.start()
+    governor = RateLimitGovernor(tier=Config.KRAKEN_TIER, headroom=Config.RATE_LIMIT_HEADROOM)
+    metrics = None
+    if Config.METRICS_PORT or Config.METRICS_FILE or Config.PROFILE_DIR:
+        metrics = Metrics()
+        metrics.add_collector(governor_collector(governor))
+        start_exporters(metrics, port=Config.METRICS_PORT, host=Config.METRICS_HOST,
+                        path=Config.METRICS_FILE, interval=Config.METRICS_FLUSH_INTERVAL)
+    return KrakenClient(
+        api_key=Config.KRAKEN_API_KEY,
+        api_secret=Config.KRAKEN_API_SECRET,
+        price_feed=price_feed,
+        asset_cache_file=Config.ASSET_CACHE_FILE,
+        asset_cache_ttl=Config.ASSET_CACHE_TTL,
+        governor=governor,
+        session=create_session(
+            connect_timeout=Config.HTTP_CONNECT_TIMEOUT,
+            read_timeout=Config.HTTP_READ_TIMEOUT,
+            retries=Config.HTTP_RETRIES,
+            pool_size=Config.HTTP_POOL_SIZE
+        ),
+        api_url=Config.KRAKEN_API_URL,
+        metrics=metrics,
+        order_book=order_book
+    )
+
+
+def create_journal() -> Optional[OrderJournal]:
+    """Open the order journal configured by JOURNAL_FILE (None if disabled or paper trading)."""
+    if not Config.JOURNAL_FILE or Config.PAPER_TRADING:
+        return None
+    return OrderJournal(Config.JOURNAL_FILE)
+
+
+def create_fill_tracker(client: KrakenClient, pairs: List[str]) -> Optional[FillTracker]:
+    """Create a fill tracker for the traded pairs (None if FILL_TRACKER is off)."""
+    if not Config.FILL_TRACKER:
+        return None
+    return FillTracker(client, pairs=pairs)
+
+
+def create_poll_scheduler(client: KrakenClient) -> Optional[PollScheduler]:
+    """Create the adaptive poll scheduler (None when ADAPTIVE_POLLING is off and CHECK_INTERVAL is used)."""
+    if not Config.ADAPTIVE_POLLING:
+        return None
+    return PollScheduler(min_interval=Config.POLL_MIN_INTERVAL, max_interval=Config.POLL_MAX_INTERVAL,
+                         governor=client.governor, budget_share=Config.POLL_BUDGET_SHARE)
+
+
+def create_dead_mans_switch(client: KrakenClient) -> Optional[DeadMansSwitch]:
+    """Arm the CancelAllOrdersAfter dead man's switch configured by CANCEL_AFTER_TIMEOUT (None if disabled).
+    
+    Not armed when CANCEL_ON_SHUTDOWN is off, since orders are then meant to outlive the process.
+    """
+    if not Config.CANCEL_AFTER_TIMEOUT or not Config.CANCEL_ON_SHUTDOWN:
+        return None
+    switch = DeadMansSwitch(client, timeout=Config.CANCEL_AFTER_TIMEOUT, disarm_on_stop=Config.CANCEL_AFTER_DISARM)
+    switch.start()
+    return switch
+
+
+def create_history_sync(client: KrakenClient) -> Optional[HistorySync]:
+    """Start syncing TradesHistory/Ledgers into HISTORY_DB in the background (None if disabled or paper trading)."""
+    if not Config.HISTORY_DB or Config.PAPER_TRADING:
+        return None
+    sync = HistorySync(client, TradeHistory(Config.HISTORY_DB), interval=Config.HISTORY_SYNC_INTERVAL,
+                       ledgers=Config.HISTORY_SYNC_LEDGER)
+    sync.start()
+    return sync
+
+
+def create_profiler(client: KrakenClient) -> Optional[Profiler]:
+    """Install the on-demand profiling hooks configured by PROFILE_DIR (None if disabled)."""
+    if not Config.PROFILE_DIR:
+        return None
+    profiler = Profiler(Config.PROFILE_DIR, metrics=client.metrics, seconds=Config.PROFILE_SECONDS,
+                        socket_path=Config.PROFILE_SOCKET or None)
+    profiler.start()
+    return profiler
+
+
+class PairLoggerAdapter(logging.LoggerAdapter):
+    """Prefix log messages with the trading pair when several pairs share a log."""
+    
+    def process(self, msg, kwargs):
+        prefix = self.extra.get('prefix')
+        if prefix:
+            msg = "[{}] {}".format(prefix, msg)
+            # Structured (JSON lines) logs get the pair as its own field
+            kwargs['extra'] = dict(kwargs.get('extra') or {}, pair=prefix)
+        return msg, kwargs
 
 
 class CryptoTradingBot:
     """Automated trading bot for cryptocurrency on Kraken."""
     
-    def __init__(self):
-        """Initialize trading bot."""
-        # Validate configuration
-        Config.validate()
+    def __init__(self, client: Optional[KrakenClient] = None, pair_config: Optional[dict] = None,
+                 account: Optional[AccountState] = None):
+        """Initialize trading bot.
         
-        # Initialize Kraken client
-        self.client = KrakenClient(
-            api_key=Config.KRAKEN_API_KEY,
-            api_secret=Config.KRAKEN_API_SECRET
-        )
+        Args:
+            client: Shared Kraken client (created from Config if not given)
+            pair_config: Per-pair settings from Config.get_pair_configs()
+                (defaults to the single TRADING_PAIR configuration)
+            account: Shared account state (created for this bot if not given)
+        """
+        if client is None:
+            # Validate configuration
+            Config.validate()
+            
+            # Initialize Kraken client
+            client = create_client()
+        self.client = client
         
         # Trading configuration
-        self.pair = Config.TRADING_PAIR
-        self.buy_price = Config.BUY_PRICE
-        self.sell_price = Config.SELL_PRICE
-        self.dollars_buy_amount = Config.DOLLARS_BUY_AMOUNT
-        self.sell_all = Config.SELL_ALL
-        self.dollars_being_traded = Config.DOLLARS_BEING_TRADED  # Backward compatibility
+        if pair_config is None:
+            pair_config = Config.get_pair_configs()[0]
+            self.logger = PairLoggerAdapter(logger, {})
+        else:
+            self.logger = PairLoggerAdapter(logger, {'prefix': pair_config['pair']})
+        
+        # Balances and open orders, cached for ACCOUNT_STATE_TTL seconds
+        if account is None:
+            account = AccountState(self.client, ttl=Config.ACCOUNT_STATE_TTL, journal=create_journal(),
+                                   tracker=create_fill_tracker(self.client, [pair_config['pair']]))
+        self.account = account
+        self.pair = pair_config['pair']
+        self.buy_price = pair_config['buy_price']
+        self.sell_price = pair_config['sell_price']
+        self.dollars_buy_amount = pair_config['dollars_buy_amount']
+        self.sell_all = pair_config['sell_all']
+        self.dollars_being_traded = self.dollars_buy_amount  # Backward compatibility
+        
+        # Pair and asset metadata from Kraken's AssetPairs/Assets endpoints
+        self.pair_info = self.client.get_pair_info(self.pair)
+        self.base_asset = self.client.registry.display_name(self.pair_info.base)
+        
+        # Kraken asset codes the base asset may appear under in balance responses
+        self.asset_codes = self.client.registry.balance_codes(self.pair_info.base)
         
-        # Asset name mapping
-        asset_name_map = {
-            'XBT': 'BTC',
-            'XXBT': 'BTC',
-            'XRP': 'XRP',
-            'XXRP': 'XRP',
-            'ETH': 'ETH',
-            'XETH': 'ETH',
-            'XXETH': 'ETH'
-        }
+        # Smallest order Kraken accepts for this pair (MIN_CRYPTO_TRADE_SIZE acts as a floor)
+        self.min_trade_size = max(Config.MIN_CRYPTO_TRADE_SIZE, self.pair_info.ordermin)
+        self.params = strategy.StrategyParams(
+            buy_price=self.buy_price,
+            sell_price=self.sell_price,
+            dollars_buy_amount=self.dollars_being_traded,
+            sell_all=self.sell_all,
+            min_trade_size=self.min_trade_size
+        )
+        self.last_action = None  # previous strategy action, journaled when it changes
+        self.last_price: Optional[float] = None  # price seen by the last iteration
+        self.tick_time: Optional[float] = None  # time.time() of the account state the iteration acts on
+        self.next_order: Optional[PreparedOrder] = None  # order expected next, quantized and checked ahead
+        self.levels: List[float] = [self.buy_price, self.sell_price]  # prices the poll scheduler watches
         
-        # Extract base asset code
-        base_code = self.pair.replace("USD", "")
-        self.base_asset = asset_name_map.get(base_code, base_code.replace("X", "").replace("Z", ""))
+        # Rolling price history with EMA/volatility/VWAP, seeded from Kraken's 1-minute candles
+        self.history: Optional[PriceHistory] = None
+        if Config.PRICE_HISTORY_SIZE > 0:
+            self.history = PriceHistory(capacity=Config.PRICE_HISTORY_SIZE, ema_span=Config.PRICE_HISTORY_EMA_SPAN)
+            try:
+                self.history.seed_from_ohlc(self.client, self.pair)
+            except Exception as e:
+                self.logger.warning("Could not seed price history from OHLC: %s", e)
         
-        # Get Kraken asset codes for API calls
-        self.asset_codes = [
-            base_code,
-            "X{}".format(base_code),
-            base_code.replace("X", ""),
-            "Z{}".format(base_code.replace("X", "").replace("Z", ""))
-        ]
+        self.logger.info("Crypto Trading Bot initialized")
+        self.logger.info("Trading pair: %s", self.pair)
+        self.logger.info("Base asset: %s", self.base_asset)
+        self.logger.info("Buy price: $%s", self.buy_price)
+        self.logger.info("Sell price: $%s", self.sell_price)
+        self.logger.info("Dollars being traded: $%s", self.dollars_being_traded)
+        self.logger.info("Minimum trade size: %s %s", self.min_trade_size, self.base_asset)
         
-        logger.info("Crypto Trading Bot initialized")
-        logger.info("Trading pair: {}".format(self.pair))
-        logger.info("Base asset: {}".format(self.base_asset))
-        logger.info("Buy price: ${}".format(self.buy_price))
-        logger.info("Sell price: ${}".format(self.sell_price))
-        logger.info("Dollars being traded: ${}".format(self.dollars_being_traded))
+        # Stream this pair's price from the first iteration on
+        if self.client.price_feed is not None:
+            self.client.price_feed.subscribe(self.pair_info.wsname or self.pair_info.altname)
+        if self.client.order_book is not None:
+            self.client.order_book.subscribe(self.pair_info.wsname or self.pair_info.altname)
     
     def get_open_orders(self) -> dict:
         """Get all open orders for the trading pair.
         
         Returns:
             Dictionary with: {'sell_order': dict, 'buy_order': dict}
+            
+        Raises:
+            Exception: If the open orders cannot be read
         """
         try:
-            orders = self.client.get_open_orders()
+            orders = self.account.get_open_orders()
             
             sell_order = None
             buy_order = None
@@ -93,8 +268,8 @@ class CryptoTradingBot:
                     pair_name = order_info.get('descr', {}).get('pair', '')
                     order_type = order_info.get('descr', {}).get('type', '')
                     
-                    if pair_name == self.pair:
-                        order_info['order_id'] = order_id
+                    if pair_name == self.pair_info.altname:
+                        order_info = dict(order_info, order_id=order_id)
                         if order_type == 'sell':
                             sell_order = order_info
                         elif order_type == 'buy':
@@ -103,8 +278,9 @@ class CryptoTradingBot:
             return {'sell_order': sell_order, 'buy_order': buy_order}
             
         except Exception as e:
-            logger.error("Error getting open orders: {}".format(e))
-            return {'sell_order': None, 'buy_order': None}
+            # Acting on "no open orders" could place duplicates; skip the iteration instead
+            self.logger.error("Error getting open orders: %s", e)
+            raise
     
     def get_balance(self) -> dict:
         """Get account balances.
@@ -113,7 +289,7 @@ class CryptoTradingBot:
             Dictionary with: {'crypto_amount': float, 'usd_balance': float}
         """
         try:
-            balance = self.client.get_balance()
+            balance = self.account.get_balance()
             
             # Get crypto amount
             crypto_amount = 0
@@ -129,7 +305,7 @@ class CryptoTradingBot:
             return {'crypto_amount': crypto_amount, 'usd_balance': usd_balance}
             
         except Exception as e:
-            logger.error("Error getting balance: {}".format(e))
+            self.logger.error("Error getting balance: %s", e)
             return {'crypto_amount': 0, 'usd_balance': 0}
     
     def place_buy_limit_order(self) -> Optional[str]:
@@ -140,33 +316,30 @@ class CryptoTradingBot:
         """
         try:
             crypto_amount = self.dollars_being_traded / self.buy_price
+            order = self.prepared_order("buy", crypto_amount, self.buy_price)
             
-            logger.info("=== PLACING BUY ORDER ===")
-            logger.info("Amount: ${}".format(self.dollars_being_traded))
-            logger.info("Crypto amount: {} {}".format(crypto_amount, self.base_asset))
-            logger.info("Limit price: ${}".format(self.buy_price))
+            self.logger.info("=== PLACING BUY ORDER ===")
+            self.logger.info("Amount: $%s", self.dollars_being_traded)
+            self.logger.info("Crypto amount: %s %s", order.volume, self.base_asset)
+            self.logger.info("Limit price: $%s", order.price)
             
-            order_id = self.client.place_limit_buy_order(
-                pair=self.pair,
-                volume=crypto_amount,
-                price=self.buy_price
-            )
+            order_id = self.account.submit_order(order, self.tick_time)
             
             if order_id:
-                logger.info("✓✓✓ Limit buy order placed ✓✓✓")
-                logger.info("✓ Order ID: {}".format(order_id))
+                self.logger.info("✓✓✓ Limit buy order placed ✓✓✓")
+                self.logger.info("✓ Order ID: %s", order_id)
                 return order_id
             else:
-                logger.error("✗ Failed to place limit buy order")
+                self.logger.error("✗ Failed to place limit buy order")
                 return None
                 
         except Exception as e:
             error_msg = str(e)
             if "Insufficient funds" in error_msg or "EOrder:Insufficient" in error_msg:
-                logger.warning("✗ Insufficient funds to place buy order")
+                self.logger.warning("✗ Insufficient funds to place buy order")
                 return None
             else:
-                logger.error("✗ Error placing limit buy order: {}".format(e))
+                self.logger.error("✗ Error placing limit buy order: %s", e)
                 return None
     
     def place_sell_limit_order(self, crypto_amount: float) -> Optional[str]:
@@ -180,34 +353,70 @@ class CryptoTradingBot:
         """
         try:
             # Check if amount meets minimum trade size requirement
-            if crypto_amount < Config.MIN_CRYPTO_TRADE_SIZE:
-                logger.info("ℹ Cannot place sell order: amount ({:.8f} {}) is below minimum trade size ({:.8f} {})".format(
-                    crypto_amount, self.base_asset, Config.MIN_CRYPTO_TRADE_SIZE, self.base_asset))
-                logger.info("ℹ Skipping sell order - amount too small for Kraken minimum volume requirement")
+            if crypto_amount < self.min_trade_size:
+                self.logger.info("ℹ Cannot place sell order: amount (%.8f %s) is below minimum trade size (%.8f %s)",
+                    crypto_amount, self.base_asset, self.min_trade_size, self.base_asset)
+                self.logger.info("ℹ Skipping sell order - amount too small for Kraken minimum volume requirement")
                 return None
             
-            logger.info("=== PLACING SELL ORDER ===")
-            logger.info("Amount: {} {}".format(crypto_amount, self.base_asset))
-            logger.info("Limit price: ${}".format(self.sell_price))
+            order = self.prepared_order("sell", crypto_amount, self.sell_price)
             
-            order_id = self.client.place_limit_sell_order(
-                pair=self.pair,
-                volume=crypto_amount,
-                price=self.sell_price
-            )
+            self.logger.info("=== PLACING SELL ORDER ===")
+            self.logger.info("Amount: %s %s", order.volume, self.base_asset)
+            self.logger.info("Limit price: $%s", order.price)
+            
+            order_id = self.account.submit_order(order, self.tick_time)
             
             if order_id:
-                logger.info("✓✓✓ Limit sell order placed ✓✓✓")
-                logger.info("✓ Order ID: {}".format(order_id))
+                self.logger.info("✓✓✓ Limit sell order placed ✓✓✓")
+                self.logger.info("✓ Order ID: %s", order_id)
                 return order_id
             else:
-                logger.error("✗ Failed to place limit sell order")
+                self.logger.error("✗ Failed to place limit sell order")
                 return None
                 
         except Exception as e:
-            logger.error("✗ Error placing limit sell order: {}".format(e))
+            self.logger.error("✗ Error placing limit sell order: %s", e)
             return None
     
+    def prepared_order(self, side: str, volume: float, price: float) -> PreparedOrder:
+        """
+        Get the order to send, reusing the one prepared ahead if it matches.
+        
+        Args:
+            side: "buy" or "sell"
+            volume: Volume in base currency
+            price: Limit price
+            
+        Returns:
+            Quantized, checked order
+            
+        Raises:
+            ValueError: If Kraken would reject the order
+        """
+        order, self.next_order = self.next_order, None
+        if order is not None and order.matches(side, volume, price):
+            return order
+        return self.client.prepare_limit_order(self.pair, side, volume, price)
+    
+    def prepare_next_order(self, side: str, volume: float, price: float):
+        """
+        Quantize and check the order the bot expects to place next, so it is
+        ready to send as soon as the open order fills.
+        
+        Args:
+            side: "buy" or "sell"
+            volume: Volume in base currency
+            price: Limit price
+        """
+        if self.next_order is not None and self.next_order.matches(side, volume, price):
+            return
+        try:
+            self.next_order = self.client.prepare_limit_order(self.pair, side, volume, price)
+        except ValueError as e:
+            self.next_order = None
+            self.logger.warning("Next %s order would be rejected: %s", side, e)
+    
     def get_current_price(self) -> Optional[float]:
         """Get current price for the trading pair.
         
@@ -215,174 +424,232 @@ class CryptoTradingBot:
             Current price as float, None if error
         """
         try:
-            return self.client.get_current_price(self.pair)
+            self.last_price = self.client.get_current_price(self.pair)
+            if self.history is not None and self.last_price:
+                self.history.append(time.time(), self.last_price)
+            return self.last_price
         except Exception as e:
-            logger.warning("Could not fetch current price: {}".format(e))
+            self.logger.warning("Could not fetch current price: %s", e)
             return None
     
+    def run_iteration(self):
+        """Run one pass of the buy/sell state machine."""
+        metrics = self.client.metrics
+        start = time.perf_counter()
+        self.tick_time = time.time()
+        try:
+            # Step 1: Check if there is a sell position with trading pair
+            orders = self.get_open_orders()
+            sell_order = orders['sell_order']
+            buy_order = orders['buy_order']
+            self.levels = [float(order.get('descr', {}).get('price', 0) or 0) for order in (sell_order, buy_order)
+                           if order] or [self.buy_price, self.sell_price]
+            balance = self.get_balance()
+            fetched = time.perf_counter()
+            metrics.observe('bot_phase_seconds', fetched - start, pair=self.pair, phase='account')
+            
+            decision = strategy.step(
+                self.params,
+                sell_order_volume=float(sell_order.get('vol', '0')) if sell_order else None,
+                buy_order_volume=float(buy_order.get('vol', '0')) if buy_order else None,
+                crypto_amount=balance['crypto_amount'],
+                usd_balance=balance['usd_balance']
+            )
+            decided = time.perf_counter()
+            metrics.observe('bot_phase_seconds', decided - fetched, pair=self.pair, phase='decide')
+            if decision.action != self.last_action and self.account.journal is not None:
+                self.account.journal.record_event("state", self.pair_info.altname, detail=decision.action)
+            self.last_action = decision.action
+            
+            if decision.action == strategy.WAIT_SELL:
+                # Sell position exists - wait for it to sell
+                order_id = sell_order.get('order_id', 'Unknown')
+                price = float(sell_order.get('descr', {}).get('price', '0'))
+                volume = float(sell_order.get('vol', '0'))
+                total = price * volume
+                
+                self.logger.info("Found open SELL order for %s (%s) at price $%.2f for %.8f %s, total trade worth $%.2f",
+                    self.pair, self.base_asset, price, volume, self.base_asset, total)
+                self.logger.info("Order ID: %s", order_id)
+                self.logger.info("Waiting for sell order to fill...")
+                self.logger.info("If sell order fills, I will create a buy limit order at price $%.2f for %.8f %s, total trade worth $%.2f",
+                    self.buy_price, decision.buy_amount, self.base_asset, self.dollars_being_traded)
+                self.prepare_next_order("buy", decision.buy_amount, self.buy_price)
+            
+            # Step 2: If there is NOT a sell position, check if there is a buy position
+            elif decision.action == strategy.WAIT_BUY:
+                # Buy position exists - wait for it to buy
+                order_id = buy_order.get('order_id', 'Unknown')
+                price = float(buy_order.get('descr', {}).get('price', '0'))
+                volume = float(buy_order.get('vol', '0'))
+                total = price * volume
+                
+                self.logger.info("Found open BUY order for %s (%s) at price $%.2f for %.8f %s, total trade worth $%.2f",
+                    self.pair, self.base_asset, price, volume, self.base_asset, total)
+                self.logger.info("Order ID: %s", order_id)
+                self.logger.info("Waiting for buy order to fill...")
+                self.logger.info("If buy order fills, I will create a sell limit order at price $%.2f for %.8f %s, total trade worth $%.2f - SELL_ALL=%s has been set",
+                    self.sell_price, decision.sell_amount, self.base_asset, decision.sell_total, self.sell_all)
+                self.prepare_next_order("sell", decision.sell_amount, self.sell_price)
+            
+            # Step 3.5: No orders but crypto in account - sell it at sell_price
+            elif decision.action in (strategy.SELL, strategy.SELL_TOO_SMALL):
+                if decision.action == strategy.SELL:
+                    # Amount is sufficient - log and place sell order
+                    self.logger.info("No open orders but have %.8f %s in account",
+                        balance['crypto_amount'], self.base_asset)
+                    if self.sell_all:
+                        self.logger.info("SELL_ALL=True - placing sell order for ALL %s at $%.2f for %.8f %s, total trade worth $%.2f - SELL_ALL=%s has been set",
+                            self.base_asset, self.sell_price, decision.sell_amount, self.base_asset, decision.sell_total, self.sell_all)
+                    else:
+                        self.logger.info("SELL_ALL=False - placing sell order for $%.2f worth: %.8f %s at $%.2f, total trade worth $%.2f - SELL_ALL=%s has been set",
+                            self.dollars_being_traded, decision.sell_amount, self.base_asset, self.sell_price, decision.sell_total, self.sell_all)
+                    order_id = self.place_sell_limit_order(decision.sell_amount)
+                else:
+                    # Amount is too small - skip sell order without logging "placing" message
+                    self.logger.info("ℹ Cannot place sell order: amount (%.8f %s) is below minimum trade size (%.8f %s)",
+                        decision.sell_amount, self.base_asset, self.min_trade_size, self.base_asset)
+                    self.logger.info("ℹ Skipping sell order - amount too small for Kraken minimum volume requirement")
+                    order_id = None
+                
+                # If sell order was skipped (amount too small) or failed, check for USD to buy
+                if order_id is None and decision.buy_if_no_sell:
+                    self.logger.info("Sell order skipped/not placed - checking for available USD to buy...")
+                    self.logger.info("✓ USD balance: $%.2f", balance['usd_balance'])
+                    self.place_buy_limit_order()
+            
+            # Step 4: Check if there is USD available for dollars_being_traded_amount
+            elif decision.action == strategy.BUY:
+                # Have USD - place buy order
+                self.logger.info("No open orders and no %s in account", self.base_asset)
+                self.logger.info("✓ USD balance: $%.2f", balance['usd_balance'])
+                self.place_buy_limit_order()
+            
+            # Step 5: No crypto, no USD - wait
+            else:
+                self.logger.warning("No open orders and no %s in account", self.base_asset)
+                self.logger.warning("USD balance: $%.2f - need $%.2f to trade",
+                    balance['usd_balance'], self.dollars_being_traded)
+                self.logger.warning("Waiting for funds...")
+            
+            acted = time.perf_counter()
+            metrics.observe('bot_phase_seconds', acted - decided, pair=self.pair, phase='act')
+            
+            # Show current price and USD balance
+            current_price = self.get_current_price()
+            balance = self.get_balance()
+            if current_price:
+                self.logger.info("Current %s Price: $%.4f. $%.2f USD currently in account",
+                    self.base_asset, current_price, balance['usd_balance'])
+            if self.history is not None and len(self.history):
+                self.logger.debug("Price history (%s samples): EMA $%.6f, std $%.6f, range $%.6f-$%.6f, VWAP $%.6f",
+                    len(self.history), self.history.ema, self.history.std, self.history.min, self.history.max,
+                    self.history.vwap)
+            metrics.observe('bot_phase_seconds', time.perf_counter() - acted, pair=self.pair, phase='price')
+            
+        except Exception as e:
+            metrics.inc('bot_iteration_errors_total', pair=self.pair)
+            self.logger.error("Error in trading iteration: %s", e)
+            self.logger.info("Continuing to next iteration...")
+        
+        metrics.inc('bot_iterations_total', pair=self.pair)
+        metrics.observe('bot_iteration_seconds', time.perf_counter() - start, pair=self.pair)
+    
+    def pair_order_ids(self) -> List[str]:
+        """Get the IDs of every open order on the trading pair.
+        
+        Returns:
+            Order IDs
+        """
+        orders = self.account.get_open_orders()
+        return [order_id for order_id, order_info in orders.items()
+                if order_info.get('descr', {}).get('pair', '') == self.pair_info.altname]
+    
+    def shutdown(self, cancel: Optional[bool] = None):
+        """Cancel the pair's open orders in one batch and log the final balance.
+        
+        Args:
+            cancel: Cancel the open orders (defaults to CANCEL_ON_SHUTDOWN; the
+                engine passes False after cancelling every pair's orders at once)
+        """
+        if cancel is None:
+            cancel = Config.CANCEL_ON_SHUTDOWN
+        if not Config.CANCEL_ON_SHUTDOWN:
+            self.logger.info("CANCEL_ON_SHUTDOWN=False - leaving open orders in place for the next run")
+        elif cancel:
+            # Cancel any open orders
+            order_ids = self.pair_order_ids()
+            if order_ids:
+                self.logger.info("Cancelling %s open order(s): %s", len(order_ids), ", ".join(order_ids))
+                self.account.cancel_orders(order_ids)
+        if self.account.journal is not None:
+            self.account.journal.record_event("shutdown", self.pair_info.altname)
+        
+        # Final balance
+        balance = self.get_balance()
+        self.logger.info("Final %s Balance: %.8f", self.base_asset, balance['crypto_amount'])
+        self.logger.info("Final USD Balance: $%.2f", balance['usd_balance'])
+    
     def run(self):
         """Main bot loop."""
-        logger.info("=" * 60)
-        logger.info("Starting Crypto Trading Bot (LIMIT ORDERS)")
-        logger.info("=" * 60)
+        self.logger.info("=" * 60)
+        self.logger.info("Starting Crypto Trading Bot (LIMIT ORDERS)")
+        self.logger.info("=" * 60)
         
         iteration = 0
+        switch = create_dead_mans_switch(self.client)
+        scheduler = create_poll_scheduler(self.client)
+        history = create_history_sync(self.client)
+        profiler = create_profiler(self.client)
         
         try:
             while True:
                 iteration += 1
-                logger.info("=" * 60)
-                logger.info("--- Iteration {} ---".format(iteration))
-                logger.info("=" * 60)
+                self.logger.info("=" * 60)
+                self.logger.info("--- Iteration %s ---", iteration)
+                self.logger.info("=" * 60)
                 
-                try:
-                    # Step 1: Check if there is a sell position with trading pair
-                    orders = self.get_open_orders()
-                    sell_order = orders['sell_order']
-                    buy_order = orders['buy_order']
-                    
-                    if sell_order:
-                        # Sell position exists - wait for it to sell
-                        order_id = sell_order.get('order_id', 'Unknown')
-                        price = float(sell_order.get('descr', {}).get('price', '0'))
-                        volume = float(sell_order.get('vol', '0'))
-                        total = price * volume
-                        
-                        buy_amount = self.dollars_being_traded / self.buy_price
-                        
-                        logger.info("Found open SELL order for {} ({}) at price ${:.2f} for {:.8f} {}, total trade worth ${:.2f}".format(
-                            self.pair, self.base_asset, price, volume, self.base_asset, total))
-                        logger.info("Order ID: {}".format(order_id))
-                        logger.info("Waiting for sell order to fill...")
-                        logger.info("If sell order fills, I will create a buy limit order at price ${:.2f} for {:.8f} {}, total trade worth ${:.2f}".format(
-                            self.buy_price, buy_amount, self.base_asset, self.dollars_being_traded))
-                    
-                    # Step 2: If there is NOT a sell position, check if there is a buy position
-                    elif buy_order:
-                        # Buy position exists - wait for it to buy
-                        order_id = buy_order.get('order_id', 'Unknown')
-                        price = float(buy_order.get('descr', {}).get('price', '0'))
-                        volume = float(buy_order.get('vol', '0'))
-                        total = price * volume
-                        
-                        # Calculate sell amount based on SELL_ALL setting
-                        if self.sell_all:
-                            # Sell all of trading pair crypto (calculate what we WILL have after buy fills)
-                            sell_amount = volume  # The amount being bought
-                            sell_total = sell_amount * self.sell_price
-                        else:
-                            # Sell DOLLARS_BUY_AMOUNT worth
-                            sell_amount = self.dollars_being_traded / self.sell_price
-                            sell_total = self.dollars_being_traded
-                        
-                        logger.info("Found open BUY order for {} ({}) at price ${:.2f} for {:.8f} {}, total trade worth ${:.2f}".format(
-                            self.pair, self.base_asset, price, volume, self.base_asset, total))
-                        logger.info("Order ID: {}".format(order_id))
-                        logger.info("Waiting for buy order to fill...")
-                        logger.info("If buy order fills, I will create a sell limit order at price ${:.2f} for {:.8f} {}, total trade worth ${:.2f} - SELL_ALL={} has been set".format(
-                            self.sell_price, sell_amount, self.base_asset, sell_total, self.sell_all))
-                    
-                    # Step 3: If there is NEITHER a sell or buy position
-                    else:
-                        balance = self.get_balance()
-                        
-                        # Step 3.5: Check if there is crypto in account (no orders but have crypto)
-                        if balance['crypto_amount'] > 0:
-                            # Have crypto - sell it immediately at sell_price
-                            if self.sell_all:
-                                # Sell all of trading pair crypto
-                                sell_amount = balance['crypto_amount']
-                                sell_total = sell_amount * self.sell_price
-                            else:
-                                # Sell DOLLARS_BUY_AMOUNT worth
-                                sell_amount = self.dollars_being_traded / self.sell_price
-                                sell_total = self.dollars_being_traded
-                            
-                            # Check if amount meets minimum trade size before logging
-                            if sell_amount >= Config.MIN_CRYPTO_TRADE_SIZE:
-                                # Amount is sufficient - log and place sell order
-                                logger.info("No open orders but have {:.8f} {} in account".format(
-                                    balance['crypto_amount'], self.base_asset))
-                                if self.sell_all:
-                                    logger.info("SELL_ALL=True - placing sell order for ALL {} at ${:.2f} for {:.8f} {}, total trade worth ${:.2f} - SELL_ALL={} has been set".format(
-                                        self.base_asset, self.sell_price, sell_amount, self.base_asset, sell_total, self.sell_all))
-                                else:
-                                    logger.info("SELL_ALL=False - placing sell order for ${:.2f} worth: {:.8f} {} at ${:.2f}, total trade worth ${:.2f} - SELL_ALL={} has been set".format(
-                                        self.dollars_being_traded, sell_amount, self.base_asset, self.sell_price, sell_total, self.sell_all))
-                                order_id = self.place_sell_limit_order(sell_amount)
-                            else:
-                                # Amount is too small - skip sell order without logging "placing" message
-                                logger.info("ℹ Cannot place sell order: amount ({:.8f} {}) is below minimum trade size ({:.8f} {})".format(
-                                    sell_amount, self.base_asset, Config.MIN_CRYPTO_TRADE_SIZE, self.base_asset))
-                                logger.info("ℹ Skipping sell order - amount too small for Kraken minimum volume requirement")
-                                order_id = None
-                            
-                            # If sell order was skipped (amount too small) or failed, check for USD to buy
-                            if order_id is None and balance['usd_balance'] >= self.dollars_being_traded:
-                                logger.info("Sell order skipped/not placed - checking for available USD to buy...")
-                                logger.info("✓ USD balance: ${:.2f}".format(balance['usd_balance']))
-                                self.place_buy_limit_order()
-                        
-                        # Step 4: Check if there is USD available for dollars_being_traded_amount
-                        elif balance['usd_balance'] >= self.dollars_being_traded:
-                            # Have USD - place buy order
-                            logger.info("No open orders and no {} in account".format(self.base_asset))
-                            logger.info("✓ USD balance: ${:.2f}".format(balance['usd_balance']))
-                            self.place_buy_limit_order()
-                        
-                        # Step 5: No crypto, no USD - wait
-                        else:
-                            logger.warning("No open orders and no {} in account".format(self.base_asset))
-                            logger.warning("USD balance: ${:.2f} - need ${:.2f} to trade".format(
-                                balance['usd_balance'], self.dollars_being_traded))
-                            logger.warning("Waiting for funds...")
-                    
-                    # Show current price and USD balance
-                    current_price = self.get_current_price()
-                    balance = self.get_balance()
-                    if current_price:
-                        logger.info("Current {} Price: ${:.4f}. ${:.2f} USD currently in account".format(
-                            self.base_asset, current_price, balance['usd_balance']))
-                    
-                except Exception as e:
-                    logger.error("Error in trading iteration: {}".format(e))
-                    logger.info("Continuing to next iteration...")
+                if profiler is not None:
+                    profiler.checkpoint()
+                self.run_iteration()
                 
                 # Step 5: Repeat all above continually
-                logger.info("Waiting {} seconds...".format(Config.CHECK_INTERVAL))
-                time.sleep(Config.CHECK_INTERVAL)
+                if scheduler is not None:
+                    scheduler.observe(self.pair, self.last_price)
+                    interval = scheduler.next_interval([(self.pair, self.last_price, self.levels)])
+                else:
+                    interval = Config.CHECK_INTERVAL
+                self.logger.info("Waiting %s seconds...", round(interval, 1))
+                time.sleep(interval)
                 
         except KeyboardInterrupt:
-            logger.info("\n" + "=" * 60)
-            logger.info("Bot stopped by user")
-            logger.info("=" * 60)
+            self.logger.info("\n" + "=" * 60)
+            self.logger.info("Bot stopped by user")
+            self.logger.info("=" * 60)
             
-            # Cancel any open orders
-            orders = self.get_open_orders()
-            if orders['sell_order']:
-                logger.info("Cancelling open sell order: {}".format(orders['sell_order']['order_id']))
-                self.client.cancel_order(orders['sell_order']['order_id'])
-            if orders['buy_order']:
-                logger.info("Cancelling open buy order: {}".format(orders['buy_order']['order_id']))
-                self.client.cancel_order(orders['buy_order']['order_id'])
-            
-            # Final balance
-            balance = self.get_balance()
-            logger.info("Final {} Balance: {:.8f}".format(self.base_asset, balance['crypto_amount']))
-            logger.info("Final USD Balance: ${:.2f}".format(balance['usd_balance']))
+            self.shutdown()
+            if switch is not None:
+                switch.stop()
+            if history is not None:
+                history.stop()
+            if profiler is not None:
+                profiler.stop()
             
         except Exception as e:
-            logger.error("Fatal error in bot: {}".format(e))
+            # The dead man's switch stops being refreshed and cancels the orders
+            self.logger.error("Fatal error in bot: %s", e)
             raise
 
 
 def main():
     """Main entry point."""
+    from grid_bot import create_bot
+    configure_logging()
     try:
-        bot = CryptoTradingBot()
+        bot = create_bot()
         bot.run()
     except Exception as e:
-        logger.error("Failed to start bot: {}".format(e))
+        logger.error("Failed to start bot: %s", e)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,208 @@
+"""Local stand-in for Kraken's public WebSocket API that replays recorded messages.
+
+A recording is a text file of raw WebSocket messages, one per line, as
+written by PriceFeed / OrderBookFeed with record_file set (or by --record
+below). ReplayServer accepts connections on localhost, answers each
+subscribe request with a subscriptionStatus per pair, then sends the recorded
+channel messages of the subscribed pairs and channels in their recorded
+order, followed by a heartbeat every second. A pair subscribed again on a new
+connection is replayed from the start, so reconnect handling can be tested
+by dropping the connections.
+
+Usage:
+    python3 ws_replay.py --record ws_recording.txt --pair XBTUSD --seconds 60
+    python3 ws_replay.py ws_recording.txt --port 8765 --interval 0.5
+    KRAKEN_WS_URL=ws://127.0.0.1:8765 python3 trading_bot.py
+"""
+import argparse
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Iterable, List, Optional, Set, Tuple
+import websockets
+
+logger = logging.getLogger(__name__)
+
+
+def load_messages(path: str) -> List[str]:
+    """Read a recording: raw messages, one per line."""
+    with open(path, 'r') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+class ReplayServer:
+    """
+    WebSocket server on its own event loop thread, replaying recorded channel messages.
+
+    Subscribe requests are kept in `subscriptions` as (connection number,
+    channel, pairs), so tests can check what a client asked for and when.
+    """
+
+    def __init__(self, messages: Iterable[str], host: str = "127.0.0.1", port: int = 0,
+                 interval: float = 0.0, heartbeat: float = 1.0):
+        """
+        Initialize replay server.
+
+        Args:
+            messages: Raw recorded messages (see load_messages)
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port)
+            interval: Seconds between replayed messages
+            heartbeat: Seconds between heartbeats once a replay has finished
+        """
+        self.messages = [raw if isinstance(raw, str) else json.dumps(raw) for raw in messages]
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.connections = 0
+        self.subscriptions: List[Tuple[int, str, List[str]]] = []
+        self._sockets: Set = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """ws:// URL to pass to PriceFeed (or KRAKEN_WS_URL)."""
+        return "ws://{}:{}".format(self.host, self.port)
+
+    def start(self):
+        """Start listening in a background thread."""
+        ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, args=(ready,), name="ws-replay", daemon=True)
+        self._thread.start()
+        ready.wait(5)
+        logger.info("WebSocket replay server listening on %s (%s messages)", self.url, len(self.messages))
+
+    def stop(self):
+        """Close every connection and the server."""
+        if self._thread is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+        self._thread = None
+
+    def drop_connections(self):
+        """Close every open connection, as a network drop would (the server keeps listening)."""
+        asyncio.run_coroutine_threadsafe(self._close_sockets(), self._loop).result(5)
+
+    def _run_loop(self, ready: threading.Event):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(self._serve())
+            self.port = next(iter(self._server.sockets)).getsockname()[1]
+        finally:
+            ready.set()
+        self._loop.run_forever()
+        self._loop.close()
+
+    async def _serve(self):
+        return await websockets.serve(self._handle, self.host, self.port)
+
+    async def _shutdown(self):
+        self._server.close()
+        await self._close_sockets()
+        await self._server.wait_closed()
+
+    async def _close_sockets(self):
+        for socket in list(self._sockets):
+            await socket.close()
+
+    async def _handle(self, socket, path=None):
+        self.connections += 1
+        number = self.connections
+        self._sockets.add(socket)
+        tasks = [asyncio.ensure_future(self._heartbeat(socket))]
+        try:
+            await socket.send(json.dumps({"event": "systemStatus", "status": "online", "connectionID": number}))
+            async for raw in socket:
+                try:
+                    request = json.loads(raw)
+                except ValueError:
+                    continue
+                if not isinstance(request, dict) or request.get("event") != "subscribe":
+                    continue
+                channel = request.get("subscription", {}).get("name", "")
+                pairs = list(request.get("pair", []))
+                self.subscriptions.append((number, channel, pairs))
+                for pair in pairs:
+                    await socket.send(json.dumps({"event": "subscriptionStatus", "status": "subscribed",
+                                                  "pair": pair, "channelName": channel,
+                                                  "subscription": {"name": channel}}))
+                tasks.append(asyncio.ensure_future(self._replay(socket, channel, set(pairs))))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._sockets.discard(socket)
+
+    async def _replay(self, socket, channel: str, pairs: Set[str]):
+        for raw in self.messages:
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                continue
+            # Channel messages: [channelID, payload(, payload), channelName, pair]
+            if (isinstance(message, list) and len(message) >= 4 and message[-1] in pairs
+                    and str(message[-2]).startswith(channel)):
+                await socket.send(raw)
+                if self.interval:
+                    await asyncio.sleep(self.interval)
+
+    async def _heartbeat(self, socket):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            await socket.send(json.dumps({"event": "heartbeat"}))
+
+
+def record(path: str, pairs: List[str], seconds: float, channels: List[str], url: str):
+    """Record live public messages for some pairs to a file."""
+    from market_data import PriceFeed
+    feed = PriceFeed(url=url, channels=channels, record_file=path)
+    for pair in pairs:
+        feed.subscribe(pair)
+    feed.start()
+    try:
+        time.sleep(seconds)
+    finally:
+        feed.stop()
+
+
+def main():
+    """Replay a recording on localhost, or record one from Kraken."""
+    parser = argparse.ArgumentParser(description="Replay recorded Kraken WebSocket messages on localhost")
+    parser.add_argument("recording", help="file of raw messages, one per line")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between replayed messages")
+    parser.add_argument("--record", action="store_true", help="record from --url into the file instead")
+    parser.add_argument("--pair", action="append", default=[], help="pair to record (repeatable)")
+    parser.add_argument("--channel", action="append", default=[], help="channel to record (default: ticker)")
+    parser.add_argument("--seconds", type=float, default=60.0, help="how long to record")
+    parser.add_argument("--url", default="wss://ws.kraken.com")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.record:
+        if not args.pair:
+            parser.error("--record needs at least one --pair")
+        record(args.recording, args.pair, args.seconds, args.channel or ["ticker"], args.url)
+        return
+    server = ReplayServer(load_messages(args.recording), port=args.port, interval=args.interval)
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()